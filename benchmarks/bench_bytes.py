@@ -0,0 +1,83 @@
+"""
+页面数据提取基准测试: 解码整个页面后提取 vs 直接在原始字节上提取
+解码前后都按各解析器的实际流程: 提取状态变量并解析成 dict
+页面为合成的测试数据 (见 fixtures/README.md), 结果只反映实现之间的相对差异
+
+运行: python benchmarks/bench_bytes.py
+"""
+
+import re
+import sys
+import timeit
+from pathlib import Path
+
+import httpx
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from video_parsers import jsliteral, jsoncodec  # noqa: E402
+from video_parsers.embedded import extract_states  # noqa: E402
+
+FIXTURES = Path(__file__).resolve().parent / "fixtures"
+
+# 页面, 状态变量, 旧实现使用的正则, 变量值的解析函数
+FIXTURE_STATES = {
+    "douyin": (
+        "douyin_video.html",
+        "_ROUTER_DATA",
+        re.compile(r"window\._ROUTER_DATA\s*=\s*(.*?)</script>", re.DOTALL),
+        jsoncodec.loads,
+    ),
+    "kuaishou": (
+        "kuaishou_video.html",
+        "INIT_STATE",
+        re.compile(r"window.INIT_STATE\s*=\s*(.*?)</script>"),
+        jsoncodec.loads,
+    ),
+    "redbook": (
+        "redbook_note.html",
+        "__INITIAL_STATE__",
+        re.compile(r"window\.__INITIAL_STATE__\s*=\s*(.*?)</script>", re.DOTALL),
+        jsliteral.loads,
+    ),
+}
+
+
+def extract_text(content: bytes, pattern, loads):
+    # 旧流程: response.text 解码整个页面, 在 str 上搜索
+    html = httpx.Response(200, content=content).text
+    return loads(pattern.search(html).group(1).strip())
+
+
+def extract_bytes(content: bytes, name: str, loads):
+    # 新流程: 扫描原始字节, 只解码 (或直接解析) 变量值
+    states = extract_states(content, [name])
+    if loads is jsoncodec.loads:
+        return states.loads(name)
+    return loads(states.get(name))
+
+
+def bench(name: str, func, number: int = 100) -> float:
+    cost = min(timeit.repeat(func, number=number, repeat=5)) / number
+    print(f"  {name:<32} {cost * 1e6:10.1f} us/page")
+    return cost
+
+
+def main():
+    for platform, (fixture, name, pattern, loads) in FIXTURE_STATES.items():
+        content = (FIXTURES / fixture).read_bytes()
+        expected = extract_text(content, pattern, loads)
+        assert extract_bytes(content, name, loads) == expected, platform
+
+        print(f"{platform} (synthetic): {len(content) / 1024:.0f} KiB, {name}")
+        bench("decode page only", lambda: httpx.Response(200, content=content).text)
+        before = bench(
+            "decode page + extract",
+            lambda: extract_text(content, pattern, loads),
+        )
+        after = bench("extract from bytes", lambda: extract_bytes(content, name, loads))
+        print(f"  speedup: {before / after:.1f}x\n")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,93 @@
+"""
+页面内嵌状态提取基准测试: 各解析器逐个正则全文搜索 vs 单次扫描 <script>
+旧实现在解码后的 str 上搜索, 单次扫描直接扫描原始字节
+页面为合成的测试数据 (见 fixtures/README.md), 结果只反映实现之间的相对差异
+
+运行: python benchmarks/bench_embedded.py
+"""
+
+import re
+import sys
+import timeit
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from video_parsers.embedded import extract_states  # noqa: E402
+
+FIXTURES = Path(__file__).resolve().parent / "fixtures"
+
+# 旧实现中各解析器使用的正则, 按解析器的尝试顺序
+LEGACY_PATTERNS = {
+    "douyin": [
+        re.compile(r"window\._ROUTER_DATA\s*=\s*(.*?)</script>", re.DOTALL),
+        re.compile(r"window\._SSR_HYDRATED_DATA\s*=\s*(.*?)</script>", re.DOTALL),
+        re.compile(r"window\.RENDER_DATA\s*=\s*(.*?)</script>", re.DOTALL),
+        re.compile(
+            r'<script id="RENDER_DATA" type="application/json">(.*?)</script>',
+            re.DOTALL,
+        ),
+    ],
+    "kuaishou": [re.compile(r"window.INIT_STATE\s*=\s*(.*?)</script>")],
+    "redbook": [
+        re.compile(r"window\.__INITIAL_STATE__\s*=\s*(.*?)</script>", re.DOTALL)
+    ],
+}
+
+# 页面及解析器需要的状态变量, 第一个为页面中实际使用的
+FIXTURE_STATES = {
+    "douyin": (
+        "douyin_video.html",
+        ["_ROUTER_DATA", "_SSR_HYDRATED_DATA", "RENDER_DATA"],
+    ),
+    "kuaishou": ("kuaishou_video.html", ["INIT_STATE"]),
+    "redbook": ("redbook_note.html", ["__INITIAL_STATE__"]),
+}
+
+
+def legacy_extract(patterns, html: str, first_only: bool):
+    result = None
+    for pattern in patterns:
+        match = pattern.search(html)
+        if match and result is None:
+            result = match.group(1).strip()
+            if first_only:
+                break
+    return result
+
+
+def bench(name: str, func, number: int = 200) -> float:
+    cost = min(timeit.repeat(func, number=number, repeat=5)) / number
+    print(f"  {name:<36} {cost * 1e6:10.1f} us/page")
+    return cost
+
+
+def main():
+    for platform, (fixture, names) in FIXTURE_STATES.items():
+        content = (FIXTURES / fixture).read_bytes()
+        html = content.decode("utf-8")
+        patterns = LEGACY_PATTERNS[platform]
+        state_name = names[0]
+        expected = legacy_extract(patterns, html, first_only=True)
+        assert extract_states(content, names).get(state_name) == expected, platform
+
+        print(f"{platform} (synthetic): {len(content) / 1024:.0f} KiB, {state_name}")
+        before = bench(
+            "regex, first match",
+            lambda: legacy_extract(patterns, html, first_only=True),
+        )
+        if len(patterns) > 1:
+            # 页面改用靠后的变量名时, 每个正则都要搜索全文
+            bench(
+                f"regex, all {len(patterns)} patterns",
+                lambda: legacy_extract(patterns, html, first_only=False),
+            )
+        after = bench(
+            "single scan",
+            lambda: extract_states(content, names).get(state_name),
+        )
+        print(f"  speedup: {before / after:.1f}x\n")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,78 @@
+"""
+小红书 __INITIAL_STATE__ 解析基准测试: yaml.safe_load vs JS 字面量解析
+
+运行: python benchmarks/bench_jsliteral.py
+"""
+
+import sys
+import timeit
+from pathlib import Path
+
+import yaml
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from video_parsers import jsliteral  # noqa: E402
+from video_parsers.embedded import extract_states  # noqa: E402
+
+FIXTURES = Path(__file__).resolve().parent / "fixtures"
+
+# 与 JSON 不同的 JS 语法, 逐条校验解析结果
+JS_CASES = [
+    ("undefined", "{a: undefined, b: [1, undefined]}", {"a": None, "b": [1, None]}),
+    (
+        "unquoted keys",
+        "{$key_1: 1, nested: {x: true}}",
+        {"$key_1": 1, "nested": {"x": True}},
+    ),
+    ("single quotes", "{'k': 'it\\'s \"quoted\"'}", {"k": 'it\'s "quoted"'}),
+    ("hex escape", '{"k": "\\x41\\x2F"}', {"k": "A/"}),
+    ("code point escape", '{"k": "\\u{1F600}"}', {"k": "\U0001F600"}),
+    ("surrogate pair", '{"k": "\\ud83d\\ude00"}', {"k": "\U0001F600"}),
+    ("js escapes", '{"k": "\\v\\0\\d"}', {"k": "\x0b\x00d"}),
+    ("line continuation", '{"k": "a\\\nb"}', {"k": "ab"}),
+    (
+        "keywords in strings",
+        '{"k": "undefined: x", "undefined": 1}',
+        {"k": "undefined: x", "undefined": 1},
+    ),
+    ("trailing semicolon", '{"k": 1};', {"k": 1}),
+]
+
+
+def normalize_yaml(value):
+    """
+    yaml 把 undefined 解析为字符串, 换成 None 后与 JS 语义一致
+    """
+    if value == "undefined":
+        return None
+    if isinstance(value, dict):
+        return {key: normalize_yaml(item) for key, item in value.items()}
+    if isinstance(value, list):
+        return [normalize_yaml(item) for item in value]
+    return value
+
+
+def bench(name: str, func, number: int) -> float:
+    cost = min(timeit.repeat(func, number=number, repeat=5)) / number
+    print(f"{name:<24} {cost * 1e3:10.2f} ms/parse")
+    return cost
+
+
+def main():
+    for name, text, expected in JS_CASES:
+        assert jsliteral.loads(text) == expected, name
+    print(f"{len(JS_CASES)} js literal cases ok")
+
+    html = (FIXTURES / "redbook_note.html").read_text(encoding="utf-8")
+    blob = extract_states(html, ["__INITIAL_STATE__"]).get("__INITIAL_STATE__")
+    assert jsliteral.loads(blob) == normalize_yaml(yaml.safe_load(blob))
+    print(f"__INITIAL_STATE__: {len(blob.encode()) / 1024:.0f} KiB, results match\n")
+
+    before = bench("yaml.safe_load", lambda: yaml.safe_load(blob), number=3)
+    after = bench("jsliteral.loads", lambda: jsliteral.loads(blob), number=50)
+    print(f"speedup: {before / after:.1f}x")
+
+
+if __name__ == "__main__":
+    main()
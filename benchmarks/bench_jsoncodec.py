@@ -0,0 +1,96 @@
+"""
+JSON 编解码基准测试: 标准库 json vs jsoncodec (安装了 orjson 时使用 orjson)
+解码: 页面中内嵌的大段状态数据; 编码: 解析接口的响应 (FastAPI 默认流程 vs CodecJSONResponse)
+
+运行: python benchmarks/bench_jsoncodec.py
+"""
+
+import json
+import sys
+import timeit
+from pathlib import Path
+
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from video_parsers import jsoncodec  # noqa: E402
+from video_parsers.base import ImgInfo, VideoAuthor, VideoInfo  # noqa: E402
+from video_parsers.embedded import extract_states  # noqa: E402
+
+FIXTURES = Path(__file__).resolve().parent / "fixtures"
+
+# 页面及其中的状态变量
+FIXTURE_STATES = {
+    "douyin": ("douyin_video.html", "_ROUTER_DATA"),
+    "kuaishou": ("kuaishou_video.html", "INIT_STATE"),
+}
+
+
+def build_video_info(images: int) -> VideoInfo:
+    return VideoInfo(
+        video_url="https://aweme.snssdk.com/aweme/v1/play/?video_id=v0300fg10000",
+        cover_url="https://p3-sign.douyinpic.com/tos-cn-i-0813/cover.jpeg",
+        title="周末去看海 🌊 #旅行 #日常",
+        music_url="https://sf3-cdn-tos.douyinstatic.com/obj/ies-music/music.mp3",
+        images=[
+            ImgInfo(
+                url=f"https://p3-sign.douyinpic.com/tos-cn-i-0813/{i}.webp",
+                live_photo_url=f"https://v26-web.douyinvod.com/{i}.mp4",
+            )
+            for i in range(images)
+        ],
+        author=VideoAuthor(
+            uid="MS4wLjABAAAA", name="看海的人", avatar="https://p3.douyinpic.com/a"
+        ),
+    )
+
+
+def render_default(video_info: VideoInfo) -> bytes:
+    # 旧流程: 返回 video_info.__dict__, FastAPI 先 jsonable_encoder 再 JSONResponse
+    content = {"code": 200, "msg": "解析成功", "data": video_info.__dict__}
+    return JSONResponse(jsonable_encoder(content)).body
+
+
+def render_codec(video_info: VideoInfo) -> bytes:
+    return jsoncodec.dumps({"code": 200, "msg": "解析成功", "data": video_info})
+
+
+def bench(name: str, func, number: int) -> float:
+    cost = min(timeit.repeat(func, number=number, repeat=5)) / number
+    print(f"  {name:<28} {cost * 1e6:10.1f} us")
+    return cost
+
+
+def main():
+    print(f"jsoncodec backend: {jsoncodec.BACKEND}\n")
+
+    for platform, (fixture, name) in FIXTURE_STATES.items():
+        content = (FIXTURES / fixture).read_bytes()
+        blob = extract_states(content, [name]).get_bytes(name)
+        assert jsoncodec.loads(blob) == json.loads(blob), platform
+
+        print(f"decode {platform} {name}: {len(blob) / 1024:.0f} KiB")
+        before = bench("json.loads", lambda: json.loads(blob), number=50)
+        after = bench("jsoncodec.loads", lambda: jsoncodec.loads(blob), number=50)
+        print(f"  speedup: {before / after:.1f}x\n")
+
+    for images in (0, 35):
+        video_info = build_video_info(images)
+        assert json.loads(render_codec(video_info)) == json.loads(
+            render_default(video_info)
+        )
+
+        print(f"encode response, {images} images")
+        before = bench(
+            "jsonable_encoder + json",
+            lambda: render_default(video_info),
+            number=2000,
+        )
+        after = bench("jsoncodec.dumps", lambda: render_codec(video_info), number=2000)
+        print(f"  speedup: {before / after:.1f}x\n")
+
+
+if __name__ == "__main__":
+    main()
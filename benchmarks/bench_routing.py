@@ -0,0 +1,179 @@
+"""
+分享链接路由基准测试: 旧的逐个来源子串匹配 vs 域名后缀路由表
+
+测试链接是**合成的**, 不是线上采集的分享链接: 以 SHARE_URLS 中各平台的链接格式为模板,
+随机替换其中的视频ID / 短链接码、随机追加分享参数, 并混入一部分不支持的域名,
+结果只用于比较两种实现的相对差异
+
+运行: python benchmarks/bench_routing.py
+"""
+
+import random
+import re
+import string
+import sys
+import timeit
+from pathlib import Path
+from typing import List
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from video_parsers import get_source_by_url, video_source_info_mapping  # noqa: E402
+
+# 各平台分享链接格式的模板
+SHARE_URLS = [
+    "https://v.douyin.com/iRNBho6u/",
+    "https://www.douyin.com/video/7424432820954598707",
+    "https://www.douyin.com/jingxuan?modal_id=7555093909760789812",
+    "https://www.iesdouyin.com/share/video/7424432820954598707/?region=CN&mid=1",
+    "https://v.kuaishou.com/JzYW1bGh",
+    "https://h5.pipix.com/s/iJWmP8jc/",
+    "https://weibo.com/2543858012/Q9pcJ4S21",
+    "https://video.weibo.com/show?fid=1034:4914351942074379",
+    "https://weibo.com/tv/show/1034:4914351942074379",
+    "https://m.weibo.cn/status/Q9pcJ4S21",
+    "https://m.weibo.cn/detail/5044829457711385",
+    "https://isee.weishi.qq.com/ws/app-pages/share/index.html?id=7aHVYBZ9w1HZ3ZXLq",
+    "https://m.oasis.weibo.cn/v1/h5/share?sid=4497689080987266",
+    "https://share.xiaochuankeji.cn/hybrid/share/post?pid=227175227",
+    "https://xspshare.baidu.com/s?vid=9861424397431476397",
+    "https://v.ixigua.com/iRNBjhEJ/",
+    "https://www.ixigua.com/7309402432563872314",
+    "https://www.pearvideo.com/detail_1789347",
+    "https://h5.pipigx.com/pp/post/580888728691",
+    "https://v.huya.com/play/882325697.html",
+    "https://www.acfun.cn/v/ac36935385",
+    "https://doupai.cc/topic/?id=6255ed1f83e9510c0e6d1a5e",
+    "https://www.meipai.com/video/865/6889069219925669521",
+    "https://kg.qq.com/node/play?s=YaCv8EYfJunVWYcH",
+    "https://m.6.cn/v/watchMini.php?vid=8bcdc9d8fc47fdb5c7ff",
+    "https://www.xinpianchang.com/a12906149",
+    "https://haokan.baidu.com/v?pd=wisenatural&vid=7296138318342385396",
+    "https://haokan.hao123.com/v?vid=7296138318342385396",
+    "https://www.bilibili.com/video/BV1vY411x7wm/",
+    "https://m.bilibili.com/video/BV1vY411x7wm",
+    "https://b23.tv/K6uhC3a",
+    "https://www.xiaohongshu.com/explore/64356527000000001303282b?xsec_token=AB",
+    "http://xhslink.com/a/HMSLJ7uzcXZ4",
+    # 旧实现会误判或匹配顺序敏感的链接
+    "https://m.weibo.cn/status/4914351942074379?from=weibo.com",
+    "https://www.bilibili.com/video/BV1vY411x7wm?spm_id_from=v.douyin.com",
+    "https://cdn16.cn/video.mp4",
+    "https://example.com/redirect?target=https://v.douyin.com/iRNBho6u/",
+    "https://www.kuaishou.com/short-video/3xbszt6yqrkdqcw",
+]
+
+
+# 合成链接的数量
+CORPUS_SIZE = 76000
+
+# 合成链接中不支持的域名所占比例
+UNSUPPORTED_RATIO = 0.1
+
+# 随机追加的分享参数
+SHARE_PARAMS = [
+    "share_from=copy",
+    "utm_source=copy_link",
+    "utm_medium=android",
+    "timestamp={digits}",
+    "share_id={token}",
+    "is_copy_url=1",
+]
+
+_DIGITS_PATTERN = re.compile(r"\d{4,}")
+_TOKEN_PATTERN = re.compile(r"(?<=/)[A-Za-z0-9]{6,12}(?=/?$)")
+
+
+def _random_string(rng: random.Random, alphabet: str, length: int) -> str:
+    return "".join(rng.choice(alphabet) for _ in range(length))
+
+
+def _mutate(rng: random.Random, template: str) -> str:
+    """
+    保留模板的域名和路径结构, 随机替换数字ID及末尾的短链接码, 随机追加分享参数
+    """
+    url = _DIGITS_PATTERN.sub(
+        lambda m: _random_string(rng, string.digits, len(m.group())), template
+    )
+    url = _TOKEN_PATTERN.sub(
+        lambda m: _random_string(
+            rng, string.ascii_letters + string.digits, len(m.group())
+        ),
+        url,
+    )
+    if rng.random() < 0.5:
+        params = [
+            param.format(
+                digits=_random_string(rng, string.digits, 10),
+                token=_random_string(rng, string.ascii_lowercase, 8),
+            )
+            for param in rng.sample(SHARE_PARAMS, rng.randint(1, 3))
+        ]
+        url += ("&" if "?" in url else "?") + "&".join(params)
+    return url
+
+
+def build_corpus(size: int = CORPUS_SIZE, seed: int = 42) -> List[str]:
+    """
+    生成合成的分享链接
+    :param size: 链接数量
+    :param seed: 随机种子, 相同种子生成相同的链接
+    :return:
+    """
+    rng = random.Random(seed)
+    corpus = []
+    for _ in range(size):
+        if rng.random() < UNSUPPORTED_RATIO:
+            host = _random_string(rng, string.ascii_lowercase, rng.randint(4, 10))
+            path = _random_string(rng, string.ascii_letters + string.digits, 12)
+            corpus.append(f"https://www.{host}.com/video/{path}")
+        else:
+            corpus.append(_mutate(rng, rng.choice(SHARE_URLS)))
+    return corpus
+
+
+def legacy_get_source(share_url: str):
+    """
+    旧实现: 遍历所有来源, 对每个域名做子串匹配
+    """
+    for item_source, item_source_info in video_source_info_mapping.items():
+        for item_url_domain in item_source_info["domain_list"]:
+            if item_url_domain in share_url:
+                return item_source
+    return None
+
+
+def main():
+    corpus = build_corpus()
+
+    number = 5
+    legacy = min(
+        timeit.repeat(
+            lambda: [legacy_get_source(u) for u in corpus], number=1, repeat=number
+        )
+    )
+    routed = min(
+        timeit.repeat(
+            lambda: [get_source_by_url(u) for u in corpus], number=1, repeat=number
+        )
+    )
+
+    print(
+        f"corpus: {len(corpus)} urls (synthetic, {len(set(corpus))} distinct, "
+        f"from {len(SHARE_URLS)} templates)"
+    )
+    print(f"legacy substring scan: {legacy / len(corpus) * 1e9:8.0f} ns/url")
+    print(f"host suffix routing:   {routed / len(corpus) * 1e9:8.0f} ns/url")
+    print(f"speedup: {legacy / routed:.2f}x")
+
+    print("\nresolved ambiguities (legacy -> routed):")
+    for url in SHARE_URLS:
+        old, new = legacy_get_source(url), get_source_by_url(url)
+        if old != new:
+            old_name = old.name if old else None
+            new_name = new.name if new else None
+            print(f"  {url}\n    {old_name} -> {new_name}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,43 @@
+"""
+User-Agent 获取耗时基准测试: 每次创建 fake_useragent.UserAgent vs 预生成的 UA 池
+
+运行: python benchmarks/bench_useragent.py
+"""
+
+import sys
+import timeit
+from pathlib import Path
+
+import fake_useragent
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from video_parsers.useragent import UserAgentProvider  # noqa: E402
+
+
+def bench(name: str, func, number: int):
+    cost = min(timeit.repeat(func, number=number, repeat=5)) / number
+    print(f"{name:<40} {cost * 1e6:10.2f} us/call")
+    return cost
+
+
+def main():
+    before = bench(
+        "UserAgent(os=['ios']).random",
+        lambda: fake_useragent.UserAgent(os=["ios"]).random,
+        number=50,
+    )
+
+    shared = fake_useragent.UserAgent(os=["ios"])
+    bench("shared UserAgent.random", lambda: shared.random, number=500)
+
+    provider = UserAgentProvider()
+    load_cost = timeit.timeit(provider.load, number=1)
+    print(f"{'UserAgentProvider.load (once)':<40} {load_cost * 1e3:10.2f} ms")
+
+    after = bench("UserAgentProvider.get('ios')", lambda: provider.get("ios"), 100000)
+    print(f"speedup: {before / after:.0f}x")
+
+
+if __name__ == "__main__":
+    main()
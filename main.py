@@ -1,25 +1,86 @@
+import asyncio
+import dataclasses
+import logging
 import os
-import re
 import secrets
-import logging
-from video_parsers import VideoSource, parse_video_id, parse_video_share_url
+from contextlib import asynccontextmanager
+from typing import List, Optional
 
-import uvicorn
 import httpx
+import uvicorn
 from fastapi import Depends, FastAPI, HTTPException, Request, status
-from fastapi.responses import HTMLResponse, StreamingResponse
+from fastapi.responses import HTMLResponse, JSONResponse, Response, StreamingResponse
 from fastapi.security import HTTPBasic, HTTPBasicCredentials
 from fastapi.templating import Jinja2Templates
+from pydantic import BaseModel, Field
+from starlette.background import BackgroundTask
+
+from media_proxy import (
+    MediaBroadcast,
+    build_cached_response,
+    build_client_response,
+    build_upstream_headers,
+    iter_album_zip,
+    media_broadcasts,
+    media_cache,
+    open_segmented,
+    parse_range,
+)
+from video_parsers import (
+    MEDIA_PROFILE,
+    BatchItem,
+    BatchParser,
+    BatchResult,
+    ClientPool,
+    VideoSource,
+    WeiBo,
+    adaptive_timeouts,
+    extract_share_urls,
+    get_client_pool,
+    hedge_latencies,
+    hedge_stats,
+    host_breakers,
+    jsoncodec,
+    parse_single_flight,
+    parse_video_id,
+    parse_video_share_url,
+    result_cache,
+    retry_budget,
+    set_client_pool,
+    shortlink_cache,
+    source_breakers,
+    ua_provider,
+)
+
 # from fastapi_mcp import FastApiMCP
 
 # Configure logging
 logging.basicConfig(
-    level=logging.INFO,
-    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+    level=logging.INFO, format="%(asctime)s - %(name)s - %(levelname)s - %(message)s"
 )
 logger = logging.getLogger(__name__)
 
-app = FastAPI()
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # 所有解析器及视频代理共享的长连接池
+    client_pool = ClientPool()
+    set_client_pool(client_pool)
+    app.state.client_pool = client_pool
+    # 恢复上次运行时缓存的短链接跳转地址
+    await asyncio.to_thread(shortlink_cache.load)
+    # 预先生成 UA 池, 避免请求时读取 UA 数据文件阻塞事件循环
+    await asyncio.to_thread(ua_provider.load)
+    # 视频分块缓存的索引只在内存中, 启动时清空上次运行留下的分块
+    await asyncio.to_thread(media_cache.load)
+    try:
+        yield
+    finally:
+        set_client_pool(None)
+        await client_pool.aclose()
+
+
+app = FastAPI(lifespan=lifespan)
 
 # mcp = FastApiMCP(app)
 
@@ -27,6 +88,22 @@ app = FastAPI()
 
 templates = Jinja2Templates(directory="templates")
 
+# 单次文案解析最多解析的链接数
+MAX_TEXT_SHARE_URLS = 20
+
+# 图集打包下载时的最大并发下载数
+ALBUM_ZIP_CONCURRENCY = 4
+
+
+class CodecJSONResponse(JSONResponse):
+    """
+    使用 jsoncodec (优先 orjson) 序列化的 JSON 响应
+    可以直接传入包含 dataclass 的结果, 返回该响应时不再经过 jsonable_encoder 逐层转换
+    """
+
+    def render(self, content) -> bytes:
+        return jsoncodec.dumps(content)
+
 
 def get_auth_dependency() -> list[Depends]:
     """
@@ -51,7 +128,9 @@ def get_auth_dependency() -> list[Depends]:
             credentials.password, basic_auth_password
         )
         if not (correct_username and correct_password):
-            logger.warning(f"Failed login attempt with username: {credentials.username}")
+            logger.warning(
+                f"Failed login attempt with username: {credentials.username}"
+            )
             raise HTTPException(
                 status_code=status.HTTP_401_UNAUTHORIZED,
                 detail="Incorrect username or password",
@@ -73,23 +152,28 @@ async def read_item(request: Request):
     )
 
 
-@app.get("/video/share/url/parse", dependencies=get_auth_dependency())
-async def share_url_parse(url: str):
+@app.get(
+    "/video/share/url/parse",
+    response_class=CodecJSONResponse,
+    dependencies=get_auth_dependency(),
+)
+async def share_url_parse(url: str, no_cache: bool = False):
     logger.info(f"Parsing share URL: {url}")
-    url_reg = re.compile(r"http[s]?:\/\/[\w.-]+[\w\/-]*[\w.-]*\??[\w=&:\-\+\%]*[/]*")
-    search_res = url_reg.search(url)
-    if not search_res:
+    share_urls = extract_share_urls(url)
+    if not share_urls:
         logger.error(f"Invalid URL format: {url}")
         return {
             "code": 400,
             "msg": "Invalid URL",
         }
-    video_share_url = search_res.group()
+    video_share_url = share_urls[0]
 
     try:
-        video_info = await parse_video_share_url(video_share_url)
+        video_info = await parse_video_share_url(
+            video_share_url, use_cache=not no_cache
+        )
         logger.info(f"Successfully parsed URL: {video_share_url}")
-        return {"code": 200, "msg": "解析成功", "data": video_info.__dict__}
+        return CodecJSONResponse({"code": 200, "msg": "解析成功", "data": video_info})
     except Exception as err:
         logger.error(f"Error parsing URL {video_share_url}: {err}", exc_info=True)
         return {
@@ -98,13 +182,48 @@ async def share_url_parse(url: str):
         }
 
 
-@app.get("/video/id/parse", dependencies=get_auth_dependency())
-async def video_id_parse(source: VideoSource, video_id: str):
+@app.get(
+    "/video/share/text/parse",
+    response_class=CodecJSONResponse,
+    dependencies=get_auth_dependency(),
+)
+async def share_text_parse(text: str, no_cache: bool = False):
+    """
+    解析分享文案中的所有链接, 并发解析, 按链接出现顺序返回
+    """
+    share_urls = extract_share_urls(text)[:MAX_TEXT_SHARE_URLS]
+    if not share_urls:
+        logger.error(f"No supported URL in text: {text}")
+        return {
+            "code": 400,
+            "msg": "Invalid URL",
+        }
+    logger.info(f"Parsing {len(share_urls)} share URLs from text")
+
+    batch_parser = BatchParser(use_cache=not no_cache)
+    results = [None] * len(share_urls)
+    async for result in batch_parser.run([BatchItem(url=u) for u in share_urls]):
+        item = {"url": share_urls[result.index]}
+        if result.error:
+            item.update({"code": 500, "msg": result.error})
+        else:
+            item.update({"code": 200, "msg": "解析成功", "data": result.video_info})
+        results[result.index] = item
+
+    return CodecJSONResponse({"code": 200, "msg": "解析成功", "data": results})
+
+
+@app.get(
+    "/video/id/parse",
+    response_class=CodecJSONResponse,
+    dependencies=get_auth_dependency(),
+)
+async def video_id_parse(source: VideoSource, video_id: str, no_cache: bool = False):
     logger.info(f"Parsing video ID: {video_id} from source: {source}")
     try:
-        video_info = await parse_video_id(source, video_id)
+        video_info = await parse_video_id(source, video_id, use_cache=not no_cache)
         logger.info(f"Successfully parsed ID: {video_id}")
-        return {"code": 200, "msg": "解析成功", "data": video_info.__dict__}
+        return CodecJSONResponse({"code": 200, "msg": "解析成功", "data": video_info})
     except Exception as err:
         logger.error(f"Error parsing ID {video_id}: {err}", exc_info=True)
         return {
@@ -113,47 +232,258 @@ async def video_id_parse(source: VideoSource, video_id: str):
         }
 
 
-@app.get("/video/proxy", dependencies=get_auth_dependency())
-async def video_proxy(url: str):
+class BatchParseItem(BaseModel):
+    # 分享链接, 与 source + video_id 二选一
+    url: Optional[str] = None
+    source: Optional[VideoSource] = None
+    video_id: Optional[str] = None
+
+
+class BatchParseRequest(BaseModel):
+    items: List[BatchParseItem] = Field(..., min_length=1, max_length=1000)
+    # 全局最大并发数
+    concurrency: int = Field(16, ge=1, le=64)
+    # 单个平台最大并发数
+    per_source_concurrency: int = Field(4, ge=1, le=16)
+    # 出现第一个失败时取消剩余解析
+    fail_fast: bool = False
+    # 整批超时时间(秒), 超时后剩余解析返回错误
+    deadline: Optional[float] = Field(None, gt=0, le=600)
+    no_cache: bool = False
+
+
+def _batch_result_line(result: BatchResult) -> bytes:
+    if result.error:
+        line = {"index": result.index, "code": 500, "msg": result.error}
+    else:
+        line = {
+            "index": result.index,
+            "code": 200,
+            "msg": "解析成功",
+            "data": result.video_info,
+        }
+    return jsoncodec.dumps(line) + b"\n"
+
+
+@app.post("/video/batch/parse", dependencies=get_auth_dependency())
+async def batch_parse(req: BatchParseRequest):
+    """
+    批量解析, 以 NDJSON 流式返回, 每行一个结果, 按完成顺序返回并带上输入下标
+    """
+    logger.info(f"Batch parsing {len(req.items)} items")
+    items = [
+        BatchItem(
+            url=(item.url or "").strip(),
+            source=item.source,
+            video_id=item.video_id or "",
+        )
+        for item in req.items
+    ]
+    batch_parser = BatchParser(
+        concurrency=req.concurrency,
+        per_source_concurrency=req.per_source_concurrency,
+        fail_fast=req.fail_fast,
+        deadline=req.deadline,
+        use_cache=not req.no_cache,
+    )
+
+    async def iter_results():
+        async for result in batch_parser.run(items):
+            yield _batch_result_line(result)
+
+    return StreamingResponse(iter_results(), media_type="application/x-ndjson")
+
+
+@app.get("/admin/circuit", dependencies=get_auth_dependency())
+async def admin_circuit():
+    """
+    熔断器状态: 按视频来源及上游域名
+    """
+    return {
+        "code": 200,
+        "msg": "ok",
+        "data": {
+            "sources": source_breakers.snapshot(),
+            "hosts": host_breakers.snapshot(),
+        },
+    }
+
+
+@app.get("/admin/stats", dependencies=get_auth_dependency())
+async def admin_stats():
+    """
+    解析链路统计: 合并请求数, 结果/短链接缓存命中率等
+    """
+    return {
+        "code": 200,
+        "msg": "ok",
+        "data": {
+            "single_flight": {
+                **dataclasses.asdict(parse_single_flight.stats),
+                "inflight": parse_single_flight.inflight_count(),
+            },
+            "result_cache": {
+                **dataclasses.asdict(result_cache.stats),
+                "size": len(result_cache),
+            },
+            "shortlink_cache": {
+                **dataclasses.asdict(shortlink_cache.stats),
+                "size": len(shortlink_cache),
+            },
+            "retry_budget": dataclasses.asdict(retry_budget.stats),
+            "hedge": {
+                **dataclasses.asdict(hedge_stats),
+                "latency": hedge_latencies.snapshot(),
+            },
+            "host_latency": adaptive_timeouts.latencies.snapshot(),
+            "strategies": {"weibo.post": WeiBo.POST_STRATEGY.snapshot()},
+            "json_backend": jsoncodec.BACKEND,
+            "media_cache": {
+                **dataclasses.asdict(media_cache.stats),
+                "size": len(media_cache),
+                "bytes": media_cache.size_bytes,
+            },
+            "media_broadcasts": {
+                **dataclasses.asdict(media_broadcasts.stats),
+                "active": len(media_broadcasts),
+            },
+        },
+    }
+
+
+@app.get("/video/album/zip", dependencies=get_auth_dependency())
+async def album_zip(url: str, no_cache: bool = False, live_photo: bool = True):
+    """
+    下载图集的所有图片 (及 livephoto 视频), 打包为 ZIP 流式返回
+    :param url: 分享链接
+    :param no_cache: 是否跳过解析结果缓存
+    :param live_photo: 是否包含 livephoto 视频
+    :return:
+    """
+    share_urls = extract_share_urls(url)
+    if not share_urls:
+        raise HTTPException(status_code=400, detail="Invalid URL")
+
+    try:
+        video_info = await parse_video_share_url(share_urls[0], use_cache=not no_cache)
+    except Exception as err:
+        logger.error(f"Error parsing URL {share_urls[0]}: {err}", exc_info=True)
+        raise HTTPException(status_code=500, detail=str(err))
+    if not video_info.images:
+        raise HTTPException(status_code=404, detail="No album images")
+
+    client = get_client_pool().get(MEDIA_PROFILE)
+    return StreamingResponse(
+        iter_album_zip(
+            client,
+            video_info.images,
+            concurrency=ALBUM_ZIP_CONCURRENCY,
+            include_live_photo=live_photo,
+        ),
+        media_type="application/zip",
+        headers={"Content-Disposition": 'attachment; filename="album.zip"'},
+    )
+
+
+@app.api_route(
+    "/video/proxy", methods=["GET", "HEAD"], dependencies=get_auth_dependency()
+)
+async def video_proxy(url: str, request: Request, segmented: bool = False):
     """
     Proxy video download to bypass 403 Forbidden (anti-hotlinking).
+    Client Range / If-Range are passed through so players can seek and downloads resume.
+    Bodies are cached on disk in chunks, hot videos are served locally.
+    Concurrent downloads of the same url share one upstream stream.
+    segmented=true downloads large files over several ranged connections in parallel.
     """
     if not url:
         raise HTTPException(status_code=400, detail="Missing url parameter")
 
     logger.info(f"Proxy request for URL: {url}")
 
-    # Use robust headers to mimic a real mobile request and bypass hotlinking protection
-    headers = {
-        "User-Agent": "Mozilla/5.0 (iPhone; CPU iPhone OS 16_6 like Mac OS X) AppleWebKit/605.1.15 (KHTML, like Gecko) Version/16.6 Mobile/15E148 Safari/604.1",
-        "Accept": "*/*",
-        "Accept-Encoding": "identity;q=1, *;q=0",
-        "Accept-Language": "zh-CN,zh;q=0.9",
-        "Range": "bytes=0-",
-    }
+    client_range = request.headers.get("range")
+    byte_range = parse_range(client_range) if client_range else (0, None)
+    # 客户端带 If-Range 时由上游判断文件是否变化, 不使用缓存
+    if byte_range and not request.headers.get("if-range"):
+        cached = media_cache.lookup(url, *byte_range)
+        if cached:
+            entry, start, end = cached
+            status_code, response_headers = build_cached_response(
+                entry.total_size,
+                start,
+                end,
+                entry.content_type,
+                etag=entry.etag,
+                last_modified=entry.last_modified,
+                partial=bool(client_range),
+            )
+            if request.method == "HEAD":
+                return Response(status_code=status_code, headers=response_headers)
+            return StreamingResponse(
+                media_cache.iter_range(entry, start, end),
+                status_code=status_code,
+                headers=response_headers,
+            )
+
+    if request.method == "HEAD":
+        upstream = await _open_upstream(url, request)
+        status_code, response_headers = build_client_response(upstream, client_range)
+        await upstream.aclose()
+        return Response(status_code=status_code, headers=response_headers)
 
-    async def iter_file():
-        try:
-            # Increase timeout to 60s (connect=10.0, read=60.0, write=10.0, pool=10.0)
-            timeout = httpx.Timeout(60.0, connect=10.0)
-            async with httpx.AsyncClient(verify=False, trust_env=False, follow_redirects=True, timeout=timeout) as client:
-                async with client.stream("GET", url, headers=headers) as response:
-                    if response.status_code >= 400:
-                        logger.error(f"Upstream server returned {response.status_code} for URL: {url}")
-                        # Consume response to avoid hanging connection
-                        await response.aread() 
-                        raise HTTPException(status_code=response.status_code, detail=f"Upstream error {response.status_code}")
-                    
-                    async for chunk in response.aiter_bytes():
-                        yield chunk
-        except httpx.RequestError as exc:
-            logger.error(f"An error occurred while requesting {exc.request.url!r}: {exc}")
-            raise HTTPException(status_code=500, detail=f"Proxy request error: {exc}")
-        except Exception as e:
-            logger.error(f"Unexpected error in proxy: {e}", exc_info=True)
-            raise HTTPException(status_code=500, detail="Internal server error")
-
-    return StreamingResponse(iter_file(), media_type="video/mp4")
+    async def open_broadcast():
+        upstream = await _open_upstream(url, request)
+        status_code, response_headers = build_client_response(upstream, client_range)
+        # 边转发边写入分块缓存, 热门视频后续请求直接从磁盘读取
+        writer = media_cache.writer_for(url, upstream)
+        body = None
+        if segmented:
+            # 上游忽略 Range 或文件较小时返回 None, 按单连接转发
+            body = open_segmented(
+                get_client_pool().get(MEDIA_PROFILE),
+                upstream,
+                build_upstream_headers(request.headers),
+            )
+        return MediaBroadcast(
+            upstream, status_code, response_headers, writer=writer, body=body
+        )
+
+    # 相同地址和区间的并发请求共享一个上游连接, 后加入的请求先回放已下载的数据
+    key = (url, client_range or "", request.headers.get("if-range", ""))
+    broadcast, body = await media_broadcasts.join(key, open_broadcast)
+    # 客户端在响应开始前断开时不会读取 body, 响应结束后退出订阅, 不再为其下载
+    return StreamingResponse(
+        body,
+        status_code=broadcast.status_code,
+        headers=broadcast.headers,
+        background=BackgroundTask(body.aclose),
+    )
+
+
+async def _open_upstream(url: str, request: Request) -> httpx.Response:
+    """
+    Open the upstream media response, passing through the client's Range / If-Range.
+    """
+    headers = build_upstream_headers(request.headers)
+    # Shared keep-alive client, timeout 60s (connect=10.0, read=60.0)
+    client = get_client_pool().get(MEDIA_PROFILE)
+    try:
+        upstream = await client.send(
+            client.build_request("GET", url, headers=headers), stream=True
+        )
+    except httpx.RequestError as exc:
+        logger.error(f"An error occurred while requesting {exc.request.url!r}: {exc}")
+        raise HTTPException(status_code=500, detail=f"Proxy request error: {exc}")
+
+    # 416 (Range 超出范围) 原样返回给客户端, 由客户端重新发起请求
+    if upstream.status_code >= 400 and upstream.status_code != 416:
+        logger.error(f"Upstream server returned {upstream.status_code} for URL: {url}")
+        await upstream.aclose()
+        raise HTTPException(
+            status_code=upstream.status_code,
+            detail=f"Upstream error {upstream.status_code}",
+        )
+    return upstream
 
 
 # mcp.setup_server()
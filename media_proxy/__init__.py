@@ -0,0 +1,41 @@
+from .album import iter_album_zip
+from .broadcast import (
+    BroadcastHub,
+    BroadcastStats,
+    BroadcastSubscription,
+    MediaBroadcast,
+    media_broadcasts,
+)
+from .chunk_cache import ChunkCache, ChunkWriter, MediaEntry, media_cache
+from .segmented import SegmentedFetcher, open_segmented
+from .upstream import (
+    DEFAULT_MEDIA_TYPE,
+    DEFAULT_PROXY_HEADERS,
+    build_cached_response,
+    build_client_response,
+    build_upstream_headers,
+    parse_content_range,
+    parse_range,
+)
+
+__all__ = [
+    "iter_album_zip",
+    "BroadcastHub",
+    "BroadcastStats",
+    "BroadcastSubscription",
+    "MediaBroadcast",
+    "media_broadcasts",
+    "ChunkCache",
+    "ChunkWriter",
+    "MediaEntry",
+    "media_cache",
+    "SegmentedFetcher",
+    "open_segmented",
+    "DEFAULT_MEDIA_TYPE",
+    "DEFAULT_PROXY_HEADERS",
+    "build_cached_response",
+    "build_client_response",
+    "build_upstream_headers",
+    "parse_content_range",
+    "parse_range",
+]
@@ -0,0 +1,232 @@
+import asyncio
+import io
+import logging
+import tempfile
+import time
+import zipfile
+from typing import AsyncIterator, List, Optional, Tuple
+
+import httpx
+
+from video_parsers.base import ImgInfo
+
+from .upstream import DEFAULT_PROXY_HEADERS
+
+logger = logging.getLogger(__name__)
+
+# 单个文件下载时在内存中保留的最大字节数, 超出后写入临时文件
+SPOOL_MAX_SIZE = 1024 * 1024
+
+# 压缩包中记录下载失败文件的文件名
+MISSING_FILENAME = "missing.txt"
+
+# 写入压缩包时单次读取的字节数
+COPY_BLOCK_SIZE = 64 * 1024
+
+# Content-Type -> 文件扩展名
+CONTENT_TYPE_EXTENSIONS = {
+    "image/jpeg": "jpg",
+    "image/jpg": "jpg",
+    "image/png": "png",
+    "image/webp": "webp",
+    "image/gif": "gif",
+    "image/heic": "heic",
+    "image/avif": "avif",
+    "video/mp4": "mp4",
+    "video/quicktime": "mov",
+}
+
+
+class _StreamBuffer(io.RawIOBase):
+    """
+    zipfile 的输出对象, 不支持 seek, zipfile 会改为在每个文件后写入 data descriptor
+    写入的数据暂存在内存中, 每写完一段就取出返回给客户端
+    """
+
+    def __init__(self):
+        self._chunks: List[bytes] = []
+
+    def writable(self) -> bool:
+        return True
+
+    def write(self, data) -> int:
+        self._chunks.append(bytes(data))
+        return len(data)
+
+    def drain(self) -> bytes:
+        """
+        取出暂存的数据
+        """
+        data = b"".join(self._chunks)
+        self._chunks.clear()
+        return data
+
+
+class _Spool:
+    """
+    单个文件的下载内容, 不超过 max_size 时保存在内存中, 超出后全部写入临时文件
+    临时文件的创建、读写及关闭都在线程池中执行, 不阻塞事件循环
+    """
+
+    def __init__(self, max_size: int = SPOOL_MAX_SIZE):
+        """
+        :param max_size: 内存中保留的最大字节数
+        """
+        self.max_size = max_size
+        self.size = 0
+        self._memory = bytearray()
+        self._file = None
+
+    async def write(self, data: bytes):
+        """
+        追加数据
+        :param data: 下载的数据
+        """
+        if self._file is None and len(self._memory) + len(data) > self.max_size:
+            file = await asyncio.to_thread(tempfile.TemporaryFile)
+            self._file = file
+            await asyncio.to_thread(file.write, bytes(self._memory))
+            self._memory = bytearray()
+
+        if self._file is None:
+            self._memory += data
+        else:
+            await asyncio.to_thread(self._file.write, data)
+        self.size += len(data)
+
+    async def iter_blocks(
+        self, block_size: int = COPY_BLOCK_SIZE
+    ) -> AsyncIterator[bytes]:
+        """
+        从头读取全部内容
+        :param block_size: 单次读取的字节数
+        :return:
+        """
+        if self._file is None:
+            view = memoryview(self._memory)
+            for offset in range(0, len(view), block_size):
+                yield bytes(view[offset : offset + block_size])
+            return
+
+        await asyncio.to_thread(self._file.seek, 0)
+        while True:
+            block = await asyncio.to_thread(self._file.read, block_size)
+            if not block:
+                return
+            yield block
+
+    def close(self):
+        """
+        释放内存及临时文件
+        """
+        file, self._file = self._file, None
+        self._memory = bytearray()
+        if file is not None:
+            asyncio.get_running_loop().run_in_executor(None, file.close)
+
+
+def _get_extension(content_type: str, default: str) -> str:
+    content_type = content_type.split(";")[0].strip().lower()
+    return CONTENT_TYPE_EXTENSIONS.get(content_type, default)
+
+
+async def _download(client: httpx.AsyncClient, url: str) -> Tuple[_Spool, str]:
+    spool = _Spool()
+    try:
+        async with client.stream("GET", url, headers=DEFAULT_PROXY_HEADERS) as response:
+            response.raise_for_status()
+            async for chunk in response.aiter_bytes():
+                await spool.write(chunk)
+            content_type = response.headers.get("content-type", "")
+    except BaseException:
+        spool.close()
+        raise
+    return spool, content_type
+
+
+def _zip_info(filename: str, size: int) -> zipfile.ZipInfo:
+    info = zipfile.ZipInfo(filename, time.localtime()[:6])
+    info.file_size = size
+    info.external_attr = 0o644 << 16
+    return info
+
+
+async def iter_album_zip(
+    client: httpx.AsyncClient,
+    images: List[ImgInfo],
+    concurrency: int = 4,
+    include_live_photo: bool = True,
+) -> AsyncIterator[bytes]:
+    """
+    并发下载图集图片, 以 ZIP (stored, 不压缩) 格式流式返回
+    每个文件下载完成后立即写入压缩包, 下载中及等待写入的文件数不超过 2 * concurrency,
+    单个文件超出 SPOOL_MAX_SIZE 后写入临时文件, 内存占用与图集大小无关
+    下载失败的文件跳过, 在压缩包末尾的 missing.txt 中列出文件名、地址及错误
+    :param client: 请求图片的客户端
+    :param images: 图集图片列表
+    :param concurrency: 最大并发下载数
+    :param include_live_photo: 是否包含 livephoto 视频
+    :return: 压缩包数据
+    """
+    files: List[Tuple[str, str, str]] = []
+    for index, image in enumerate(images, start=1):
+        if image.url:
+            files.append((f"{index:02d}", image.url, "jpg"))
+        if include_live_photo and image.live_photo_url:
+            files.append((f"{index:02d}_live", image.live_photo_url, "mp4"))
+
+    semaphore = asyncio.Semaphore(concurrency)
+    # 下载完成等待写入的文件: (文件名, 地址, 下载内容, 错误信息)
+    # 下载失败时文件名不带扩展名, 下载内容为 None
+    queue: "asyncio.Queue[Tuple[str, str, Optional[_Spool], str]]" = asyncio.Queue(
+        maxsize=concurrency
+    )
+
+    async def fetch(name: str, url: str, default_extension: str):
+        async with semaphore:
+            try:
+                spool, content_type = await _download(client, url)
+            except Exception as err:
+                # 单个文件下载失败时跳过, 不影响其它文件
+                logger.warning(f"Failed to download album file {url}: {err}")
+                # 每个文件在 missing.txt 中占一行
+                error = " ".join(str(err).split()) or type(err).__name__
+                await queue.put((name, url, None, error))
+                return
+            filename = f"{name}.{_get_extension(content_type, default_extension)}"
+            # 队列已满时保持占用并发名额, 限制等待写入的文件数
+            await queue.put((filename, url, spool, ""))
+
+    tasks = [asyncio.ensure_future(fetch(*file)) for file in files]
+    buffer = _StreamBuffer()
+    missing: List[str] = []
+    try:
+        with zipfile.ZipFile(buffer, "w", compression=zipfile.ZIP_STORED) as archive:
+            for _ in range(len(tasks)):
+                filename, url, spool, error = await queue.get()
+                if spool is None:
+                    missing.append(f"{filename}\t{url}\t{error}\n")
+                    continue
+                try:
+                    # 压缩包写入的是内存中的 _StreamBuffer, 只有读取临时文件涉及磁盘
+                    with archive.open(_zip_info(filename, spool.size), "w") as entry:
+                        async for block in spool.iter_blocks():
+                            entry.write(block)
+                            yield buffer.drain()
+                finally:
+                    spool.close()
+                # 关闭文件时写入的 data descriptor
+                yield buffer.drain()
+            if missing:
+                data = "".join(missing).encode("utf-8")
+                archive.writestr(_zip_info(MISSING_FILENAME, len(data)), data)
+        # 关闭压缩包时写入的中央目录
+        yield buffer.drain()
+    finally:
+        for task in tasks:
+            task.cancel()
+        # 取消后释放已下载但未写入的临时文件
+        while not queue.empty():
+            spool = queue.get_nowait()[2]
+            if spool is not None:
+                spool.close()
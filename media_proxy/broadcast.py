@@ -0,0 +1,318 @@
+import asyncio
+import dataclasses
+import logging
+import os
+import tempfile
+from collections import deque
+from typing import (
+    Any,
+    AsyncIterator,
+    Awaitable,
+    Callable,
+    Deque,
+    Dict,
+    Hashable,
+    Optional,
+    Tuple,
+)
+
+import httpx
+
+from video_parsers.singleflight import SingleFlight
+
+from .chunk_cache import ChunkWriter
+
+logger = logging.getLogger(__name__)
+
+# 每个广播在内存中保留的最大字节数, 超出后溢出到临时文件
+DEFAULT_MEMORY_LIMIT = 4 * 1024 * 1024
+
+# 从溢出文件单次读取的最大字节数
+FILE_READ_SIZE = 256 * 1024
+
+
+@dataclasses.dataclass
+class BroadcastStats:
+    """
+    广播统计
+    """
+
+    # 打开的上游连接数
+    upstreams: int = 0
+
+    # 订阅总数, 减去 upstreams 即为复用已有上游连接的订阅数
+    subscribers: int = 0
+
+    # 溢出到临时文件的广播数
+    spilled: int = 0
+
+
+class MediaBroadcast:
+    """
+    将一个上游响应广播给多个下载方
+    后台任务独立读取上游, 不等待任何订阅方, 慢的订阅方只会落后, 不会拖慢其它订阅方
+    已接收的数据先保存在内存中, 超出上限后全部写入临时文件, 内存中只保留最近的数据供实时跟随的订阅方读取
+    后加入的订阅方先回放已接收的数据, 再跟随实时数据
+    最后一个订阅方退出时, 上游未读取完则取消后台任务, 已读取完则关闭临时文件
+    """
+
+    def __init__(
+        self,
+        upstream: httpx.Response,
+        status_code: int,
+        headers: Dict[str, str],
+        writer: Optional[ChunkWriter] = None,
+        memory_limit: int = DEFAULT_MEMORY_LIMIT,
+        body: Optional[AsyncIterator[bytes]] = None,
+    ):
+        """
+        :param upstream: 上游响应, 广播结束后关闭
+        :param status_code: 返回给订阅方的状态码
+        :param headers: 返回给订阅方的响应头
+        :param writer: 视频分块缓存写入器
+        :param memory_limit: 内存中保留的最大字节数
+        :param body: 响应体迭代器 (如多连接分段下载), 为空时读取 upstream 的原始字节
+        """
+        self.status_code = status_code
+        self.headers = headers
+        self.memory_limit = memory_limit
+        self.subscribers = 0
+        self._upstream = upstream
+        self._writer = writer
+        self._body = body
+        self._memory = bytearray()
+        self._file = None
+        self._window: Deque[Tuple[int, bytes]] = deque()
+        self._window_size = 0
+        self._size = 0
+        self._done = False
+        self._closing = False
+        self._error: Optional[BaseException] = None
+        self._waiter = asyncio.Event()
+        self._task: Optional[asyncio.Task] = None
+
+    @property
+    def done(self) -> bool:
+        return self._done
+
+    @property
+    def closing(self) -> bool:
+        """
+        所有订阅方都已断开, 后台任务已取消, 不能再订阅
+        """
+        return self._closing
+
+    @property
+    def spilled(self) -> bool:
+        return self._file is not None
+
+    def start(self, on_done: Optional[Callable[["MediaBroadcast"], Any]] = None):
+        """
+        启动后台任务读取上游
+        :param on_done: 上游读取结束(成功或失败)后的回调
+        """
+        self._task = asyncio.ensure_future(self._pump())
+        if on_done is not None:
+            self._task.add_done_callback(lambda _: on_done(self))
+
+    def attach(self) -> "BroadcastSubscription":
+        """
+        订阅广播, 从第一个字节开始读取
+        :return: 订阅, 读取结束前放弃时须调用其 aclose
+        """
+        return BroadcastSubscription(self)
+
+    async def _pump(self):
+        try:
+            body = self._body if self._body is not None else self._upstream.aiter_raw()
+            async for chunk in body:
+                await self._append(chunk)
+                if self._writer is not None:
+                    await self._writer.feed(chunk)
+            if self._writer is not None:
+                await self._writer.finish()
+        except asyncio.CancelledError:
+            self._error = ConnectionError("broadcast cancelled")
+            raise
+        except Exception as err:
+            logger.error(f"Broadcast upstream error: {err}")
+            self._error = err
+        finally:
+            self._done = True
+            self._notify()
+            if not self.subscribers:
+                self._close_file()
+            if self._body is not None:
+                await self._body.aclose()
+            await self._upstream.aclose()
+
+    async def _append(self, chunk: bytes):
+        if self._file is None and len(self._memory) + len(chunk) > self.memory_limit:
+            # 创建临时文件涉及磁盘操作, 在线程池中执行
+            file = await asyncio.to_thread(tempfile.TemporaryFile)
+            await asyncio.to_thread(os.pwrite, file.fileno(), bytes(self._memory), 0)
+            self._file = file
+            self._memory = bytearray()
+
+        if self._file is None:
+            self._memory += chunk
+        else:
+            await asyncio.to_thread(os.pwrite, self._file.fileno(), chunk, self._size)
+            self._window.append((self._size, chunk))
+            self._window_size += len(chunk)
+            while self._window_size > self.memory_limit:
+                _, dropped = self._window.popleft()
+                self._window_size -= len(dropped)
+        self._size += len(chunk)
+        self._notify()
+
+    def _notify(self):
+        self._waiter.set()
+        self._waiter = asyncio.Event()
+
+    async def _read(self, offset: int) -> bytes:
+        if self._file is None:
+            return bytes(self._memory[offset : self._size])
+        if self._window and self._window[0][0] <= offset:
+            for chunk_offset, chunk in self._window:
+                if chunk_offset + len(chunk) > offset:
+                    return chunk[offset - chunk_offset :]
+        size = min(self._size - offset, FILE_READ_SIZE)
+        return await asyncio.to_thread(os.pread, self._file.fileno(), size, offset)
+
+    async def _next(self, offset: int) -> Optional[bytes]:
+        while True:
+            waiter = self._waiter
+            if offset < self._size:
+                return await self._read(offset)
+            if self._done:
+                if self._error is not None:
+                    raise self._error
+                return None
+            await waiter.wait()
+
+    def _release(self):
+        self.subscribers -= 1
+        if self.subscribers:
+            return
+        if self._task is not None and not self._done:
+            # 所有订阅方都已断开, 不再继续下载, 临时文件在后台任务结束时关闭
+            # 取消后到后台任务结束前 done 仍为 False, 先标记为关闭, 不再接受新的订阅
+            self._closing = True
+            self._task.cancel()
+        else:
+            self._close_file()
+
+    def _close_file(self):
+        file, self._file = self._file, None
+        self._window.clear()
+        if file is not None:
+            # 关闭时释放磁盘空间, 在线程池中执行
+            asyncio.get_running_loop().run_in_executor(None, file.close)
+
+
+class BroadcastSubscription:
+    """
+    广播的一个订阅方, 创建时计入订阅数, 读取结束、出错或 aclose 时移出 (只移出一次)
+    没有开始读取就放弃 (如客户端在响应开始前断开) 时同样需要调用 aclose
+    """
+
+    def __init__(self, broadcast: MediaBroadcast):
+        """
+        :param broadcast: 订阅的广播
+        """
+        self._broadcast = broadcast
+        self._offset = 0
+        self._closed = False
+        broadcast.subscribers += 1
+
+    def __aiter__(self) -> "BroadcastSubscription":
+        return self
+
+    async def __anext__(self) -> bytes:
+        if self._closed:
+            raise StopAsyncIteration
+        try:
+            data = await self._broadcast._next(self._offset)
+        except BaseException:
+            self._close()
+            raise
+        if data is None:
+            self._close()
+            raise StopAsyncIteration
+        self._offset += len(data)
+        return data
+
+    async def aclose(self):
+        """
+        退出订阅
+        """
+        self._close()
+
+    def _close(self):
+        if not self._closed:
+            self._closed = True
+            self._broadcast._release()
+
+
+class BroadcastHub:
+    """
+    相同 key 的并发代理请求共享一个上游响应
+    打开上游的过程通过 SingleFlight 合并, 打开后到读取结束前加入的请求订阅同一个广播
+    """
+
+    def __init__(self, memory_limit: int = DEFAULT_MEMORY_LIMIT):
+        """
+        :param memory_limit: 每个广播在内存中保留的最大字节数
+        """
+        self.memory_limit = memory_limit
+        self._broadcasts: Dict[Hashable, MediaBroadcast] = {}
+        self._single_flight = SingleFlight()
+        self.stats = BroadcastStats()
+
+    def __len__(self) -> int:
+        return len(self._broadcasts)
+
+    async def join(
+        self,
+        key: Hashable,
+        open_func: Callable[[], Awaitable[MediaBroadcast]],
+    ) -> Tuple[MediaBroadcast, BroadcastSubscription]:
+        """
+        订阅 key 对应的广播, 不存在时调用 open_func 打开上游
+        :param key: 广播 key, 相同 key 的请求必须返回相同的内容
+        :param open_func: 返回协程的函数, 协程返回未启动的广播, 只有首个调用方会执行
+        :return: (广播, 订阅), 订阅未读取完就放弃时须调用其 aclose
+        """
+        broadcast = self._broadcasts.get(key)
+        if broadcast is None or broadcast.done or broadcast.closing:
+            broadcast = await self._single_flight.do(
+                key, lambda: self._open(key, open_func)
+            )
+            if broadcast.closing:
+                # 等待打开期间先加入的订阅方已全部断开, 广播已取消, 重新打开
+                broadcast = await self._single_flight.do(
+                    key, lambda: self._open(key, open_func)
+                )
+        self.stats.subscribers += 1
+        return broadcast, broadcast.attach()
+
+    async def _open(
+        self, key: Hashable, open_func: Callable[[], Awaitable[MediaBroadcast]]
+    ) -> MediaBroadcast:
+        broadcast = await open_func()
+        broadcast.memory_limit = self.memory_limit
+        self.stats.upstreams += 1
+        self._broadcasts[key] = broadcast
+        broadcast.start(on_done=lambda b: self._on_done(key, b))
+        return broadcast
+
+    def _on_done(self, key: Hashable, broadcast: MediaBroadcast):
+        if self._broadcasts.get(key) is broadcast:
+            del self._broadcasts[key]
+        if broadcast.spilled:
+            self.stats.spilled += 1
+
+
+# 所有代理请求共享的广播
+media_broadcasts = BroadcastHub()
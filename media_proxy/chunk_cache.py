@@ -0,0 +1,425 @@
+import asyncio
+import dataclasses
+import hashlib
+import itertools
+import logging
+import os
+import shutil
+import time
+from collections import OrderedDict
+from typing import AsyncIterator, Callable, Dict, Optional, Set, Tuple
+
+import aiofiles
+import aiofiles.os
+import httpx
+
+from utils import get_url_expire_time
+from video_parsers.cache import CacheStats
+
+from .upstream import DEFAULT_MEDIA_TYPE, parse_content_range
+
+logger = logging.getLogger(__name__)
+
+# 视频缓存目录, 设置为空字符串时关闭缓存
+DEFAULT_MEDIA_CACHE_DIR = os.getenv("PARSE_VIDEO_MEDIA_CACHE", ".cache/media")
+
+# 视频缓存占用的最大磁盘空间(字节)
+DEFAULT_MEDIA_CACHE_MAX_BYTES = int(
+    os.getenv("PARSE_VIDEO_MEDIA_CACHE_MAX_BYTES", str(2 * 1024**3))
+)
+
+# 分块大小, 分块按文件内的绝对偏移对齐
+DEFAULT_CHUNK_SIZE = 1024 * 1024
+
+# 地址过期前预留的时间(秒), 地址即将过期时不再使用缓存
+URL_EXPIRE_MARGIN = 60
+
+# 分块文件存放在缓存目录下的这个子目录中, 启动时只清空该子目录
+CHUNK_DIR_NAME = "parse-video-chunks"
+
+# 子目录中的标记文件, 只有带标记的子目录才会被清空, 避免误删同名的其他目录
+CHUNK_DIR_MARKER = ".parse-video-media-cache"
+
+
+@dataclasses.dataclass
+class MediaEntry:
+    """
+    单个视频地址的缓存信息
+    """
+
+    # 文件总大小
+    total_size: int
+
+    # 上游返回的 Content-Type
+    content_type: str
+
+    # 上游返回的 ETag
+    etag: str = ""
+
+    # 上游返回的 Last-Modified
+    last_modified: str = ""
+
+    # 过期时间的 unix 时间戳
+    expire_at: float = 0
+
+    # 分块文件所在目录, 每次创建都使用新目录, 旧目录可在后台删除
+    path: str = ""
+
+    # 已缓存的分块下标
+    chunks: Set[int] = dataclasses.field(default_factory=set)
+
+    # 正在读取的请求数, 读取期间分块不会被淘汰
+    readers: int = 0
+
+    # 读取期间被丢弃, 最后一个读取结束后再删除目录
+    dropped: bool = False
+
+
+class ChunkCache:
+    """
+    代理视频的磁盘分块缓存
+    以地址的 sha256 为 key, 文件按固定大小分块存储, 只下载了一部分的文件也可以响应落在已缓存分块内的 Range 请求
+    按分块的字节数做 LRU 淘汰, 有效期不超过签名地址的过期时间
+    索引只保存在内存中, 服务启动时清空缓存目录下由缓存创建的分块子目录
+    """
+
+    def __init__(
+        self,
+        directory: Optional[str] = DEFAULT_MEDIA_CACHE_DIR,
+        max_bytes: int = DEFAULT_MEDIA_CACHE_MAX_BYTES,
+        chunk_size: int = DEFAULT_CHUNK_SIZE,
+        max_ttl: float = 3600,
+        clock: Callable[[], float] = time.time,
+    ):
+        """
+        :param directory: 缓存目录, 为空时不缓存
+        :param max_bytes: 最大占用字节数, 超出时淘汰最久未使用的分块
+        :param chunk_size: 分块大小
+        :param max_ttl: 地址没有过期时间时的有效期(秒)
+        :param clock: 时钟函数, 返回 unix 时间戳
+        """
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.chunk_size = chunk_size
+        self.max_ttl = max_ttl
+        self._clock = clock
+        self._entries: Dict[str, MediaEntry] = {}
+        self._lru: "OrderedDict[Tuple[str, int], int]" = OrderedDict()
+        self._sequence = itertools.count()
+        self.size_bytes = 0
+        self.stats = CacheStats()
+
+    @property
+    def enabled(self) -> bool:
+        return bool(self.directory) and self.max_bytes > 0
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    @staticmethod
+    def _key(url: str) -> str:
+        return hashlib.sha256(url.encode("utf-8")).hexdigest()
+
+    @property
+    def chunk_directory(self) -> str:
+        """
+        分块文件所在的子目录
+        """
+        return os.path.join(self.directory, CHUNK_DIR_NAME)
+
+    def load(self):
+        """
+        清空并创建分块子目录, 在服务启动时调用 (会删除文件, 不要在事件循环中直接调用)
+        缓存目录可能是 /tmp 等共享目录, 只删除带有标记文件的分块子目录, 不删除其他文件
+        """
+        if not self.enabled:
+            return
+        chunk_directory = self.chunk_directory
+        if os.path.isfile(os.path.join(chunk_directory, CHUNK_DIR_MARKER)):
+            shutil.rmtree(chunk_directory, ignore_errors=True)
+        elif os.path.lexists(chunk_directory):
+            raise RuntimeError(
+                f"media cache directory {chunk_directory} already exists "
+                f"and was not created by the media cache"
+            )
+        os.makedirs(chunk_directory, exist_ok=True)
+        with open(os.path.join(chunk_directory, CHUNK_DIR_MARKER), "w"):
+            pass
+
+    def get_ttl(self, url: str) -> float:
+        """
+        计算地址的缓存有效期, 不超过签名地址的过期时间
+        :param url: 视频地址
+        :return: 有效期(秒), 小于等于0时不缓存
+        """
+        ttl = self.max_ttl
+        expire_time = get_url_expire_time(url)
+        if expire_time is not None:
+            ttl = min(ttl, expire_time - self._clock() - URL_EXPIRE_MARGIN)
+        return ttl
+
+    def _get_entry(self, key: str) -> Optional[MediaEntry]:
+        entry = self._entries.get(key)
+        if entry is not None and entry.expire_at <= self._clock():
+            self._drop_entry(key)
+            self.stats.expirations += 1
+            return None
+        return entry
+
+    def lookup(
+        self, url: str, start: int = 0, end: Optional[int] = None
+    ) -> Optional[Tuple[MediaEntry, int, int]]:
+        """
+        查找完整覆盖请求区间的缓存
+        :param url: 视频地址
+        :param start: 区间起始偏移
+        :param end: 区间结束偏移(包含), None 表示到文件末尾
+        :return: (缓存信息, start, end), 未完整缓存时返回 None
+        """
+        if not self.enabled:
+            return None
+        key = self._key(url)
+        entry = self._get_entry(key)
+        if entry is None or start >= entry.total_size:
+            self.stats.misses += 1
+            return None
+
+        if end is None or end >= entry.total_size:
+            end = entry.total_size - 1
+        indexes = range(start // self.chunk_size, end // self.chunk_size + 1)
+        if any(index not in entry.chunks for index in indexes):
+            self.stats.misses += 1
+            return None
+
+        for index in indexes:
+            self._lru.move_to_end((key, index))
+        self.stats.hits += 1
+        return entry, start, end
+
+    async def iter_range(
+        self, entry: MediaEntry, start: int, end: int
+    ) -> AsyncIterator[bytes]:
+        """
+        从磁盘读取区间内的数据, 参数为 lookup 的返回值
+        读取期间该缓存的分块不会被淘汰, 被丢弃 (过期或内容变化) 时也等读取结束后再删除
+        :param entry: 缓存信息
+        :param start: 区间起始偏移
+        :param end: 区间结束偏移(包含)
+        :return:
+        """
+        entry.readers += 1
+        try:
+            for index in range(start // self.chunk_size, end // self.chunk_size + 1):
+                chunk_start = index * self.chunk_size
+                path = os.path.join(entry.path, str(index))
+                async with aiofiles.open(path, "rb") as f:
+                    data = await f.read()
+                yield data[max(start - chunk_start, 0) : end - chunk_start + 1]
+        finally:
+            entry.readers -= 1
+            if not entry.readers and entry.dropped:
+                self._remove_directory(entry.path)
+
+    def writer(
+        self,
+        url: str,
+        offset: int,
+        total_size: int,
+        content_type: str,
+        etag: str = "",
+        last_modified: str = "",
+    ) -> Optional["ChunkWriter"]:
+        """
+        创建写入器, 将上游返回的数据按分块写入缓存
+        :param url: 视频地址
+        :param offset: 上游返回数据在文件内的起始偏移
+        :param total_size: 文件总大小
+        :param content_type: Content-Type
+        :param etag: ETag
+        :param last_modified: Last-Modified
+        :return: 不需要缓存时返回 None
+        """
+        if not self.enabled or total_size <= 0 or total_size > self.max_bytes:
+            return None
+        ttl = self.get_ttl(url)
+        if ttl <= 0:
+            return None
+
+        key = self._key(url)
+        entry = self._get_entry(key)
+        if entry is not None and (entry.total_size != total_size or entry.etag != etag):
+            # 同一地址的内容发生了变化, 丢弃旧的分块
+            self._drop_entry(key)
+            entry = None
+        if entry is None:
+            entry = MediaEntry(
+                total_size=total_size,
+                content_type=content_type,
+                etag=etag,
+                last_modified=last_modified,
+                expire_at=self._clock() + ttl,
+                path=os.path.join(
+                    self.chunk_directory, key[:2], f"{key}.{next(self._sequence)}"
+                ),
+            )
+            self._entries[key] = entry
+        return ChunkWriter(self, key, offset, total_size)
+
+    def writer_for(self, url: str, upstream: httpx.Response) -> Optional["ChunkWriter"]:
+        """
+        根据上游响应创建写入器, 只缓存能确定文件总大小且未压缩的响应
+        :param url: 视频地址
+        :param upstream: 上游响应
+        :return: 不需要缓存时返回 None
+        """
+        if upstream.headers.get("content-encoding", "identity") != "identity":
+            return None
+        if upstream.status_code == 200:
+            offset = 0
+            total_size = int(upstream.headers.get("content-length") or -1)
+        elif upstream.status_code == 206:
+            content_range = parse_content_range(upstream.headers.get("content-range"))
+            if content_range is None:
+                return None
+            offset, _, total_size = content_range
+        else:
+            return None
+        return self.writer(
+            url,
+            offset,
+            total_size,
+            upstream.headers.get("content-type", DEFAULT_MEDIA_TYPE),
+            etag=upstream.headers.get("etag", ""),
+            last_modified=upstream.headers.get("last-modified", ""),
+        )
+
+    async def store_chunk(self, key: str, index: int, data: bytes):
+        """
+        写入一个分块, 写入完成后才对读取可见
+        :param key: 缓存 key
+        :param index: 分块下标
+        :param data: 分块数据
+        """
+        entry = self._entries.get(key)
+        if entry is None or index in entry.chunks:
+            return
+
+        path = os.path.join(entry.path, str(index))
+        # 并发写入同一分块时各自使用不同的临时文件
+        tmp_path = f"{path}.{next(self._sequence)}.tmp"
+        await aiofiles.os.makedirs(entry.path, exist_ok=True)
+        async with aiofiles.open(tmp_path, "wb") as f:
+            await f.write(data)
+        await aiofiles.os.replace(tmp_path, path)
+
+        # 写入期间缓存可能已被淘汰或替换
+        if self._entries.get(key) is not entry:
+            await self._remove_file(path)
+            return
+        entry.chunks.add(index)
+        # 并发写入同一分块时, 先完成的写入已计入大小, 替换而不是重复累加
+        self.size_bytes -= self._lru.pop((key, index), 0)
+        self._lru[(key, index)] = len(data)
+        self.size_bytes += len(data)
+        await self._evict()
+
+    async def _evict(self):
+        if self.size_bytes <= self.max_bytes:
+            return
+        # 正在读取的缓存跳过, 暂时超出上限, 之后写入分块时再次淘汰
+        for key, index in list(self._lru):
+            if self.size_bytes <= self.max_bytes:
+                return
+            entry = self._entries.get(key)
+            if entry is None or entry.readers or (key, index) not in self._lru:
+                continue
+            self.size_bytes -= self._lru.pop((key, index))
+            self.stats.evictions += 1
+            entry.chunks.discard(index)
+            if not entry.chunks:
+                del self._entries[key]
+            await self._remove_file(os.path.join(entry.path, str(index)))
+
+    def _drop_entry(self, key: str):
+        entry = self._entries.pop(key, None)
+        if entry is None:
+            return
+        for index in entry.chunks:
+            self.size_bytes -= self._lru.pop((key, index), 0)
+        if entry.readers:
+            entry.dropped = True
+        else:
+            self._remove_directory(entry.path)
+
+    @staticmethod
+    def _remove_directory(path: str):
+        # 在线程池中删除目录, 避免阻塞事件循环
+        asyncio.get_running_loop().run_in_executor(None, shutil.rmtree, path, True)
+
+    @staticmethod
+    async def _remove_file(path: str):
+        try:
+            await aiofiles.os.remove(path)
+        except OSError:
+            pass
+
+
+class ChunkWriter:
+    """
+    将连续的上游数据切分为对齐的分块写入缓存
+    起始偏移不在分块边界时跳过第一个不完整的分块, 只有到达文件末尾时才写入不足一个分块的尾部
+    """
+
+    def __init__(self, cache: ChunkCache, key: str, offset: int, total_size: int):
+        self._cache = cache
+        self._key = key
+        self._total_size = total_size
+        chunk_size = cache.chunk_size
+        self._index = -(-offset // chunk_size)
+        self._skip = self._index * chunk_size - offset
+        self._buffer = bytearray()
+        self._failed = False
+
+    async def feed(self, data: bytes):
+        """
+        写入一段数据
+        :param data: 上游返回的数据
+        """
+        if self._failed:
+            return
+        if self._skip:
+            if len(data) <= self._skip:
+                self._skip -= len(data)
+                return
+            data = data[self._skip :]
+            self._skip = 0
+
+        chunk_size = self._cache.chunk_size
+        self._buffer += data
+        while len(self._buffer) >= chunk_size:
+            await self._store(bytes(self._buffer[:chunk_size]))
+            del self._buffer[:chunk_size]
+
+    async def finish(self):
+        """
+        数据传输完成, 写入文件末尾的最后一个分块
+        """
+        end = self._index * self._cache.chunk_size + len(self._buffer)
+        if self._buffer and end == self._total_size:
+            await self._store(bytes(self._buffer))
+        self._buffer.clear()
+
+    async def _store(self, data: bytes):
+        if self._failed:
+            return
+        try:
+            await self._cache.store_chunk(self._key, self._index, data)
+        except OSError as err:
+            # 磁盘写入失败不影响代理, 放弃本次缓存
+            logger.warning(f"Failed to cache media chunk: {err}")
+            self._failed = True
+        self._index += 1
+
+
+# 所有代理请求共享的视频分块缓存
+media_cache = ChunkCache()
@@ -0,0 +1,230 @@
+import asyncio
+import time
+from collections import deque
+from typing import AsyncIterator, Deque, Dict, Optional
+
+import httpx
+
+from .upstream import parse_content_range
+
+# 剩余长度小于该值时不分段, 直接单连接转发
+MIN_SEGMENTED_SIZE = 4 * 1024 * 1024
+
+
+class RangeNotSupported(Exception):
+    """
+    上游没有按请求的区间返回分段 (如忽略 Range 返回了 200)
+    """
+
+
+class SegmentedFetcher:
+    """
+    多连接分段下载
+    部分 CDN 对单个连接限速, 并发请求连续的多个区间后按顺序拼接, 可以成倍提高下载速度
+    分段大小按单连接速度调整为约 target_seconds 秒的数据量;
+    增加并发后单连接速度没有明显下降说明带宽未饱和, 继续增加并发, 明显下降时减少并发
+    分段请求的重试由客户端的 RetryTransport 负责; 后续分段不再按区间返回时, 从当前位置改为单连接读取
+    """
+
+    def __init__(
+        self,
+        client: httpx.AsyncClient,
+        url: str,
+        headers: Dict[str, str],
+        parallel: int = 2,
+        max_parallel: int = 6,
+        segment_size: int = 1024 * 1024,
+        min_segment_size: int = 256 * 1024,
+        max_segment_size: int = 8 * 1024 * 1024,
+        target_seconds: float = 2.0,
+    ):
+        """
+        :param client: 请求上游的客户端
+        :param url: 视频地址 (跳转后的最终地址)
+        :param headers: 请求上游的请求头, Range 由分段覆盖
+        :param parallel: 初始并发数
+        :param max_parallel: 最大并发数
+        :param segment_size: 初始分段大小
+        :param min_segment_size: 最小分段大小
+        :param max_segment_size: 最大分段大小, 并发数 * 最大分段大小即为最大内存占用
+        :param target_seconds: 单个分段期望的下载耗时(秒)
+        """
+        self.client = client
+        self.url = url
+        self.headers = headers
+        self.parallel = parallel
+        self.max_parallel = max_parallel
+        self.segment_size = segment_size
+        self.min_segment_size = min_segment_size
+        self.max_segment_size = max_segment_size
+        self.target_seconds = target_seconds
+        # 单连接速度(字节/秒)的 EWMA 及历史最大值
+        self._rate = 0.0
+        self._best_rate = 0.0
+
+    async def iter_bytes(
+        self, first: httpx.Response, start: int, end: int
+    ) -> AsyncIterator[bytes]:
+        """
+        按顺序返回 [start, end] 区间的数据
+        :param first: 已打开的 start 开始的 206 响应, 用于下载第一个分段, 结束后关闭
+        :param start: 区间起始偏移
+        :param end: 区间结束偏移(包含)
+        :return:
+        """
+        tasks: Deque[asyncio.Task] = deque()
+        first_end = min(start + self.segment_size, end + 1)
+        next_offset = first_end
+
+        def schedule():
+            nonlocal next_offset
+            while len(tasks) < self.parallel and next_offset <= end:
+                segment_end = min(next_offset + self.segment_size, end + 1) - 1
+                tasks.append(
+                    asyncio.ensure_future(self._fetch(next_offset, segment_end))
+                )
+                next_offset = segment_end + 1
+
+        try:
+            # 第一个分段直接读取已打开的响应, 同时并发请求后续分段
+            schedule()
+            remaining = first_end - start
+            began = time.monotonic()
+            async for chunk in first.aiter_raw():
+                if len(chunk) >= remaining:
+                    yield chunk[:remaining]
+                    remaining = 0
+                    break
+                remaining -= len(chunk)
+                yield chunk
+            await first.aclose()
+            if remaining:
+                raise httpx.RemoteProtocolError(
+                    "upstream closed before the first segment completed"
+                )
+            self._update(first_end - start, time.monotonic() - began)
+
+            offset = first_end
+            while tasks:
+                try:
+                    data = await tasks.popleft()
+                except RangeNotSupported:
+                    async for chunk in self._iter_single(offset, end):
+                        yield chunk
+                    return
+                offset += len(data)
+                schedule()
+                yield data
+        finally:
+            await first.aclose()
+            for task in tasks:
+                if task.done() and not task.cancelled():
+                    # 避免 "exception was never retrieved" 警告
+                    task.exception()
+                task.cancel()
+
+    async def _fetch(self, start: int, end: int) -> bytes:
+        headers = {**self.headers, "Range": f"bytes={start}-{end}"}
+        began = time.monotonic()
+        async with self.client.stream("GET", self.url, headers=headers) as response:
+            response.raise_for_status()
+            content_range = parse_content_range(response.headers.get("content-range"))
+            if (
+                response.status_code != 206
+                or content_range is None
+                or content_range[:2] != (start, end)
+            ):
+                # 不读取响应体, 忽略 Range 的 200 响应可能是整个文件
+                raise RangeNotSupported(
+                    f"unexpected segment response {response.status_code} "
+                    f"for bytes={start}-{end}"
+                )
+            content = await response.aread()
+        if len(content) != end - start + 1:
+            raise httpx.RemoteProtocolError(
+                f"incomplete segment response for bytes={start}-{end}"
+            )
+        self._update(len(content), time.monotonic() - began)
+        return content
+
+    async def _iter_single(self, start: int, end: int) -> AsyncIterator[bytes]:
+        """
+        单连接读取 [start, end] 区间的数据, 上游忽略 Range 返回 200 时跳过 start 之前的数据
+        """
+        headers = {**self.headers, "Range": f"bytes={start}-{end}"}
+        async with self.client.stream("GET", self.url, headers=headers) as response:
+            response.raise_for_status()
+            skip = 0
+            if response.status_code == 206:
+                content_range = parse_content_range(
+                    response.headers.get("content-range")
+                )
+                if content_range is None or content_range[0] != start:
+                    raise httpx.RemoteProtocolError(
+                        f"unexpected range response for bytes={start}-{end}"
+                    )
+            else:
+                skip = start
+
+            remaining = end - start + 1
+            async for chunk in response.aiter_raw():
+                if skip:
+                    if len(chunk) <= skip:
+                        skip -= len(chunk)
+                        continue
+                    chunk = chunk[skip:]
+                    skip = 0
+                if len(chunk) >= remaining:
+                    yield chunk[:remaining]
+                    return
+                remaining -= len(chunk)
+                yield chunk
+        raise httpx.RemoteProtocolError(
+            f"upstream closed before bytes={start}-{end} completed"
+        )
+
+    def _update(self, size: int, elapsed: float):
+        if elapsed <= 0:
+            return
+        rate = size / elapsed
+        self._rate = rate if not self._rate else 0.7 * self._rate + 0.3 * rate
+        self._best_rate = max(self._best_rate, self._rate)
+
+        if self._rate >= 0.8 * self._best_rate:
+            self.parallel = min(self.parallel + 1, self.max_parallel)
+        elif self._rate < 0.5 * self._best_rate:
+            self.parallel = max(self.parallel - 1, 1)
+        self.segment_size = int(
+            min(
+                max(self._rate * self.target_seconds, self.min_segment_size),
+                self.max_segment_size,
+            )
+        )
+
+
+def open_segmented(
+    client: httpx.AsyncClient,
+    upstream: httpx.Response,
+    headers: Dict[str, str],
+) -> Optional[AsyncIterator[bytes]]:
+    """
+    尝试以多连接分段下载上游响应的剩余部分
+    上游忽略 Range (返回 200)、内容经过压缩或剩余长度较小时返回 None, 由调用方按单连接转发
+    :param client: 请求上游的客户端
+    :param upstream: 已打开的上游响应
+    :param headers: 请求上游的请求头
+    :return: 按顺序返回数据的迭代器
+    """
+    if upstream.status_code != 206:
+        return None
+    if upstream.headers.get("content-encoding", "identity") != "identity":
+        return None
+    content_range = parse_content_range(upstream.headers.get("content-range"))
+    if content_range is None:
+        return None
+    start, end, _ = content_range
+    if end - start + 1 < MIN_SEGMENTED_SIZE:
+        return None
+
+    fetcher = SegmentedFetcher(client, str(upstream.url), headers)
+    return fetcher.iter_bytes(upstream, start, end)
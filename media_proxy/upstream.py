@@ -0,0 +1,157 @@
+import re
+from typing import Dict, Mapping, Optional, Tuple
+
+import httpx
+
+# 模拟真实的移动端请求, 绕过防盗链
+DEFAULT_PROXY_HEADERS = {
+    "User-Agent": (
+        "Mozilla/5.0 (iPhone; CPU iPhone OS 16_6 like Mac OS X) "
+        "AppleWebKit/605.1.15 (KHTML, like Gecko) Version/16.6 "
+        "Mobile/15E148 Safari/604.1"
+    ),
+    "Accept": "*/*",
+    "Accept-Encoding": "identity;q=1, *;q=0",
+    "Accept-Language": "zh-CN,zh;q=0.9",
+}
+
+# 部分 CDN 只响应带 Range 的请求, 客户端未指定 Range 时请求完整内容
+FULL_RANGE = "bytes=0-"
+
+# 透传给上游的客户端请求头
+PASSTHROUGH_REQUEST_HEADERS = ("range", "if-range")
+
+# 透传给客户端的上游响应头
+PASSTHROUGH_RESPONSE_HEADERS = (
+    "content-length",
+    "content-range",
+    "content-type",
+    "content-encoding",
+    "etag",
+    "last-modified",
+)
+
+DEFAULT_MEDIA_TYPE = "video/mp4"
+
+_CONTENT_RANGE_PATTERN = re.compile(r"bytes\s+(\d+)-(\d+)/(\d+|\*)")
+_RANGE_PATTERN = re.compile(r"bytes\s*=\s*(\d+)\s*-\s*(\d*)")
+
+
+def build_upstream_headers(client_headers: Mapping[str, str]) -> Dict[str, str]:
+    """
+    构建请求上游的请求头, 透传客户端的 Range / If-Range
+    :param client_headers: 客户端请求头
+    :return:
+    """
+    headers = dict(DEFAULT_PROXY_HEADERS)
+    for name in PASSTHROUGH_REQUEST_HEADERS:
+        value = client_headers.get(name)
+        if value:
+            headers[name.title()] = value
+    headers.setdefault("Range", FULL_RANGE)
+    return headers
+
+
+def parse_content_range(value: Optional[str]) -> Optional[Tuple[int, int, int]]:
+    """
+    解析 Content-Range 响应头
+    :param value: 如 bytes 0-1023/4096
+    :return: (start, end, total), total 未知时为 -1, 无法解析时返回 None
+    """
+    if not value:
+        return None
+    match = _CONTENT_RANGE_PATTERN.match(value.strip())
+    if not match:
+        return None
+    start, end, total = match.groups()
+    return int(start), int(end), -1 if total == "*" else int(total)
+
+
+def parse_range(value: Optional[str]) -> Optional[Tuple[int, Optional[int]]]:
+    """
+    解析客户端的 Range 请求头, 只支持单个区间
+    :param value: 如 bytes=0-1023, bytes=1024-
+    :return: (start, end), end 未指定时为 None; 后缀区间 (bytes=-500) 及多区间返回 None
+    """
+    if not value or "," in value:
+        return None
+    match = _RANGE_PATTERN.fullmatch(value.strip())
+    if not match:
+        return None
+    start, end = match.groups()
+    if end and int(end) < int(start):
+        return None
+    return int(start), int(end) if end else None
+
+
+def build_cached_response(
+    total_size: int,
+    start: int,
+    end: int,
+    content_type: str,
+    etag: str = "",
+    last_modified: str = "",
+    partial: bool = False,
+) -> Tuple[int, Dict[str, str]]:
+    """
+    构建由缓存响应时的状态码和响应头
+    :param total_size: 文件总大小
+    :param start: 区间起始偏移
+    :param end: 区间结束偏移(包含)
+    :param content_type: Content-Type
+    :param etag: ETag
+    :param last_modified: Last-Modified
+    :param partial: 客户端是否请求了 Range
+    :return: (status_code, headers)
+    """
+    headers = {
+        "content-length": str(end - start + 1),
+        "content-type": content_type or DEFAULT_MEDIA_TYPE,
+        "accept-ranges": "bytes",
+    }
+    if etag:
+        headers["etag"] = etag
+    if last_modified:
+        headers["last-modified"] = last_modified
+    if not partial:
+        return 200, headers
+    headers["content-range"] = f"bytes {start}-{end}/{total_size}"
+    return 206, headers
+
+
+def build_client_response(
+    upstream: httpx.Response, client_range: Optional[str]
+) -> Tuple[int, Dict[str, str]]:
+    """
+    根据上游响应构建返回给客户端的状态码和响应头
+    客户端没有请求 Range, 而上游因为默认的 bytes=0- 返回了完整内容的 206 时, 转换为 200;
+    上游只返回了前一部分时原样返回 206, 客户端可以继续请求剩余部分
+    :param upstream: 上游响应
+    :param client_range: 客户端的 Range 请求头
+    :return: (status_code, headers)
+    """
+    headers = {}
+    for name in PASSTHROUGH_RESPONSE_HEADERS:
+        value = upstream.headers.get(name)
+        if value:
+            headers[name] = value
+    headers.setdefault("content-type", DEFAULT_MEDIA_TYPE)
+
+    status_code = upstream.status_code
+    if status_code == 206 and not client_range:
+        content_range = parse_content_range(upstream.headers.get("content-range"))
+        if content_range:
+            start, end, total = content_range
+            # 只有上游确实返回了整个文件时才转换, 只返回了一部分时保留 206
+            if start == 0 and end == total - 1:
+                status_code = 200
+                headers.pop("content-range", None)
+                headers["content-length"] = str(total)
+
+    # 上游支持 Range (返回过 206 或声明了 accept-ranges) 时, 告知客户端可以断点续传
+    if upstream.status_code == 206 or (
+        upstream.headers.get("accept-ranges", "").lower() == "bytes"
+    ):
+        headers["accept-ranges"] = "bytes"
+
+    return status_code, headers
@@ -88,11 +88,15 @@ class VideoInfo:
     author: VideoAuthor = dataclasses.field(default_factory=VideoAuthor)
 
 
+# UserAgent 创建时会读取 UA 数据文件, 只创建一次
+_user_agent = fake_useragent.UserAgent(os=["ios"])
+
+
 class BaseParser(ABC):
     @staticmethod
     def get_default_headers() -> Dict[str, str]:
         return {
-            "User-Agent": fake_useragent.UserAgent(os=["ios"]).random,
+            "User-Agent": _user_agent.random,
         }
 
     @abstractmethod
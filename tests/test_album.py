@@ -0,0 +1,60 @@
+import asyncio
+import io
+import zipfile
+
+import httpx
+
+from media_proxy import album
+from video_parsers.base import ImgInfo
+
+
+def _handler(request: httpx.Request) -> httpx.Response:
+    if request.url.path == "/missing.jpg":
+        return httpx.Response(404)
+    if request.url.path == "/live.mp4":
+        return httpx.Response(
+            200, content=b"v" * 100, headers={"content-type": "video/mp4"}
+        )
+    return httpx.Response(200, content=b"i" * 10, headers={"content-type": "image/png"})
+
+
+def _download_zip(images, **kwargs) -> zipfile.ZipFile:
+    async def run():
+        client = httpx.AsyncClient(transport=httpx.MockTransport(_handler))
+        async with client:
+            return b"".join(
+                [
+                    chunk
+                    async for chunk in album.iter_album_zip(client, images, **kwargs)
+                ]
+            )
+
+    return zipfile.ZipFile(io.BytesIO(asyncio.run(run())))
+
+
+def test_album_zip_spools_large_files_and_lists_failures(monkeypatch):
+    # 超过 16 字节的文件写入临时文件
+    monkeypatch.setattr(album, "SPOOL_MAX_SIZE", 16)
+    images = [
+        ImgInfo(
+            url="https://example.com/a.png",
+            live_photo_url="https://example.com/live.mp4",
+        ),
+        ImgInfo(url="https://example.com/missing.jpg"),
+    ]
+    archive = _download_zip(images)
+
+    assert sorted(archive.namelist()) == ["01.png", "01_live.mp4", "missing.txt"]
+    assert archive.read("01.png") == b"i" * 10
+    assert archive.read("01_live.mp4") == b"v" * 100
+    missing = archive.read("missing.txt").decode("utf-8").splitlines()
+    assert len(missing) == 1
+    assert missing[0].startswith("02\thttps://example.com/missing.jpg\t")
+    assert "404" in missing[0]
+
+
+def test_album_zip_without_failures_has_no_missing_list():
+    archive = _download_zip(
+        [ImgInfo(url="https://example.com/a.png")], include_live_photo=False
+    )
+    assert archive.namelist() == ["01.png"]
@@ -0,0 +1,119 @@
+import asyncio
+
+import pytest
+
+import video_parsers
+from video_parsers import BatchItem, BatchParser, VideoInfo, VideoSource
+
+
+class _FakeParser:
+    """
+    按视频ID控制耗时和结果的解析器, 记录并发数及被取消的解析
+    """
+
+    # 所有来源合计的并发数
+    total_active = 0
+    max_total_active = 0
+
+    def __init__(self):
+        self.active = 0
+        self.max_active = 0
+        self.cancelled = []
+
+    async def parse_video_id(self, video_id: str) -> VideoInfo:
+        self.active += 1
+        self.max_active = max(self.max_active, self.active)
+        _FakeParser.total_active += 1
+        _FakeParser.max_total_active = max(
+            _FakeParser.max_total_active, _FakeParser.total_active
+        )
+        try:
+            delay, _, outcome = video_id.partition(":")
+            await asyncio.sleep(float(delay))
+            if outcome == "fail":
+                raise ValueError(f"bad video {video_id}")
+            return VideoInfo(video_url=f"https://example.com/{video_id}", cover_url="")
+        except asyncio.CancelledError:
+            self.cancelled.append(video_id)
+            raise
+        finally:
+            self.active -= 1
+            _FakeParser.total_active -= 1
+
+
+@pytest.fixture
+def parsers(monkeypatch):
+    monkeypatch.setattr(_FakeParser, "max_total_active", 0)
+    fakes = {VideoSource.DouYin: _FakeParser(), VideoSource.KuaiShou: _FakeParser()}
+    for source, parser in fakes.items():
+        monkeypatch.setitem(video_parsers.video_parser_registry, source, parser)
+    return fakes
+
+
+def _run(batch: BatchParser, items):
+    async def run():
+        return [result async for result in batch.run(items)]
+
+    return asyncio.run(run())
+
+
+def test_results_are_returned_in_completion_order(parsers):
+    items = [
+        BatchItem(source=VideoSource.DouYin, video_id="0.06"),
+        BatchItem(source=VideoSource.DouYin, video_id="0.02"),
+        BatchItem(url="https://example.com/unsupported"),
+        BatchItem(source=VideoSource.DouYin, video_id="0.04"),
+    ]
+    results = _run(BatchParser(use_cache=False), items)
+    assert [result.index for result in results] == [2, 1, 3, 0]
+    assert results[0].error
+    assert all(result.video_info for result in results[1:])
+
+
+def test_fail_fast_cancels_remaining_items(parsers):
+    items = [
+        BatchItem(source=VideoSource.DouYin, video_id="0.01:fail"),
+        BatchItem(source=VideoSource.DouYin, video_id="1"),
+        BatchItem(source=VideoSource.KuaiShou, video_id="1"),
+    ]
+    results = _run(BatchParser(fail_fast=True, use_cache=False), items)
+    assert [result.index for result in results] == [0, 1, 2]
+    assert results[0].error == "bad video 0.01:fail"
+    assert {result.error for result in results[1:]} == {"cancelled by fail fast"}
+    assert parsers[VideoSource.DouYin].cancelled == ["1"]
+    assert parsers[VideoSource.KuaiShou].cancelled == ["1"]
+
+
+def test_deadline_stops_the_batch_and_its_parses(parsers):
+    items = [
+        BatchItem(source=VideoSource.DouYin, video_id="0.01"),
+        BatchItem(source=VideoSource.DouYin, video_id="5"),
+    ]
+    batch = BatchParser(deadline=0.2, use_cache=False)
+
+    async def run():
+        results = [result async for result in batch.run(items)]
+        await asyncio.sleep(0.01)
+        # 批量解析放弃后, 合并请求中的解析也被取消, 不再请求上游
+        assert parsers[VideoSource.DouYin].cancelled == ["5"]
+        return results
+
+    results = asyncio.run(run())
+    assert [result.index for result in results] == [0, 1]
+    assert results[0].video_info is not None
+    assert results[1].video_info is None
+
+
+def test_concurrency_limits(parsers):
+    items = [
+        BatchItem(source=source, video_id=f"0.02{i}")
+        for source in (VideoSource.DouYin, VideoSource.KuaiShou)
+        for i in range(6)
+    ]
+    batch = BatchParser(concurrency=3, per_source_concurrency=2, use_cache=False)
+    results = _run(batch, items)
+    assert sorted(result.index for result in results) == list(range(len(items)))
+    assert all(result.video_info for result in results)
+    assert parsers[VideoSource.DouYin].max_active == 2
+    assert parsers[VideoSource.KuaiShou].max_active == 2
+    assert _FakeParser.max_total_active == 3
@@ -0,0 +1,80 @@
+import asyncio
+
+import httpx
+
+from media_proxy.broadcast import BroadcastHub, MediaBroadcast
+
+
+class SlowStream(httpx.AsyncByteStream):
+    async def __aiter__(self):
+        for chunk in (b"ab", b"cd", b"ef"):
+            yield chunk
+            await asyncio.sleep(0.01)
+
+
+async def open_broadcast() -> MediaBroadcast:
+    return MediaBroadcast(httpx.Response(200, stream=SlowStream()), 200, {})
+
+
+def test_join_after_last_subscriber_leaves_opens_new_broadcast():
+    hub = BroadcastHub()
+
+    async def run():
+        first, chunks = await hub.join("key", open_broadcast)
+        assert await chunks.__anext__() == b"ab"
+        # 最后一个订阅方断开, 后台任务已取消但尚未结束
+        await chunks.aclose()
+        assert first.closing and not first.done
+
+        second, chunks = await hub.join("key", open_broadcast)
+        assert second is not first
+        return b"".join([chunk async for chunk in chunks])
+
+    assert asyncio.run(run()) == b"abcdef"
+
+
+class EndlessStream(httpx.AsyncByteStream):
+    async def __aiter__(self):
+        while True:
+            yield b"x" * 16
+            await asyncio.sleep(0.01)
+
+
+def test_unread_subscription_closed_cancels_download():
+    hub = BroadcastHub()
+
+    async def open_endless() -> MediaBroadcast:
+        return MediaBroadcast(httpx.Response(200, stream=EndlessStream()), 200, {})
+
+    async def run():
+        broadcast, body = await hub.join("key", open_endless)
+        assert broadcast.subscribers == 1
+        # 客户端在开始读取前断开
+        await body.aclose()
+        await body.aclose()
+        assert broadcast.subscribers == 0
+        assert broadcast.closing
+        await asyncio.sleep(0.05)
+        assert broadcast.done
+        assert len(hub) == 0
+
+    asyncio.run(run())
+
+
+def test_spill_file_is_closed_after_last_subscriber():
+    hub = BroadcastHub(memory_limit=2)
+
+    async def run():
+        broadcast, body = await hub.join("key", open_broadcast)
+        first = await body.__anext__()
+        while not broadcast.done:
+            await asyncio.sleep(0.01)
+        # 上游已读取完, 仍在读取的订阅方从临时文件回放
+        file = broadcast._file
+        assert file is not None and not file.closed
+        rest = [chunk async for chunk in body]
+        await asyncio.sleep(0.05)
+        assert file.closed
+        return first + b"".join(rest)
+
+    assert asyncio.run(run()) == b"abcdef"
@@ -0,0 +1,115 @@
+import time
+
+import pytest
+
+from video_parsers import (
+    DEFAULT_RESULT_TTL,
+    URL_EXPIRE_MARGIN,
+    VideoInfo,
+    VideoSource,
+    get_result_ttl,
+)
+from video_parsers.base import ImgInfo
+from video_parsers.cache import TTLCache
+
+
+class _Clock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+def test_entry_expires_after_ttl():
+    clock = _Clock()
+    cache = TTLCache(clock=clock)
+    cache.set("a", 1, ttl=10)
+
+    clock.now += 9.9
+    assert cache.get("a") == 1
+
+    clock.now += 0.1
+    assert cache.get("a") is None
+    assert len(cache) == 0
+    assert cache.stats.hits == 1
+    assert cache.stats.misses == 1
+    assert cache.stats.expirations == 1
+
+
+def test_non_positive_ttl_drops_entry():
+    cache = TTLCache(clock=_Clock())
+    cache.set("a", 1, ttl=10)
+    cache.set("a", 2, ttl=0)
+    assert cache.get("a") is None
+
+
+def test_items_skip_expired_entries():
+    clock = _Clock()
+    cache = TTLCache(clock=clock)
+    cache.set("a", 1, ttl=5)
+    cache.set("b", 2, ttl=20)
+    clock.now += 10
+    assert cache.items() == [("b", 2)]
+
+
+def test_lru_evicts_least_recently_used():
+    cache = TTLCache(max_entries=2, clock=_Clock())
+    cache.set("a", 1, ttl=60)
+    cache.set("b", 2, ttl=60)
+    # 读取 a 后 b 成为最久未使用的条目
+    assert cache.get("a") == 1
+
+    cache.set("c", 3, ttl=60)
+    assert cache.get("b") is None
+    assert cache.get("a") == 1
+    assert cache.get("c") == 3
+    assert cache.stats.evictions == 1
+
+
+def test_result_ttl_defaults_to_source_config():
+    video_info = VideoInfo(video_url="https://example.com/a.mp4", cover_url="")
+    assert get_result_ttl(VideoSource.AcFun, video_info) == DEFAULT_RESULT_TTL
+    assert get_result_ttl(VideoSource.DouYin, video_info) == 1800
+
+
+@pytest.mark.parametrize("query_key", ["deadline", "Expires", "x-expires"])
+def test_result_ttl_capped_by_signed_url(query_key):
+    expire_at = int(time.time()) + 300
+    video_info = VideoInfo(
+        video_url=f"https://cdn.example.com/a.mp4?{query_key}={expire_at}",
+        cover_url="",
+    )
+    ttl = get_result_ttl(VideoSource.DouYin, video_info)
+    assert ttl == pytest.approx(300 - URL_EXPIRE_MARGIN, abs=2)
+
+
+def test_result_ttl_capped_by_image_url():
+    expire_at = int(time.time()) + 120
+    video_info = VideoInfo(
+        video_url="",
+        cover_url="",
+        images=[
+            ImgInfo(url="https://cdn.example.com/1.jpg"),
+            ImgInfo(url=f"https://cdn.example.com/2.jpg?x-expires={expire_at}"),
+        ],
+    )
+    ttl = get_result_ttl(VideoSource.DouYin, video_info)
+    assert ttl == pytest.approx(120 - URL_EXPIRE_MARGIN, abs=2)
+
+
+def test_result_ttl_not_cached_for_expiring_url():
+    expire_at = int(time.time()) + URL_EXPIRE_MARGIN // 2
+    video_info = VideoInfo(
+        video_url=f"https://cdn.example.com/a.mp4?deadline={expire_at}",
+        cover_url="",
+    )
+    assert get_result_ttl(VideoSource.DouYin, video_info) <= 0
+
+
+def test_result_ttl_ignores_relative_durations():
+    # 相对时长不是时间戳, 不影响缓存时间
+    video_info = VideoInfo(
+        video_url="https://cdn.example.com/a.mp4?expires=3600", cover_url=""
+    )
+    assert get_result_ttl(VideoSource.DouYin, video_info) == 1800
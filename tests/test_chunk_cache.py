@@ -0,0 +1,102 @@
+import asyncio
+import os
+
+import pytest
+
+from media_proxy.chunk_cache import ChunkCache
+
+URL = "https://example.com/video.mp4"
+
+
+def test_concurrent_store_of_same_chunk_counts_once(tmp_path):
+    cache = ChunkCache(str(tmp_path), max_bytes=1024, chunk_size=16)
+    assert cache.writer(URL, 0, 32, "video/mp4") is not None
+    key = cache._key(URL)
+    data = b"x" * 16
+
+    async def run():
+        await asyncio.gather(
+            cache.store_chunk(key, 0, data), cache.store_chunk(key, 0, data)
+        )
+
+    asyncio.run(run())
+    assert cache.size_bytes == len(data)
+    assert cache._entries[key].chunks == {0}
+
+
+def test_load_only_removes_the_chunk_directory(tmp_path):
+    other = tmp_path / "unrelated.txt"
+    other.write_text("keep")
+    cache = ChunkCache(str(tmp_path), max_bytes=1024, chunk_size=16)
+    cache.load()
+    stale = tmp_path / "parse-video-chunks" / "ab"
+    stale.mkdir()
+
+    cache.load()
+    assert other.read_text() == "keep"
+    assert not stale.exists()
+
+
+def test_load_refuses_a_foreign_chunk_directory(tmp_path):
+    foreign = tmp_path / "parse-video-chunks"
+    foreign.mkdir()
+    (foreign / "data").write_text("keep")
+    cache = ChunkCache(str(tmp_path), max_bytes=1024, chunk_size=16)
+
+    with pytest.raises(RuntimeError):
+        cache.load()
+    assert (foreign / "data").read_text() == "keep"
+
+
+def test_chunks_being_read_are_not_evicted(tmp_path):
+    cache = ChunkCache(str(tmp_path), max_bytes=32, chunk_size=16)
+    cache.load()
+    other_url = "https://example.com/other.mp4"
+
+    async def run():
+        cache.writer(URL, 0, 32, "video/mp4")
+        key = cache._key(URL)
+        await cache.store_chunk(key, 0, b"a" * 16)
+        await cache.store_chunk(key, 1, b"b" * 16)
+        entry, start, end = cache.lookup(URL)
+        body = cache.iter_range(entry, start, end)
+        received = [await body.__anext__()]
+
+        # 读取期间写入其他地址, 只能淘汰未在读取的分块
+        cache.writer(other_url, 0, 32, "video/mp4")
+        other_key = cache._key(other_url)
+        await cache.store_chunk(other_key, 0, b"c" * 16)
+        received += [data async for data in body]
+        assert b"".join(received) == b"a" * 16 + b"b" * 16
+        assert cache.lookup(other_url, 0, 15) is None
+
+        # 读取结束后按 LRU 淘汰
+        cache.writer(other_url, 0, 32, "video/mp4")
+        await cache.store_chunk(other_key, 0, b"c" * 16)
+        assert cache.lookup(URL, 0, 15) is None
+        assert cache.lookup(other_url, 0, 15) is not None
+        assert cache.size_bytes <= cache.max_bytes
+
+    asyncio.run(run())
+
+
+def test_dropped_entry_is_removed_after_the_read(tmp_path):
+    cache = ChunkCache(str(tmp_path), max_bytes=1024, chunk_size=16)
+    cache.load()
+
+    async def run():
+        cache.writer(URL, 0, 16, "video/mp4")
+        await cache.store_chunk(cache._key(URL), 0, b"a" * 16)
+        entry, start, end = cache.lookup(URL)
+        body = cache.iter_range(entry, start, end)
+        assert await body.__anext__() == b"a" * 16
+
+        # 读取期间内容变化, 旧目录等读取结束后再删除
+        cache.writer(URL, 0, 32, "video/mp4", etag="new")
+        await asyncio.sleep(0.1)
+        assert os.path.isdir(entry.path)
+        assert [data async for data in body] == []
+        await asyncio.sleep(0.1)
+        assert not os.path.exists(entry.path)
+
+    asyncio.run(run())
@@ -0,0 +1,49 @@
+import asyncio
+
+import httpx
+import pytest
+
+from video_parsers.circuit import CircuitBreaker, CircuitConfig, CircuitState
+from video_parsers.timeouts import DeadlineExceeded
+
+CONFIG = CircuitConfig(min_calls=2, failure_rate=0.5)
+
+
+def _status_error(status_code: int) -> httpx.HTTPStatusError:
+    request = httpx.Request("GET", "https://example.com/")
+    response = httpx.Response(status_code, request=request)
+    return httpx.HTTPStatusError("error", request=request, response=response)
+
+
+def _call(breaker: CircuitBreaker, err: Exception):
+    async def fail():
+        raise err
+
+    with pytest.raises(type(err)):
+        asyncio.run(breaker.call(fail))
+
+
+@pytest.mark.parametrize(
+    "err",
+    [
+        ValueError("parse video json info from html fail"),
+        KeyError("aweme_detail"),
+        DeadlineExceeded("parse deadline exceeded"),
+        _status_error(404),
+    ],
+)
+def test_parse_errors_do_not_open_breaker(err):
+    breaker = CircuitBreaker("douyin", CONFIG)
+    for _ in range(5):
+        _call(breaker, err)
+    assert breaker.state is CircuitState.Closed
+
+
+@pytest.mark.parametrize(
+    "err", [httpx.ConnectError("connection refused"), _status_error(503)]
+)
+def test_upstream_failures_open_breaker(err):
+    breaker = CircuitBreaker("douyin", CONFIG)
+    for _ in range(2):
+        _call(breaker, err)
+    assert breaker.state is CircuitState.Open
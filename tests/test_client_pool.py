@@ -0,0 +1,41 @@
+import asyncio
+
+import httpx
+
+from video_parsers.client_pool import DEFAULT_PROFILE, ClientPool, cookie_scope
+
+
+def _create_client(handler) -> httpx.AsyncClient:
+    client = ClientPool._create_client(DEFAULT_PROFILE)
+    client._transport = httpx.MockTransport(handler)
+    return client
+
+
+def test_redirect_cookies_scoped_to_parse():
+    sent = []
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        sent.append((request.url.path, request.headers.get("cookie")))
+        if request.url.path == "/a":
+            return httpx.Response(
+                302, headers={"location": "/b", "set-cookie": "did=abc; Path=/"}
+            )
+        return httpx.Response(200)
+
+    async def run():
+        client = _create_client(handler)
+        with cookie_scope():
+            await client.get("https://example.com/a", follow_redirects=True)
+        # 其它解析及作用域外的请求不会带上前一次解析的 cookie
+        with cookie_scope():
+            await client.get("https://example.com/b")
+        await client.get("https://example.com/a", follow_redirects=True)
+
+    asyncio.run(run())
+    assert sent == [
+        ("/a", None),
+        ("/b", "did=abc"),
+        ("/b", None),
+        ("/a", None),
+        ("/b", None),
+    ]
@@ -0,0 +1,57 @@
+import asyncio
+
+from video_parsers.douyin import DouYin
+
+NOTE_URL = "https://www.douyin.com/note/7424432820954598707"
+
+VIDEO_JSON = {
+    "aweme_detail": {
+        "desc": "video",
+        "video": {
+            "play_addr": {"url_list": ["https://example.com/playwm/1.mp4"]},
+            "cover": {"url_list": ["https://example.com/cover.jpeg"]},
+        },
+    }
+}
+
+
+def test_wrong_note_prediction_reuses_the_raced_share_page(monkeypatch):
+    parser = DouYin()
+    page_requests = []
+
+    async def get_slides_info(video_id):
+        return None
+
+    async def get_share_page_json(share_url, video_id, use_slides=True):
+        page_requests.append(use_slides)
+        return VIDEO_JSON
+
+    monkeypatch.setattr(parser, "_get_slides_info", get_slides_info)
+    monkeypatch.setattr(parser, "_get_share_page_json", get_share_page_json)
+
+    video_info = asyncio.run(parser.parse_share_url(NOTE_URL))
+    assert video_info.video_url == "https://example.com/play/1.mp4"
+    assert video_info.images == []
+    # 链接显示是图集但实际是视频, 不再重复请求分享页
+    assert page_requests == [False]
+
+
+def test_failed_share_page_in_race_is_requested_again(monkeypatch):
+    parser = DouYin()
+    page_requests = []
+
+    async def get_slides_info(video_id):
+        return None
+
+    async def get_share_page_json(share_url, video_id, use_slides=True):
+        page_requests.append(use_slides)
+        if not use_slides:
+            raise ValueError("page timeout")
+        return VIDEO_JSON
+
+    monkeypatch.setattr(parser, "_get_slides_info", get_slides_info)
+    monkeypatch.setattr(parser, "_get_share_page_json", get_share_page_json)
+
+    video_info = asyncio.run(parser.parse_share_url(NOTE_URL))
+    assert video_info.title == "video"
+    assert page_requests == [False, True]
@@ -0,0 +1,29 @@
+from video_parsers.embedded import EmbeddedStates, extract_states
+
+# 同时包含普通内联脚本与 <script id="..."> 数据的页面
+MIXED_PAGE = (
+    b"<html><script>var a = 1; if (a == 1) { a = 2; }</script>"
+    b'<script id="__NEXT_DATA__" type="application/json">{"props": {"x": 1}}'
+    b'</script><script>window.INIT_STATE = {"y": 2};</script></html>'
+)
+
+
+def test_script_id_only_ignores_inline_assignments():
+    states = extract_states(MIXED_PAGE, ["__NEXT_DATA__"])
+    assert states.names() == ["__NEXT_DATA__"]
+    assert states.loads("__NEXT_DATA__") == {"props": {"x": 1}}
+
+
+def test_script_id_and_variable_names():
+    states = extract_states(MIXED_PAGE, ["__NEXT_DATA__", "INIT_STATE"])
+    assert states.loads("__NEXT_DATA__") == {"props": {"x": 1}}
+    assert states.loads("INIT_STATE") == {"y": 2}
+
+
+def test_incremental_feed_matches_full_scan():
+    states = EmbeddedStates(["__NEXT_DATA__", "INIT_STATE"])
+    for i in range(0, len(MIXED_PAGE), 7):
+        states.feed(MIXED_PAGE[i : i + 7])
+    states.close()
+    assert states.is_complete(require_all=True)
+    assert states.loads("INIT_STATE") == {"y": 2}
@@ -0,0 +1,160 @@
+import asyncio
+
+import httpx
+
+from video_parsers.hedge import HedgePolicy, HedgeStats, HedgeTransport
+from video_parsers.latency import LatencyRegistry
+from video_parsers.retry import RetryBudget
+
+URL = "https://example.com/api"
+
+
+class _SlowTransport(httpx.AsyncBaseTransport):
+    """
+    按调用顺序返回耗时不同的响应, 记录每次请求的发出时间
+    """
+
+    def __init__(self, *delays: float):
+        self.delays = list(delays)
+        self.started = []
+        self.cancelled = 0
+
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        loop = asyncio.get_running_loop()
+        index = len(self.started)
+        self.started.append(loop.time())
+        try:
+            await asyncio.sleep(self.delays[index])
+        except asyncio.CancelledError:
+            self.cancelled += 1
+            raise
+        return httpx.Response(200, text=str(index), request=request)
+
+
+def _latencies(name: str, seconds: float, count: int = 20) -> LatencyRegistry:
+    latencies = LatencyRegistry()
+    histogram = latencies.get(name)
+    for _ in range(count):
+        histogram.record(seconds)
+    return latencies
+
+
+def _budget(tokens: float = 20) -> RetryBudget:
+    return RetryBudget(ratio=0, min_per_second=0, max_tokens=tokens)
+
+
+def _send(transport: HedgeTransport, policy: HedgePolicy, method: str = "GET"):
+    async def main():
+        request = httpx.Request(method, URL, extensions={"hedge": policy})
+        response = await transport.handle_async_request(request)
+        await response.aread()
+        return response.text
+
+    return asyncio.run(main())
+
+
+def test_no_hedge_without_enough_samples():
+    policy = HedgePolicy(name="api", min_samples=20)
+    inner = _SlowTransport(0.1, 0)
+    stats = HedgeStats()
+    transport = HedgeTransport(inner, _latencies("api", 0.01, 19), _budget(), stats)
+
+    assert _send(transport, policy) == "0"
+    assert len(inner.started) == 1
+    assert stats.requests == 1
+    assert stats.hedged == 0
+
+
+def test_no_hedge_for_unsafe_method():
+    policy = HedgePolicy(name="api", min_delay=0.01)
+    inner = _SlowTransport(0.1, 0)
+    stats = HedgeStats()
+    transport = HedgeTransport(inner, _latencies("api", 0.01), _budget(), stats)
+
+    assert _send(transport, policy, method="POST") == "0"
+    assert len(inner.started) == 1
+    assert stats.requests == 0
+
+
+def test_no_hedge_when_primary_beats_quantile():
+    policy = HedgePolicy(name="api", min_delay=0.01)
+    inner = _SlowTransport(0, 0)
+    stats = HedgeStats()
+    transport = HedgeTransport(inner, _latencies("api", 0.2), _budget(), stats)
+
+    assert _send(transport, policy) == "0"
+    assert len(inner.started) == 1
+    assert stats.hedged == 0
+
+
+def test_hedge_sent_after_quantile_delay_and_wins():
+    policy = HedgePolicy(name="api", min_delay=0.01)
+    latencies = _latencies("api", 0.05)
+    delay = latencies.get("api").quantile(policy.quantile)
+    inner = _SlowTransport(1.0, 0)
+    stats = HedgeStats()
+    transport = HedgeTransport(inner, latencies, _budget(), stats)
+
+    assert _send(transport, policy) == "1"
+    assert len(inner.started) == 2
+    elapsed = inner.started[1] - inner.started[0]
+    assert delay <= elapsed < delay + 0.1
+    # 落败的首次请求被取消
+    assert inner.cancelled == 1
+    assert stats.hedged == 1
+    assert stats.wins == 1
+
+
+def test_hedge_delay_clamped_to_max_delay():
+    policy = HedgePolicy(name="api", min_delay=0.01, max_delay=0.05)
+    inner = _SlowTransport(1.0, 0)
+    stats = HedgeStats()
+    transport = HedgeTransport(inner, _latencies("api", 10.0), _budget(), stats)
+
+    assert _send(transport, policy) == "1"
+    elapsed = inner.started[1] - inner.started[0]
+    assert 0.05 <= elapsed < 0.15
+
+
+def test_primary_wins_when_hedge_is_slower():
+    policy = HedgePolicy(name="api", min_delay=0.01, max_delay=0.02)
+    inner = _SlowTransport(0.1, 1.0)
+    stats = HedgeStats()
+    transport = HedgeTransport(inner, _latencies("api", 0.01), _budget(), stats)
+
+    assert _send(transport, policy) == "0"
+    assert inner.cancelled == 1
+    assert stats.hedged == 1
+    assert stats.wins == 0
+
+
+def test_budget_limits_hedged_requests():
+    policy = HedgePolicy(name="api", min_delay=0.01, max_delay=0.02)
+    inner = _SlowTransport(0.1, 0, 0.1)
+    stats = HedgeStats()
+    budget = _budget(tokens=1)
+    transport = HedgeTransport(inner, _latencies("api", 0.01), budget, stats)
+
+    assert _send(transport, policy) == "1"
+    # 令牌用完后等待首次请求返回, 不再对冲
+    assert _send(transport, policy) == "2"
+    assert len(inner.started) == 3
+    assert stats.requests == 2
+    assert stats.hedged == 1
+    assert stats.exhausted == 1
+    assert budget.stats.exhausted == 1
+
+
+def test_budget_earned_by_hedge_enabled_requests():
+    policy = HedgePolicy(name="api", min_delay=0.01, max_delay=0.02)
+    inner = _SlowTransport(0.1, 0.1, 0)
+    stats = HedgeStats()
+    budget = RetryBudget(ratio=0.5, min_per_second=0, max_tokens=1)
+    assert budget.try_spend()
+    transport = HedgeTransport(inner, _latencies("api", 0.01), budget, stats)
+
+    # 每个开启对冲的请求存入 0.5 个令牌, 第二个请求时才够对冲一次
+    assert _send(transport, policy) == "0"
+    assert _send(transport, policy) == "2"
+    assert stats.exhausted == 1
+    assert stats.hedged == 1
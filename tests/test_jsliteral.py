@@ -0,0 +1,63 @@
+import pytest
+
+from video_parsers import jsliteral
+
+
+@pytest.mark.parametrize(
+    "text, expected",
+    [
+        ('{"a": 1, "b": [true, false, null]}', {"a": 1, "b": [True, False, None]}),
+        ("{a: 1, $b: 2, _c: 3}", {"a": 1, "$b": 2, "_c": 3}),
+        ("{a: undefined, b: [undefined]}", {"a": None, "b": [None]}),
+        (
+            "{a: 'x', b: 'say \"hi\"', c: 'it\\'s'}",
+            {"a": "x", "b": 'say "hi"', "c": "it's"},
+        ),
+        ('{a: "\\x41\\u{1F600}\\v\\0"}', {"a": "A\U0001F600\x0b\x00"}),
+        ("{a: 'line\\\nbreak'}", {"a": "linebreak"}),
+        ("{a: 1.5e3, b: -2, c: 0, d: 0.25}", {"a": 1500.0, "b": -2, "c": 0, "d": 0.25}),
+        ("{trueish: true, nullable: null}", {"trueish": True, "nullable": None}),
+        ('{"a": "undefined", b: "key: true"}', {"a": "undefined", "b": "key: true"}),
+        ("{a: 1};", {"a": 1}),
+    ],
+)
+def test_loads(text, expected):
+    assert jsliteral.loads(text) == expected
+
+
+@pytest.mark.parametrize(
+    "text, expected",
+    [
+        ("{a: 0x1F, b: 0XfF}", {"a": 31, "b": 255}),
+        ("{a: 0o17, b: 0b101}", {"a": 15, "b": 5}),
+        ("{a: -0x10, b: [0x0, 0x1]}", {"a": -16, "b": [0, 1]}),
+        ("{x10: 0x10}", {"x10": 16}),
+    ],
+)
+def test_loads_radix_integers(text, expected):
+    assert jsliteral.loads(text) == expected
+
+
+@pytest.mark.parametrize(
+    "text, expected",
+    [
+        ("{true: 1, false: 2, null: 3}", {"true": 1, "false": 2, "null": 3}),
+        ("{true : false, a: {false:true}}", {"true": False, "a": {"false": True}}),
+        ('{"true": true, false: null}', {"true": True, "false": None}),
+    ],
+)
+def test_loads_literal_named_keys(text, expected):
+    assert jsliteral.loads(text) == expected
+
+
+def test_to_json_keeps_json_untouched():
+    text = '{"a": [1, 2.5, "b\\n"], "c": {"d": null}}'
+    assert jsliteral.to_json(text) == text
+
+
+def test_to_json_rewrites_only_js_syntax():
+    assert jsliteral.to_json("{a: 0x1F, true: 'x'}") == '{"a": 31, "true": "x"}'
+
+
+def test_loads_unescaped_control_characters():
+    assert jsliteral.loads('{"a": "b\tc"}') == {"a": "b\tc"}
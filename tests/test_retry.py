@@ -0,0 +1,135 @@
+import asyncio
+import types
+
+import httpx
+import pytest
+
+from video_parsers import retry
+from video_parsers.retry import RetryBudget, RetryPolicy, RetryTransport
+
+URL = "https://api.example.com/item"
+
+
+class _Clock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+@pytest.fixture
+def sleeps(monkeypatch):
+    """
+    记录重试前的等待时间, 不实际等待
+    """
+    delays = []
+
+    async def sleep(delay):
+        delays.append(delay)
+
+    monkeypatch.setattr(retry, "asyncio", types.SimpleNamespace(sleep=sleep))
+    return delays
+
+
+def _send(responses, policy, budget=None, method="GET"):
+    """
+    依次返回 responses 中的响应, 返回最终响应的状态码及上游收到的请求数
+    """
+    requests = []
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        requests.append(request)
+        return responses[min(len(requests), len(responses)) - 1]
+
+    if budget is None:
+        budget = RetryBudget()
+    transport = RetryTransport(httpx.MockTransport(handler), policy, budget)
+
+    async def run():
+        async with httpx.AsyncClient(transport=transport) as client:
+            response = await client.request(method, URL)
+            return response.status_code
+
+    return asyncio.run(run()), len(requests)
+
+
+def test_retries_retryable_status(sleeps):
+    policy = RetryPolicy(max_attempts=3)
+    responses = [httpx.Response(503), httpx.Response(502), httpx.Response(200)]
+    assert _send(responses, policy) == (200, 3)
+    assert len(sleeps) == 2
+
+
+def test_non_idempotent_requests_are_not_retried(sleeps):
+    policy = RetryPolicy(max_attempts=3)
+    responses = [httpx.Response(503), httpx.Response(200)]
+    assert _send(responses, policy, method="POST") == (503, 1)
+    assert sleeps == []
+
+
+def test_budget_exhaustion_stops_retries(sleeps):
+    clock = _Clock()
+    budget = RetryBudget(ratio=0.5, min_per_second=0, max_tokens=1, clock=clock)
+    policy = RetryPolicy(max_attempts=3)
+
+    # 令牌只够重试一次
+    assert _send([httpx.Response(503)], policy, budget) == (503, 2)
+    assert budget.stats.retries == 1
+    assert budget.stats.exhausted == 1
+
+    # 每个首次请求存入 0.5 个令牌, 两个首次请求后才能再重试一次
+    assert _send([httpx.Response(503)], policy, budget) == (503, 1)
+    assert budget.stats.exhausted == 2
+    assert _send([httpx.Response(503)], policy, budget) == (503, 2)
+    assert budget.stats.requests == 3
+    assert budget.stats.retries == 2
+
+
+def test_budget_refills_over_time():
+    clock = _Clock()
+    budget = RetryBudget(ratio=0, min_per_second=2, max_tokens=1, clock=clock)
+    assert budget.try_spend()
+    assert not budget.try_spend()
+    clock.now += 0.5
+    assert budget.try_spend()
+
+
+def test_retry_after_extends_backoff(sleeps):
+    policy = RetryPolicy(max_attempts=2, backoff_base=0.01, backoff_max=2.0)
+    responses = [
+        httpx.Response(429, headers={"retry-after": "1"}),
+        httpx.Response(200),
+    ]
+    assert _send(responses, policy) == (200, 2)
+    assert sleeps == [1.0]
+
+
+def test_retry_after_beyond_backoff_max_is_not_retried(sleeps):
+    policy = RetryPolicy(max_attempts=3, backoff_max=2.0)
+    responses = [
+        httpx.Response(503, headers={"retry-after": "120"}),
+        httpx.Response(200),
+    ]
+    assert _send(responses, policy) == (503, 1)
+    assert sleeps == []
+
+
+def test_connect_errors_are_retried(sleeps):
+    policy = RetryPolicy(max_attempts=2)
+    attempts = []
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        attempts.append(request)
+        if len(attempts) == 1:
+            raise httpx.ConnectError("refused", request=request)
+        return httpx.Response(200)
+
+    transport = RetryTransport(httpx.MockTransport(handler), policy, RetryBudget())
+
+    async def run():
+        async with httpx.AsyncClient(transport=transport) as client:
+            return (await client.get(URL)).status_code
+
+    assert asyncio.run(run()) == 200
+    assert len(attempts) == 2
@@ -0,0 +1,70 @@
+import asyncio
+import re
+
+import httpx
+
+from media_proxy.segmented import SegmentedFetcher
+
+URL = "https://cdn.example.com/video.mp4"
+DATA = bytes(range(256)) * 4
+
+
+class ChunkedStream(httpx.AsyncByteStream):
+    def __init__(self, data: bytes):
+        self._data = data
+
+    async def __aiter__(self):
+        for offset in range(0, len(self._data), 64):
+            yield self._data[offset : offset + 64]
+
+
+def _serve(ranged_requests: int):
+    """
+    前 ranged_requests 个请求按 Range 返回 206, 之后忽略 Range 返回整个文件
+    """
+    requests = []
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        requests.append(request.headers["range"])
+        start, end = map(int, re.match(r"bytes=(\d+)-(\d+)", requests[-1]).groups())
+        if len(requests) > ranged_requests:
+            return httpx.Response(200, stream=ChunkedStream(DATA))
+        return httpx.Response(
+            206,
+            stream=ChunkedStream(DATA[start : end + 1]),
+            headers={"content-range": f"bytes {start}-{end}/{len(DATA)}"},
+        )
+
+    return handler, requests
+
+
+def _download(handler) -> bytes:
+    async def run():
+        client = httpx.AsyncClient(transport=httpx.MockTransport(handler))
+        async with client:
+            request = client.build_request(
+                "GET", URL, headers={"Range": f"bytes=0-{len(DATA) - 1}"}
+            )
+            first = await client.send(request, stream=True)
+            fetcher = SegmentedFetcher(
+                client, URL, {}, parallel=2, max_parallel=2, segment_size=100
+            )
+            return b"".join(
+                [chunk async for chunk in fetcher.iter_bytes(first, 0, len(DATA) - 1)]
+            )
+
+    return asyncio.run(run())
+
+
+def test_segments_are_joined_in_order():
+    handler, requests = _serve(ranged_requests=100)
+    assert _download(handler) == DATA
+    assert len(requests) > 2
+
+
+def test_falls_back_to_single_connection_when_range_is_ignored():
+    # 第一个响应和第一个后续分段支持 Range, 之后的分段返回 200
+    handler, requests = _serve(ranged_requests=2)
+    assert _download(handler) == DATA
+    # 改为单连接后只再请求一次剩余部分
+    assert requests[-1].endswith(f"-{len(DATA) - 1}")
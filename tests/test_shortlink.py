@@ -0,0 +1,103 @@
+import asyncio
+import json
+
+import httpx
+import pytest
+
+from video_parsers import base
+from video_parsers.pipixia import PiPiXia
+from video_parsers.shortlink import ShortLinkCache
+
+SHORT_URL = "https://v.douyin.com/abc123/"
+TARGET = "https://www.iesdouyin.com/share/video/123/"
+
+
+class _Clock:
+    def __init__(self):
+        self.now = 1_000_000.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+class _Pool:
+    def __init__(self, handler):
+        self._client = httpx.AsyncClient(transport=httpx.MockTransport(handler))
+
+    def get(self, profile):
+        return self._client
+
+
+def _resolve(monkeypatch, status_code: int, location: str):
+    cache = ShortLinkCache(path=None)
+    monkeypatch.setattr(base, "shortlink_cache", cache)
+    requests = []
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        requests.append(request)
+        return httpx.Response(status_code, headers={"location": location})
+
+    parser = PiPiXia(_Pool(handler))
+
+    async def run():
+        first = await parser.resolve_short_url(SHORT_URL, headers={})
+        second = await parser.resolve_short_url(SHORT_URL, headers={})
+        return first, second
+
+    assert asyncio.run(run()) == (location, location)
+    return cache, len(requests)
+
+
+def test_redirect_to_platform_is_cached(monkeypatch):
+    cache, request_count = _resolve(monkeypatch, 302, TARGET)
+    assert request_count == 1
+    assert cache.get(SHORT_URL) == TARGET
+
+
+@pytest.mark.parametrize(
+    "status_code, location",
+    [
+        (302, "https://verify.example.com/captcha?from=douyin"),
+        (302, "/login"),
+        (200, TARGET),
+    ],
+)
+def test_other_responses_are_not_cached(monkeypatch, status_code, location):
+    cache, request_count = _resolve(monkeypatch, status_code, location)
+    assert request_count == 2
+    assert cache.get(SHORT_URL) is None
+
+
+def test_entries_expire_and_survive_reload(tmp_path):
+    path = str(tmp_path / "shortlinks.jsonl")
+    clock = _Clock()
+    cache = ShortLinkCache(path=path, ttl=100, clock=clock)
+    cache.load()
+    asyncio.run(cache.set(SHORT_URL, TARGET))
+
+    clock.now += 50
+    reloaded = ShortLinkCache(path=path, ttl=100, clock=clock)
+    reloaded.load()
+    assert reloaded.get(SHORT_URL) == TARGET
+
+    # 过期时间以写入时为准, 重启不会延长
+    clock.now += 51
+    assert reloaded.get(SHORT_URL) is None
+    expired = ShortLinkCache(path=path, ttl=100, clock=clock)
+    expired.load()
+    assert expired.get(SHORT_URL) is None
+
+
+def test_file_is_compacted_while_running(tmp_path):
+    path = tmp_path / "shortlinks.jsonl"
+    cache = ShortLinkCache(path=str(path), max_entries=2)
+    cache.load()
+
+    async def run():
+        for i in range(10):
+            await cache.set(f"https://v.douyin.com/{i}/", TARGET)
+
+    asyncio.run(run())
+    lines = path.read_text(encoding="utf-8").splitlines()
+    assert len(lines) <= 2 * cache._cache.max_entries
+    assert {json.loads(line)["url"] for line in lines} >= {"https://v.douyin.com/9"}
@@ -0,0 +1,67 @@
+import asyncio
+import time
+
+from video_parsers.singleflight import SingleFlight
+from video_parsers.timeouts import current_deadline, get_remaining_time
+
+
+def test_shared_call_does_not_inherit_caller_deadline():
+    single_flight = SingleFlight()
+    seen_deadlines = []
+    started = asyncio.Event()
+
+    async def parse():
+        seen_deadlines.append(get_remaining_time())
+        started.set()
+        await asyncio.sleep(0.05)
+        return "ok"
+
+    async def caller_with_deadline():
+        current_deadline.set(time.monotonic() + 0.01)
+        try:
+            await asyncio.wait_for(single_flight.do("key", parse), get_remaining_time())
+        except asyncio.TimeoutError:
+            return "timeout"
+
+    async def run():
+        # 带截止时间的调用方先发起解析, 其余调用方合并到同一解析
+        first = asyncio.ensure_future(caller_with_deadline())
+        await started.wait()
+        second = await single_flight.do("key", parse)
+        return await first, second
+
+    assert asyncio.run(run()) == ("timeout", "ok")
+    assert seen_deadlines == [None]
+
+
+def test_shared_call_is_cancelled_when_every_caller_gives_up():
+    single_flight = SingleFlight()
+    cancelled = []
+
+    async def parse():
+        try:
+            await asyncio.sleep(1)
+        except asyncio.CancelledError:
+            cancelled.append(True)
+            raise
+
+    async def caller(timeout):
+        try:
+            await asyncio.wait_for(single_flight.do("key", parse), timeout)
+        except asyncio.TimeoutError:
+            return "timeout"
+
+    async def run():
+        first = asyncio.ensure_future(caller(0.01))
+        second = asyncio.ensure_future(caller(0.05))
+        assert await first == "timeout"
+        # 仍有调用方在等待, 共享的调用继续执行
+        await asyncio.sleep(0)
+        assert cancelled == []
+        assert await second == "timeout"
+        await asyncio.sleep(0)
+        assert cancelled == [True]
+
+    asyncio.run(run())
+    assert single_flight.stats.abandoned == 1
+    assert single_flight.inflight_count() == 0
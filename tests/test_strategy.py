@@ -0,0 +1,88 @@
+import asyncio
+
+import pytest
+
+from video_parsers.strategy import StrategyRunner, race
+
+
+class _Clock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+def _strategy(name: str, delay: float, result="ok", error=None):
+    async def run():
+        await asyncio.sleep(delay)
+        if error is not None:
+            raise error
+        return result
+
+    return name, run
+
+
+def test_race_returns_first_valid_result():
+    async def run():
+        return await race(
+            [
+                _strategy("empty", 0.0, result=None)[1],
+                _strategy("slow", 0.05, result="slow")[1],
+                _strategy("fast", 0.01, result="fast")[1],
+            ]
+        )
+
+    assert asyncio.run(run()) == "fast"
+
+
+def test_race_raises_last_error_when_all_fail():
+    async def run():
+        return await race(
+            [_strategy("broken", 0.0, error=ValueError("broken"))[1]], stagger=0.01
+        )
+
+    with pytest.raises(ValueError, match="broken"):
+        asyncio.run(run())
+
+
+def test_always_slow_strategy_is_deprioritized():
+    runner = StrategyRunner(stagger=None, clock=_Clock())
+    strategies = [_strategy("slow", 0.05, "slow"), _strategy("fast", 0.0, "fast")]
+
+    async def run():
+        return [await runner.run(strategies) for _ in range(5)]
+
+    assert asyncio.run(run()) == ["fast"] * 5
+    assert runner.snapshot()["slow"]["cancellations"] == 5
+    assert runner.snapshot()["slow"]["failures"] == 0
+    assert [name for name, _ in runner.get_order(strategies)] == ["fast", "slow"]
+
+
+def test_strategies_not_started_are_not_penalized():
+    runner = StrategyRunner(stagger=1.0, clock=_Clock())
+    strategies = [_strategy("first", 0.0), _strategy("second", 0.0)]
+    asyncio.run(runner.run(strategies))
+    assert "second" not in runner.snapshot()
+    assert runner.snapshot()["first"]["successes"] == 1
+
+
+def test_failures_reorder_and_decay():
+    clock = _Clock()
+    runner = StrategyRunner(stagger=0.01, half_life=10, clock=clock)
+    strategies = [
+        _strategy("broken", 0.0, error=ValueError("broken")),
+        _strategy("backup", 0.0),
+    ]
+
+    async def run():
+        for _ in range(3):
+            await runner.run(strategies)
+
+    asyncio.run(run())
+    assert runner.snapshot()["broken"]["failures"] >= 1
+    assert [name for name, _ in runner.get_order(strategies)] == ["backup", "broken"]
+
+    # 长时间未执行后成功率回到初始值, 恢复原有顺序重新尝试
+    clock.now += 1000
+    assert [name for name, _ in runner.get_order(strategies)] == ["broken", "backup"]
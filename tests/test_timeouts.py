@@ -0,0 +1,53 @@
+import asyncio
+
+import httpx
+import pytest
+
+from video_parsers.timeouts import (
+    PHASE_FIRST_BYTE,
+    AdaptiveTimeouts,
+    AdaptiveTimeoutTransport,
+)
+
+FIRST_BYTE_TIMEOUT = 0.2
+
+
+async def _serve(header_delay: float, body_stall: float):
+    async def handle(reader, writer):
+        await reader.readuntil(b"\r\n\r\n")
+        await asyncio.sleep(header_delay)
+        writer.write(b"HTTP/1.1 200 OK\r\nContent-Length: 10\r\n\r\nhello")
+        await writer.drain()
+        await asyncio.sleep(body_stall)
+        writer.write(b"world")
+        await writer.drain()
+        writer.close()
+
+    return await asyncio.start_server(handle, "127.0.0.1", 0)
+
+
+async def _get(header_delay: float, body_stall: float) -> bytes:
+    server = await _serve(header_delay, body_stall)
+    port = server.sockets[0].getsockname()[1]
+    timeouts = AdaptiveTimeouts(min_samples=1)
+    # 首字节耗时很短, 自适应的首字节超时为下限 FIRST_BYTE_TIMEOUT
+    timeouts.record("127.0.0.1", PHASE_FIRST_BYTE, 0.001)
+    transport = AdaptiveTimeoutTransport(
+        httpx.AsyncHTTPTransport(), timeouts, min_timeout=FIRST_BYTE_TIMEOUT
+    )
+    try:
+        async with httpx.AsyncClient(transport=transport, timeout=5.0) as client:
+            response = await client.get(f"http://127.0.0.1:{port}/")
+            return response.content
+    finally:
+        server.close()
+
+
+def test_body_reads_keep_profile_read_timeout():
+    # 响应体中途卡顿超过首字节超时, 但未超过每次读取的超时
+    assert asyncio.run(_get(0, FIRST_BYTE_TIMEOUT * 3)) == b"helloworld"
+
+
+def test_first_byte_uses_adaptive_timeout():
+    with pytest.raises(httpx.ReadTimeout):
+        asyncio.run(_get(FIRST_BYTE_TIMEOUT * 3, 0))
@@ -0,0 +1,38 @@
+import httpx
+
+from media_proxy.upstream import build_client_response
+
+
+def _partial(content_range: str) -> httpx.Response:
+    return httpx.Response(
+        206,
+        headers={
+            "content-range": content_range,
+            "content-length": "100",
+            "content-type": "video/mp4",
+        },
+    )
+
+
+def test_full_partial_response_becomes_200():
+    status_code, headers = build_client_response(_partial("bytes 0-99/100"), None)
+    assert status_code == 200
+    assert headers["content-length"] == "100"
+    assert "content-range" not in headers
+
+
+def test_truncated_partial_response_stays_206():
+    status_code, headers = build_client_response(_partial("bytes 0-99/1000"), None)
+    assert status_code == 206
+    assert headers["content-range"] == "bytes 0-99/1000"
+    assert headers["content-length"] == "100"
+
+
+def test_unknown_total_stays_206():
+    status_code, _ = build_client_response(_partial("bytes 0-99/*"), None)
+    assert status_code == 206
+
+
+def test_client_range_is_passed_through():
+    status_code, _ = build_client_response(_partial("bytes 0-99/100"), "bytes=0-")
+    assert status_code == 206
@@ -1,4 +1,5 @@
-from urllib.parse import parse_qs, urlparse
+from typing import Optional
+from urllib.parse import parse_qs, urlparse, urlsplit, urlunsplit
 
 
 def get_val_from_url_by_query_key(url: str, query_key: str) -> str:
@@ -20,3 +21,45 @@ def get_val_from_url_by_query_key(url: str, query_key: str) -> str:
         raise ValueError(f"url中query参数值长度为0: {query_key}")
 
     return url_query[query_key][0]
+
+
+# 签名 CDN 地址中表示过期时间(unix 时间戳)的 query 参数
+URL_EXPIRE_QUERY_KEYS = ("deadline", "expires", "x-expires")
+
+
+def get_url_expire_time(url: str) -> Optional[float]:
+    """
+    从签名 CDN 地址的 query 参数中解析过期时间
+    如 B站 durl 的 deadline, 微博的 Expires, 抖音图片的 x-expires
+    :param url: url地址
+    :return: 过期时间的 unix 时间戳, 无法解析时返回 None
+    """
+    if not url:
+        return None
+
+    url_query = parse_qs(urlparse(url).query)
+    for query_key, query_val in url_query.items():
+        if query_key.lower() not in URL_EXPIRE_QUERY_KEYS:
+            continue
+        try:
+            expire_time = float(query_val[0])
+        except ValueError:
+            continue
+        # 只接受秒级时间戳, 避免把相对时长等误判为过期时间
+        if 1e9 <= expire_time < 1e10:
+            return expire_time
+
+    return None
+
+
+def normalize_share_url(share_url: str) -> str:
+    """
+    规范化分享链接, 用于合并相同链接的请求及缓存
+    协议和域名转小写, 去掉 fragment
+    :param share_url: 视频分享链接
+    :return:
+    """
+    parts = urlsplit(share_url.strip())
+    return urlunsplit(
+        (parts.scheme.lower(), parts.netloc.lower(), parts.path, parts.query, "")
+    )
@@ -1,11 +1,49 @@
+import asyncio
+import re
+import time
+from typing import Dict, List, Optional, Tuple
+from urllib.parse import urlsplit
+
+from utils import get_url_expire_time, normalize_share_url
+
 from .acfun import AcFun
-from .base import VideoInfo, VideoSource
+from .base import BaseParser, VideoInfo, VideoSource
+from .batch import BatchItem, BatchParser, BatchResult
 from .bilibili import BiliBili
+from .cache import CacheStats, TTLCache
+from .circuit import (
+    CircuitBreaker,
+    CircuitBreakerRegistry,
+    CircuitBreakerTransport,
+    CircuitConfig,
+    CircuitOpenError,
+    CircuitState,
+    host_breakers,
+    is_upstream_failure,
+    source_breakers,
+)
+from .client_pool import (
+    MEDIA_PROFILE,
+    ClientPool,
+    ClientProfile,
+    cookie_scope,
+    get_client_pool,
+    set_client_pool,
+)
 from .doupai import DouPai
 from .douyin import DouYin
 from .haokan import HaoKan
+from .hedge import (
+    HedgePolicy,
+    HedgeStats,
+    HedgeTransport,
+    hedge_budget,
+    hedge_latencies,
+    hedge_stats,
+)
 from .huya import HuYa
 from .kuaishou import KuaiShou
+from .latency import LatencyHistogram, LatencyRegistry
 from .lishipin import LiShiPin
 from .lvzhou import LvZhou
 from .meipai import MeiPai
@@ -14,14 +52,144 @@ from .pipixia import PiPiXia
 from .quanmin import QuanMin
 from .quanminkge import QuanMinKGe
 from .redbook import RedBook
+from .retry import (
+    DEFAULT_RETRY_POLICY,
+    NO_RETRY_POLICY,
+    RetryBudget,
+    RetryBudgetStats,
+    RetryPolicy,
+    RetryTransport,
+    current_retry_policy,
+    retry_budget,
+)
+from .shortlink import ShortLinkCache, shortlink_cache
+from .singleflight import SingleFlight, SingleFlightStats
 from .sixroom import SixRoom
+from .strategy import Strategy, StrategyRunner, StrategyStats, race
+from .timeouts import (
+    DEFAULT_PARSE_DEADLINE,
+    AdaptiveTimeouts,
+    AdaptiveTimeoutTransport,
+    DeadlineExceeded,
+    adaptive_timeouts,
+    current_deadline,
+    deadline_scope,
+    get_remaining_time,
+)
+from .useragent import UserAgentProvider, ua_provider
 from .weibo import WeiBo
 from .weishi import WeiShi
 from .xigua import XiGua
 from .xinpianchang import XinPianChang
 from .zuiyou import ZuiYou
 
+__all__ = [
+    "AcFun",
+    "BaseParser",
+    "VideoInfo",
+    "VideoSource",
+    "BatchItem",
+    "BatchParser",
+    "BatchResult",
+    "BiliBili",
+    "CacheStats",
+    "TTLCache",
+    "CircuitBreaker",
+    "CircuitBreakerRegistry",
+    "CircuitBreakerTransport",
+    "CircuitConfig",
+    "CircuitOpenError",
+    "CircuitState",
+    "host_breakers",
+    "is_upstream_failure",
+    "source_breakers",
+    "MEDIA_PROFILE",
+    "ClientPool",
+    "ClientProfile",
+    "cookie_scope",
+    "get_client_pool",
+    "set_client_pool",
+    "DouPai",
+    "DouYin",
+    "HaoKan",
+    "HedgePolicy",
+    "HedgeStats",
+    "HedgeTransport",
+    "hedge_budget",
+    "hedge_latencies",
+    "hedge_stats",
+    "HuYa",
+    "KuaiShou",
+    "LatencyHistogram",
+    "LatencyRegistry",
+    "LiShiPin",
+    "LvZhou",
+    "MeiPai",
+    "PiPiGaoXiao",
+    "PiPiXia",
+    "QuanMin",
+    "QuanMinKGe",
+    "RedBook",
+    "DEFAULT_RETRY_POLICY",
+    "NO_RETRY_POLICY",
+    "RetryBudget",
+    "RetryBudgetStats",
+    "RetryPolicy",
+    "RetryTransport",
+    "current_retry_policy",
+    "retry_budget",
+    "ShortLinkCache",
+    "shortlink_cache",
+    "SingleFlight",
+    "SingleFlightStats",
+    "SixRoom",
+    "Strategy",
+    "StrategyRunner",
+    "StrategyStats",
+    "race",
+    "DEFAULT_PARSE_DEADLINE",
+    "AdaptiveTimeouts",
+    "AdaptiveTimeoutTransport",
+    "DeadlineExceeded",
+    "adaptive_timeouts",
+    "current_deadline",
+    "deadline_scope",
+    "get_remaining_time",
+    "UserAgentProvider",
+    "ua_provider",
+    "WeiBo",
+    "WeiShi",
+    "XiGua",
+    "XinPianChang",
+    "ZuiYou",
+    "DEFAULT_RESULT_TTL",
+    "URL_EXPIRE_MARGIN",
+    "video_source_info_mapping",
+    "video_host_routes",
+    "get_source_by_host",
+    "get_source_by_url",
+    "SHARE_URL_PATTERN",
+    "extract_share_urls",
+    "video_parser_registry",
+    "get_parser",
+    "parse_single_flight",
+    "result_cache",
+    "get_result_ttl",
+    "get_retry_policy",
+    "parse_video_share_url",
+    "parse_video_id",
+]
+
+# 解析结果默认缓存时间(秒)
+DEFAULT_RESULT_TTL = 600
+
+# 距离签名地址过期不足该时间(秒)时不再返回缓存
+URL_EXPIRE_MARGIN = 60
+
 # 视频来源与解析器的映射关系
+# domain_list: 分享链接域名, 同时匹配其子域名, 多个来源匹配时最长的域名优先
+# result_ttl: 解析结果缓存时间(秒), 取决于返回的签名 CDN 地址多久失效
+# retry: 该来源请求的重试策略, 默认为 DEFAULT_RETRY_POLICY
 video_source_info_mapping = {
     VideoSource.AcFun: {
         "domain_list": ["www.acfun.cn"],
@@ -34,6 +202,10 @@ video_source_info_mapping = {
     VideoSource.DouYin: {
         "domain_list": ["v.douyin.com", "www.iesdouyin.com", "www.douyin.com"],
         "parser": DouYin,
+        # play_addr 为播放接口地址, 长期有效
+        "result_ttl": 1800,
+        # 图集 slidesinfo 接口偶尔返回 5xx, 多重试一次
+        "retry": RetryPolicy(max_attempts=3),
     },
     VideoSource.HaoKan: {
         "domain_list": [
@@ -49,6 +221,8 @@ video_source_info_mapping = {
             "m.bilibili.com",
         ],
         "parser": BiliBili,
+        # durl 带 deadline 参数, 约 2 小时失效
+        "result_ttl": 1800,
     },
     VideoSource.HuYa: {
         "domain_list": ["v.huya.com"],
@@ -57,6 +231,7 @@ video_source_info_mapping = {
     VideoSource.KuaiShou: {
         "domain_list": ["v.kuaishou.com"],
         "parser": KuaiShou,
+        "result_ttl": 1800,
     },
     VideoSource.LiShiPin: {
         "domain_list": ["www.pearvideo.com"],
@@ -91,8 +266,10 @@ video_source_info_mapping = {
         "parser": SixRoom,
     },
     VideoSource.WeiBo: {
-        "domain_list": ["weibo.com"],
+        # m.weibo.cn 为微博移动版, 比绿洲的 weibo.cn 更长, 优先匹配
+        "domain_list": ["weibo.com", "m.weibo.cn"],
         "parser": WeiBo,
+        "result_ttl": 1800,
     },
     VideoSource.WeiShi: {
         "domain_list": ["isee.weishi.qq.com"],
@@ -116,53 +293,275 @@ video_source_info_mapping = {
             "xhslink.com",
         ],
         "parser": RedBook,
+        # masterUrl 带签名, 失效较快
+        "result_ttl": 300,
     },
 }
 
 
-async def parse_video_share_url(share_url: str) -> VideoInfo:
+def _build_host_routes() -> Dict[str, VideoSource]:
     """
-    解析分享链接, 获取视频信息
+    构建 域名 -> 视频来源 路由表, 模块导入时构建一次
+    :return:
+    """
+    routes = {}
+    for source, source_info in video_source_info_mapping.items():
+        for domain in source_info["domain_list"]:
+            domain = domain.lower()
+            if domain in routes and routes[domain] != source:
+                raise ValueError(
+                    f"domain {domain} is configured for both "
+                    f"{routes[domain]} and {source}"
+                )
+            routes[domain] = source
+    return routes
+
+
+# 域名 -> 视频来源
+video_host_routes = _build_host_routes()
+
+
+def get_source_by_host(host: str) -> Optional[VideoSource]:
+    """
+    根据域名获取视频来源
+    从完整域名开始逐级去掉最左侧的标签查找, 最长匹配的域名优先
+    如 m.oasis.weibo.cn -> weibo.cn (绿洲), m.weibo.cn -> m.weibo.cn (微博)
+    :param host: 域名
+    :return: 视频来源, 不支持时返回 None
+    """
+    host = host.lower().rstrip(".")
+    while host:
+        source = video_host_routes.get(host)
+        if source is not None:
+            return source
+        _, _, host = host.partition(".")
+    return None
+
+
+# 快速提取链接中的域名, 第二个分组匹配到 @ 或 : 时 (带 userinfo 或端口) 交给 urlsplit
+_URL_HOST_PATTERN = re.compile(r"\s*[\w+.-]+://([^:/?#@\s]+)([@:]?)")
+
+
+def get_source_by_url(share_url: str) -> Optional[VideoSource]:
+    """
+    根据分享链接的域名获取视频来源
     :param share_url: 视频分享链接
+    :return: 视频来源, 不支持时返回 None
+    """
+    match = _URL_HOST_PATTERN.match(share_url)
+    if not match:
+        return None
+
+    host = match.group(1)
+    if match.group(2):
+        try:
+            host = urlsplit(share_url.strip()).hostname
+        except ValueError:
+            return None
+        if not host:
+            return None
+    return get_source_by_host(host)
+
+
+# 分享文案中的链接
+SHARE_URL_PATTERN = re.compile(
+    r"http[s]?:\/\/[\w.-]+[\w\/-]*[\w.-]*\??[\w=&:\-\+\%]*[/]*"
+)
+
+
+def extract_share_urls(text: str) -> List[str]:
+    """
+    从分享文案中提取所有支持的分享链接, 一次扫描全文
+    不支持的域名会被忽略, 重复的链接只保留第一个
+    :param text: 分享文案, 可能包含多个链接
+    :return: 按出现顺序排列的分享链接
+    """
+    share_urls = []
+    seen = set()
+    for match in SHARE_URL_PATTERN.finditer(text):
+        share_url = match.group()
+        if get_source_by_url(share_url) is None:
+            continue
+        key = normalize_share_url(share_url)
+        if key in seen:
+            continue
+        seen.add(key)
+        share_urls.append(share_url)
+    return share_urls
+
+
+def _build_parser_registry() -> Dict[VideoSource, BaseParser]:
+    """
+    创建各来源的解析器单例, 模块导入时创建一次
+    :return:
+    """
+    return {
+        source: source_info["parser"]()
+        for source, source_info in video_source_info_mapping.items()
+        if source_info["parser"]
+    }
+
+
+# 视频来源 -> 解析器单例
+video_parser_registry = _build_parser_registry()
+
+
+def get_parser(source: VideoSource) -> Optional[BaseParser]:
+    """
+    获取视频来源对应的解析器单例
+    :param source: 视频来源
+    :return: 解析器, 没有配置时返回 None
+    """
+    return video_parser_registry.get(source)
+
+
+# 合并相同分享链接 / 视频ID 的并发解析请求
+parse_single_flight = SingleFlight()
+
+# 解析结果缓存, key 与合并请求的 key 相同
+result_cache = TTLCache(max_entries=2048)
+
+
+def get_result_ttl(source: VideoSource, video_info: VideoInfo) -> float:
+    """
+    计算解析结果的缓存时间, 不超过平台配置, 也不超过结果中签名地址的过期时间
+    :param source: 视频来源
+    :param video_info: 解析结果
+    :return: 缓存时间(秒)
+    """
+    ttl = video_source_info_mapping[source].get("result_ttl", DEFAULT_RESULT_TTL)
+
+    urls = [video_info.video_url, video_info.cover_url]
+    for img in video_info.images:
+        urls.append(img.url)
+        urls.append(img.live_photo_url)
+
+    now = time.time()
+    for url in urls:
+        expire_time = get_url_expire_time(url)
+        if expire_time is not None:
+            ttl = min(ttl, expire_time - now - URL_EXPIRE_MARGIN)
+
+    return ttl
+
+
+def get_retry_policy(source: VideoSource) -> RetryPolicy:
+    """
+    获取来源的重试策略
+    :param source: 视频来源
     :return:
     """
-    source = ""
-    for item_source, item_source_info in video_source_info_mapping.items():
-        for item_url_domain in item_source_info["domain_list"]:
-            if item_url_domain in share_url:
-                source = item_source
-                break
-        if source:
-            break
+    return video_source_info_mapping[source].get("retry", DEFAULT_RETRY_POLICY)
 
+
+async def _run_parse(source: VideoSource, parse_func) -> VideoInfo:
+    """
+    在来源的熔断器、重试策略及时间预算下执行解析
+    在合并请求内部执行, 并发的相同请求只计一次结果
+    超出时间预算时抛出 DeadlineExceeded; 只有上游故障计为来源的失败,
+    链接无效等解析错误不计入熔断统计
+    :param source: 视频来源
+    :param parse_func: 返回解析协程的函数
+    :return:
+    """
+    # 合并请求的 task 有独立的 context, 设置的策略只作用于本次解析发出的请求
+    current_retry_policy.set(get_retry_policy(source))
+
+    async def run():
+        remaining = get_remaining_time()
+        try:
+            return await asyncio.wait_for(parse_func(), remaining)
+        except asyncio.TimeoutError:
+            raise DeadlineExceeded("parse deadline exceeded") from None
+
+    # 每次解析使用独立的 cookie, 重定向链中设置的 cookie 只在本次解析内有效
+    with cookie_scope(), deadline_scope(DEFAULT_PARSE_DEADLINE):
+        return await source_breakers.get(source.value).call(run)
+
+
+async def _parse_with_cache(
+    key: Tuple, source: VideoSource, parse_func, use_cache: bool
+) -> VideoInfo:
+    """
+    先查缓存, 未命中时合并并发请求解析, 并写入缓存
+    来源熔断中时直接抛出 CircuitOpenError
+    合并的解析只使用默认的时间预算, 调用方自己的截止时间 (如批量解析) 只限制本调用方的等待,
+    超出时抛出 DeadlineExceeded, 不影响合并到同一解析的其它调用方; 所有调用方都已放弃时取消解析
+    :param key: 缓存 / 合并请求的 key
+    :param source: 视频来源
+    :param parse_func: 返回解析协程的函数
+    :param use_cache: 是否读取缓存, 为 False 时仍会用新结果刷新缓存
+    :return:
+    """
+    if use_cache:
+        video_info = result_cache.get(key)
+        if video_info is not None:
+            return video_info
+
+    try:
+        video_info = await asyncio.wait_for(
+            parse_single_flight.do(key, lambda: _run_parse(source, parse_func)),
+            get_remaining_time(),
+        )
+    except asyncio.TimeoutError:
+        raise DeadlineExceeded("parse deadline exceeded") from None
+    result_cache.set(key, video_info, get_result_ttl(source, video_info))
+    return video_info
+
+
+async def parse_video_share_url(share_url: str, use_cache: bool = True) -> VideoInfo:
+    """
+    解析分享链接, 获取视频信息
+    :param share_url: 视频分享链接
+    :param use_cache: 是否读取解析结果缓存
+    :return:
+    """
+    source = get_source_by_url(share_url)
     if not source:
         raise ValueError(f"share url [{share_url}] does not have source config")
 
-    url_parser = video_source_info_mapping[source]["parser"]
-    if not url_parser:
+    _obj = get_parser(source)
+    if not _obj:
         raise ValueError(f"source {source} has no video parser")
 
-    _obj = url_parser()
-    video_info = await _obj.parse_share_url(share_url)
+    # 能在本地解析出视频ID时, 与 parse_video_id 共用缓存
+    try:
+        video_id = _obj.get_video_id_from_share_url(share_url)
+    except Exception:
+        video_id = ""
+    if video_id:
+        key = ("video_id", source, video_id)
+    else:
+        key = ("share_url", source, normalize_share_url(share_url))
+
+    video_info = await _parse_with_cache(
+        key, source, lambda: _obj.parse_share_url(share_url), use_cache
+    )
 
     return video_info
 
 
-async def parse_video_id(source: VideoSource, video_id: str) -> VideoInfo:
+async def parse_video_id(
+    source: VideoSource, video_id: str, use_cache: bool = True
+) -> VideoInfo:
     """
     解析视频ID, 获取视频信息
     :param source: 视频来源
     :param video_id: 视频id
+    :param use_cache: 是否读取解析结果缓存
     :return:
     """
     if not video_id or not source:
         raise ValueError("video_id or source is empty")
 
-    id_parser = video_source_info_mapping[source]["parser"]
-    if not id_parser:
+    _obj = get_parser(source)
+    if not _obj:
         raise ValueError(f"source {source} has no video parser")
-
-    _obj = id_parser()
-    video_info = await _obj.parse_video_id(video_id)
+    video_info = await _parse_with_cache(
+        ("video_id", source, video_id),
+        source,
+        lambda: _obj.parse_video_id(video_id),
+        use_cache,
+    )
 
     return video_info
@@ -1,10 +1,9 @@
-import json
-import re
+from urllib.parse import urlparse
 
-import httpx
 from parsel import Selector
 
 from .base import BaseParser, VideoAuthor, VideoInfo
+from .embedded import extract_states
 
 
 class AcFun(BaseParser):
@@ -13,29 +12,27 @@ class AcFun(BaseParser):
     """
 
     async def parse_share_url(self, share_url: str) -> VideoInfo:
-        async with httpx.AsyncClient(follow_redirects=True) as client:
-            response = await client.get(share_url, headers=self.get_default_headers())
-            response.raise_for_status()
+        response = await self.client.get(
+            share_url, headers=self.get_default_headers(), follow_redirects=True
+        )
+        response.raise_for_status()
 
-        re_video_pattern = r"var videoInfo =\s(.*?);"
-        re_video_result = re.search(re_video_pattern, response.text)
-        if not re_video_result or len(re_video_result.groups()) < 1:
+        states = extract_states(
+            response.content, ["videoInfo", "playInfo"], self.page_encoding
+        )
+        if "videoInfo" not in states:
             raise Exception("failed to parse video JSON info from HTML")
 
-        video_text = re_video_result.group(1).strip()
-        video_data = json.loads(video_text)
+        video_data = states.loads("videoInfo")
 
         # 解析视频播放地址
-        re_play_info_pattern = r"var playInfo =\s(.*?);"
-        re_play_info_result = re.search(re_play_info_pattern, response.text)
-        if not re_play_info_result or len(re_play_info_result.groups()) < 1:
+        if "playInfo" not in states:
             raise Exception("failed to parse play info JSON info from HTML")
 
-        play_info_text = re_play_info_result.group(1).strip()
-        play_info_data = json.loads(play_info_text)
+        play_info_data = states.loads("playInfo")
 
         # 解析用户信息
-        sel = Selector(response.text)
+        sel = Selector(body=response.content, encoding=self.page_encoding)
         uid = (
             sel.css("div.up-info > a.info-item1::attr(href)")
             .get(default="")
@@ -56,6 +53,13 @@ class AcFun(BaseParser):
         )
         return video_info
 
+    def get_video_id_from_share_url(self, share_url: str) -> str:
+        # https://www.acfun.cn/v/ac36935385
+        path = urlparse(share_url).path
+        if path.startswith("/v/ac"):
+            return path.replace("/v/", "").strip("/")
+        return ""
+
     async def parse_video_id(self, video_id: str) -> VideoInfo:
         # acid, 格式: ac36935385
         req_url = f"https://www.acfun.cn/v/{video_id}"
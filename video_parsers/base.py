@@ -1,9 +1,17 @@
 import dataclasses
 from abc import ABC, abstractmethod
 from enum import Enum
-from typing import Dict, List
+from typing import Dict, Iterable, List, Optional
 
-import fake_useragent
+import httpx
+
+from .client_pool import DEFAULT_PROFILE, ClientPool, ClientProfile, get_client_pool
+from .embedded import DEFAULT_ENCODING, EmbeddedStates
+from .shortlink import shortlink_cache
+from .useragent import ua_provider
+
+# 流式读取页面时最多下载的字节数, 防止异常页面无限下载
+MAX_PAGE_BYTES = 4 * 1024 * 1024
 
 
 class VideoSource(Enum):
@@ -89,13 +97,118 @@ class VideoInfo:
 
 
 class BaseParser(ABC):
+    """
+    解析器基类
+    解析器以单例方式在所有请求间共享, 实例上不能保存单次请求的状态
+    """
+
+    # 该平台使用的连接池配置, 子类可覆盖
+    client_profile: ClientProfile = DEFAULT_PROFILE
+
+    # 该平台页面的编码, 提取内嵌数据时直接扫描原始字节, 只解码需要的部分
+    page_encoding: str = DEFAULT_ENCODING
+
+    def __init__(self, client_pool: Optional[ClientPool] = None):
+        """
+        :param client_pool: 共享连接池, 为空时使用进程级连接池
+        """
+        self._client_pool = client_pool
+
+    @property
+    def client(self) -> httpx.AsyncClient:
+        """
+        共享的长连接 client, 不要在 async with 中使用, 由连接池负责关闭
+        """
+        pool = self._client_pool or get_client_pool()
+        return pool.get(self.client_profile)
+
+    # 默认请求头模板
+    # 使用固定的、真实的安卓 User-Agent，比随机生成的更稳
+    DEFAULT_HEADERS: Dict[str, str] = {
+        "User-Agent": (
+            "Mozilla/5.0 (Linux; Android 10; K) AppleWebKit/537.36 "
+            "(KHTML, like Gecko) Chrome/124.0.0.0 Mobile Safari/537.36"
+        ),
+        "Referer": "https://www.douyin.com/",
+        "Accept-Language": "zh-CN,zh;q=0.9",
+    }
+
     def get_default_headers(self) -> dict:
-        # 使用固定的、真实的安卓 User-Agent，比随机生成的更稳
-        return {
-            "User-Agent": "Mozilla/5.0 (Linux; Android 10; K) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/124.0.0.0 Mobile Safari/537.36",
-            "Referer": "https://www.douyin.com/",
-            "Accept-Language": "zh-CN,zh;q=0.9",
-        }
+        # 返回副本, 解析器实例在并发请求间共享, 模板不能被修改
+        return dict(self.DEFAULT_HEADERS)
+
+    def get_user_agent(self, os: str = "ios") -> str:
+        """
+        从共享的 UA 池中获取 User-Agent
+        可通过 ua_provider.pin(解析器类名, ua) 为某个平台固定 UA
+        :param os: 系统, 如 ios / android / windows
+        :return:
+        """
+        return ua_provider.get(os, platform=type(self).__name__)
+
+    async def resolve_short_url(self, short_url: str, headers: dict) -> str:
+        """
+        请求短链接 (不跟随跳转) 获取跳转地址, 结果缓存在共享的短链接缓存中
+        只缓存跳转到已支持平台的 3xx 响应, 跳转到验证码 / 登录 / 错误页时不缓存
+        :param short_url: 短链接
+        :param headers: 请求头
+        :return: 跳转地址, 没有跳转时返回空字符串
+        """
+        # 包的 __init__ 导入了本模块, 在函数内导入避免循环导入
+        from . import get_source_by_url
+
+        location = shortlink_cache.get(short_url)
+        if location:
+            return location
+
+        response = await self.client.get(
+            short_url, headers=headers, follow_redirects=False
+        )
+        location = response.headers.get("location", "")
+        if response.is_redirect and get_source_by_url(location) is not None:
+            await shortlink_cache.set(short_url, location)
+        return location
+
+    async def fetch_page_states(
+        self,
+        url: str,
+        names: Iterable[str],
+        require_all: bool = False,
+        max_bytes: int = MAX_PAGE_BYTES,
+        **kwargs,
+    ) -> EmbeddedStates:
+        """
+        流式请求页面并增量扫描状态变量, 需要的变量所在的 <script> 结束后立即关闭连接,
+        不再下载页面剩余部分; 超过 max_bytes 时同样停止, 按已下载的内容扫描
+        页面按 page_encoding 处理, 不解码整个页面
+        :param url: 页面地址
+        :param names: 需要的状态变量名
+        :param require_all: 是否等待所有变量出现, 为 False 时出现任意一个即停止
+        :param max_bytes: 最多下载的字节数
+        :param kwargs: 其余请求参数, 与 client.get 相同
+        :return: 页面中的状态变量, content 为已下载的页面内容
+        """
+        states = EmbeddedStates(names, self.page_encoding)
+        async with self.client.stream("GET", url, **kwargs) as response:
+            response.raise_for_status()
+            async for chunk in response.aiter_bytes():
+                states.feed(chunk)
+                if (
+                    states.is_complete(require_all)
+                    or response.num_bytes_downloaded >= max_bytes
+                ):
+                    break
+        states.close()
+        return states
+
+    def get_video_id_from_share_url(self, share_url: str) -> str:
+        """
+        不请求上游, 直接从分享链接中解析视频ID, 用作解析结果的缓存 key
+        只有 parse_share_url(share_url) 与 parse_video_id(video_id) 结果一致时才返回ID
+        :param share_url: 视频分享链接
+        :return: 视频ID, 无法在本地解析(如短链接需要跳转)时返回空字符串
+        """
+        return ""
 
     @abstractmethod
     async def parse_share_url(self, share_url: str) -> VideoInfo:
@@ -0,0 +1,181 @@
+import asyncio
+import dataclasses
+import time
+from typing import AsyncIterator, Dict, List, Optional
+
+from .base import VideoInfo, VideoSource
+from .timeouts import current_deadline
+
+
+@dataclasses.dataclass
+class BatchItem:
+    """
+    批量解析的单个输入, 分享链接 与 (来源, 视频ID) 二选一
+    """
+
+    # 视频分享链接
+    url: str = ""
+
+    # 视频来源
+    source: Optional[VideoSource] = None
+
+    # 视频ID
+    video_id: str = ""
+
+
+@dataclasses.dataclass
+class BatchResult:
+    """
+    批量解析的单个结果
+    """
+
+    # 对应输入的下标
+    index: int
+
+    # 解析结果, 失败时为 None
+    video_info: Optional[VideoInfo] = None
+
+    # 错误信息
+    error: str = ""
+
+
+class BatchParser:
+    """
+    批量解析: 全局并发数 + 单个来源并发数双重限制, 按完成顺序返回结果
+    先获取来源的并发名额再获取全局名额, 某个平台变慢时只会占满自己的名额, 不影响其它平台
+    """
+
+    def __init__(
+        self,
+        concurrency: int = 16,
+        per_source_concurrency: int = 4,
+        fail_fast: bool = False,
+        deadline: Optional[float] = None,
+        use_cache: bool = True,
+    ):
+        """
+        :param concurrency: 全局最大并发数
+        :param per_source_concurrency: 单个来源最大并发数
+        :param fail_fast: 出现第一个失败时取消剩余任务
+        :param deadline: 整批的超时时间(秒), 超时后取消剩余任务
+        :param use_cache: 是否读取解析结果缓存
+        """
+        self.concurrency = concurrency
+        self.per_source_concurrency = per_source_concurrency
+        self.fail_fast = fail_fast
+        self.deadline = deadline
+        self.use_cache = use_cache
+
+    async def run(self, items: List[BatchItem]) -> AsyncIterator[BatchResult]:
+        """
+        执行批量解析, 每完成一个就返回一个结果
+        :param items: 输入列表
+        :return: 按完成顺序返回的结果, 每个输入恰好对应一个结果
+        """
+        # 包的 __init__ 导入了本模块, 在函数内导入避免循环导入
+        from . import get_source_by_url
+
+        global_semaphore = asyncio.Semaphore(self.concurrency)
+        source_semaphores: Dict[VideoSource, asyncio.Semaphore] = {}
+        queue: "asyncio.Queue[BatchResult]" = asyncio.Queue()
+        tasks: Dict[int, asyncio.Task] = {}
+        end_time = None
+        if self.deadline is not None:
+            end_time = time.monotonic() + self.deadline
+
+        for index, item in enumerate(items):
+            source = item.source
+            if item.url:
+                source = get_source_by_url(item.url)
+                if source is None:
+                    queue.put_nowait(
+                        BatchResult(
+                            index,
+                            error=f"share url [{item.url}] does not "
+                            "have source config",
+                        )
+                    )
+                    continue
+            elif source is None or not item.video_id:
+                queue.put_nowait(
+                    BatchResult(index, error="url or source/video_id is empty")
+                )
+                continue
+
+            if source not in source_semaphores:
+                source_semaphores[source] = asyncio.Semaphore(
+                    self.per_source_concurrency
+                )
+            tasks[index] = asyncio.ensure_future(
+                self._run_item(
+                    index,
+                    item,
+                    source_semaphores[source],
+                    global_semaphore,
+                    queue,
+                    end_time,
+                )
+            )
+
+        pending = len(items)
+        stop_reason = ""
+        try:
+            while pending > 0 and not stop_reason:
+                timeout = None
+                if end_time is not None:
+                    timeout = max(end_time - time.monotonic(), 0)
+                try:
+                    result = await asyncio.wait_for(queue.get(), timeout)
+                except asyncio.TimeoutError:
+                    stop_reason = "batch deadline exceeded"
+                    break
+
+                pending -= 1
+                tasks.pop(result.index, None)
+                yield result
+                if result.error and self.fail_fast:
+                    stop_reason = "cancelled by fail fast"
+
+            # 提前结束时, 先返回已完成的结果, 再取消剩余任务并为其返回错误结果
+            while not queue.empty():
+                result = queue.get_nowait()
+                tasks.pop(result.index, None)
+                yield result
+            for index in sorted(tasks):
+                tasks[index].cancel()
+                yield BatchResult(index, error=stop_reason)
+        finally:
+            for task in tasks.values():
+                task.cancel()
+
+    async def _run_item(
+        self,
+        index: int,
+        item: BatchItem,
+        source_semaphore: asyncio.Semaphore,
+        global_semaphore: asyncio.Semaphore,
+        queue: "asyncio.Queue[BatchResult]",
+        end_time: Optional[float],
+    ):
+        from . import parse_video_id, parse_video_share_url
+
+        # 等待解析结果的截止时间不晚于批量解析的截止时间; 合并的解析在独立的 context 中执行,
+        # 超时后没有其它调用方等待同一解析时, 由合并请求取消解析, 不再发出新的请求
+        if end_time is not None:
+            current_deadline.set(end_time)
+        try:
+            async with source_semaphore, global_semaphore:
+                if item.url:
+                    video_info = await parse_video_share_url(
+                        item.url, use_cache=self.use_cache
+                    )
+                else:
+                    video_info = await parse_video_id(
+                        item.source, item.video_id, use_cache=self.use_cache
+                    )
+            result = BatchResult(index, video_info=video_info)
+        except asyncio.CancelledError:
+            raise
+        except Exception as err:
+            result = BatchResult(index, error=str(err) or type(err).__name__)
+        queue.put_nowait(result)
@@ -1,9 +1,9 @@
-import json
-from urllib.parse import urlparse
-
-import httpx
+from typing import Optional
+from urllib.parse import ParseResult, urlparse
 
+from . import jsoncodec
 from .base import BaseParser, VideoAuthor, VideoInfo
+from .hedge import HedgePolicy
 
 
 class BiliBili(BaseParser):
@@ -19,14 +19,19 @@ class BiliBili(BaseParser):
         "(KHTML, like Gecko) Chrome/108.0.0.0 Safari/537.36"
     )
 
-    def get_default_headers(self) -> dict:
-        headers = {
-            "User-Agent": self.USER_AGENT,
-            "Referer": "https://www.bilibili.com/",
-        }
+    DEFAULT_HEADERS = {
+        "User-Agent": USER_AGENT,
+        "Referer": "https://www.bilibili.com/",
         # 如需爬取更高清的视频请取消这里的注释
-        # headers["Cookie"] = self.BILI_COOKIE
-        return headers
+        # "Cookie": BILI_COOKIE,
+    }
+
+    # playurl 接口偶尔卡顿数秒, 超过 p95 耗时未返回时发出对冲请求
+    PLAYURL_HEDGE = HedgePolicy(name="bilibili.playurl")
+
+    def get_video_id_from_share_url(self, share_url: str) -> str:
+        # b23.tv 短链接需要请求跳转, 无法在本地解析
+        return self._get_bvid_from_path(urlparse(share_url))
 
     async def parse_share_url(self, share_url: str) -> VideoInfo:
         bvid = await self._get_bvid_from_url(share_url)
@@ -37,7 +42,7 @@ class BiliBili(BaseParser):
         view_api_url = f"https://api.bilibili.com/x/web-interface/view?bvid={video_id}"
         view_resp_data = await self._send_bili_request(view_api_url)
 
-        view_resp = json.loads(view_resp_data)
+        view_resp = jsoncodec.loads(view_resp_data)
         if view_resp.get("code") != 0 or not view_resp.get("data", {}).get("pages"):
             raise ValueError(f"无法获取该视频: {view_resp.get('message', '未知错误')}")
 
@@ -50,9 +55,11 @@ class BiliBili(BaseParser):
             f"otype=json&fnver=0&fnval=0&qn=80&bvid={video_id}"
             f"&cid={first_page_cid}&platform=html5"
         )
-        play_resp_data = await self._send_bili_request(play_api_url)
+        play_resp_data = await self._send_bili_request(
+            play_api_url, hedge=self.PLAYURL_HEDGE
+        )
 
-        play_resp = json.loads(play_resp_data)
+        play_resp = jsoncodec.loads(play_resp_data)
         if play_resp.get("code") != 0:
             raise ValueError(
                 f"B站API返回错误: {play_resp.get('message', '未知错误')} "
@@ -95,26 +102,38 @@ class BiliBili(BaseParser):
 
         if "b23.tv" in parsed_url.netloc:
             # 处理短链接
-            async with httpx.AsyncClient(follow_redirects=False) as client:
-                resp = await client.get(raw_url, headers=self.get_default_headers())
-                location = resp.headers.get("location")
-                if not location:
-                    raise ValueError("无法从b23.tv获取重定向链接")
-                return await self._get_bvid_from_url(location)
+            location = await self.resolve_short_url(
+                raw_url, headers=self.get_default_headers()
+            )
+            if not location:
+                raise ValueError("无法从b23.tv获取重定向链接")
+            return await self._get_bvid_from_url(location)
+
+        if bvid := self._get_bvid_from_path(parsed_url):
+            return bvid
 
+        raise ValueError("不是有效的B站视频链接")
+
+    @staticmethod
+    def _get_bvid_from_path(parsed_url: ParseResult) -> str:
+        """从 bilibili.com 链接路径中提取BVID"""
         if "bilibili.com" in parsed_url.netloc:
             path = parsed_url.path.strip("/")
             parts = path.split("/")
             if len(parts) >= 2 and parts[0] == "video":
                 if parts[1].startswith("BV"):
                     return parts[1]
+        return ""
 
-        raise ValueError("不是有效的B站视频链接")
-
-    async def _send_bili_request(self, api_url: str) -> str:
+    async def _send_bili_request(
+        self, api_url: str, hedge: Optional[HedgePolicy] = None
+    ) -> bytes:
         """发送B站API请求"""
-        async with httpx.AsyncClient() as client:
-            response = await client.get(api_url, headers=self.get_default_headers())
-            if response.status_code != 200:
-                raise ValueError(f"HTTP请求失败, 状态码: {response.status_code}")
-            return response.text
+        response = await self.client.get(
+            api_url,
+            headers=self.get_default_headers(),
+            extensions={"hedge": hedge} if hedge else None,
+        )
+        if response.status_code != 200:
+            raise ValueError(f"HTTP请求失败, 状态码: {response.status_code}")
+        return response.content
@@ -0,0 +1,110 @@
+import dataclasses
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Hashable, List, Optional, Tuple
+
+
+@dataclasses.dataclass
+class CacheStats:
+    """
+    缓存统计
+    """
+
+    # 命中次数
+    hits: int = 0
+
+    # 未命中次数
+    misses: int = 0
+
+    # 容量满时按 LRU 淘汰的条目数
+    evictions: int = 0
+
+    # 过期淘汰的条目数
+    expirations: int = 0
+
+
+class TTLCache:
+    """
+    有容量上限的进程内 LRU 缓存, 每个条目有独立的过期时间
+    """
+
+    def __init__(
+        self,
+        max_entries: int = 2048,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        """
+        :param max_entries: 最大条目数, 超出时淘汰最久未使用的条目
+        :param clock: 时钟函数, 返回单调递增的秒数
+        """
+        self.max_entries = max_entries
+        self._clock = clock
+        self._data: "OrderedDict[Hashable, Tuple[float, Any]]" = OrderedDict()
+        self.stats = CacheStats()
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    def get(self, key: Hashable) -> Optional[Any]:
+        """
+        获取缓存值, 不存在或已过期时返回 None
+        :param key: 缓存 key
+        :return:
+        """
+        item = self._data.get(key)
+        if item is None:
+            self.stats.misses += 1
+            return None
+
+        expire_at, value = item
+        if expire_at <= self._clock():
+            del self._data[key]
+            self.stats.expirations += 1
+            self.stats.misses += 1
+            return None
+
+        self._data.move_to_end(key)
+        self.stats.hits += 1
+        return value
+
+    def set(self, key: Hashable, value: Any, ttl: float):
+        """
+        写入缓存
+        :param key: 缓存 key
+        :param value: 缓存值
+        :param ttl: 有效期(秒), 小于等于0时不缓存
+        """
+        if ttl <= 0:
+            self._data.pop(key, None)
+            return
+
+        self._data[key] = (self._clock() + ttl, value)
+        self._data.move_to_end(key)
+        while len(self._data) > self.max_entries:
+            self._data.popitem(last=False)
+            self.stats.evictions += 1
+
+    def items(self) -> List[Tuple[Hashable, Any]]:
+        """
+        未过期的 (key, value) 列表, 按最近使用时间从旧到新排序
+        :return:
+        """
+        now = self._clock()
+        return [
+            (key, value)
+            for key, (expire_at, value) in self._data.items()
+            if expire_at > now
+        ]
+
+    def delete(self, key: Hashable):
+        """
+        删除缓存
+        :param key: 缓存 key
+        """
+        self._data.pop(key, None)
+
+    def clear(self):
+        """
+        清空缓存
+        """
+        self._data.clear()
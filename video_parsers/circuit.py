@@ -0,0 +1,333 @@
+import asyncio
+import dataclasses
+import time
+from collections import OrderedDict, deque
+from enum import Enum
+from typing import Any, Awaitable, Callable, Deque, Dict, Tuple
+
+import httpx
+
+from .timeouts import DeadlineExceeded
+
+
+class CircuitState(Enum):
+    """
+    熔断器状态
+    """
+
+    Closed = "closed"  # 正常放行
+    Open = "open"  # 熔断中, 直接失败
+    HalfOpen = "half_open"  # 放行少量探测请求, 根据结果决定恢复或继续熔断
+
+
+class CircuitOpenError(httpx.TransportError):
+    """
+    熔断中, 请求未发出直接失败
+    继承 httpx.TransportError, 调用方按请求错误处理即可
+    """
+
+
+def is_upstream_failure(err: BaseException) -> bool:
+    """
+    异常是否说明上游故障: 请求错误 (连接失败 / 超时等) 或 5xx / 429 响应
+    链接格式错误、视频已删除等解析错误, 以及调用方的时间预算用完, 不是上游故障
+    :param err: 异常
+    :return:
+    """
+    if isinstance(err, DeadlineExceeded):
+        return False
+    if isinstance(err, httpx.TransportError):
+        return True
+    if isinstance(err, httpx.HTTPStatusError):
+        status_code = err.response.status_code
+        return status_code >= 500 or status_code == 429
+    return False
+
+
+@dataclasses.dataclass(frozen=True)
+class CircuitConfig:
+    """
+    熔断器配置
+    """
+
+    # 统计窗口(秒)
+    window: float = 60.0
+
+    # 窗口内请求数达到该值才会根据比例熔断
+    min_calls: int = 10
+
+    # 失败比例达到该值时熔断
+    failure_rate: float = 0.5
+
+    # 耗时超过该值(秒)记为慢请求
+    slow_call_seconds: float = 3.0
+
+    # 慢请求比例达到该值时熔断
+    slow_call_rate: float = 0.8
+
+    # 首次熔断时长(秒), 半开探测失败后翻倍
+    open_seconds: float = 15.0
+
+    # 最长熔断时长(秒)
+    max_open_seconds: float = 120.0
+
+    # 半开状态下同时放行的探测请求数, 也是恢复所需的连续成功次数
+    half_open_probes: int = 2
+
+
+class CircuitBreaker:
+    """
+    熔断器: 统计窗口内的失败比例或慢请求比例过高时熔断
+    熔断期间请求直接失败, 不再占用上游超时时间; 到期后进入半开状态, 探测请求全部成功则恢复
+    """
+
+    def __init__(
+        self,
+        name: str,
+        config: CircuitConfig = CircuitConfig(),
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        """
+        :param name: 熔断器名称, 如来源或域名
+        :param config: 熔断器配置
+        :param clock: 时钟函数, 返回单调递增的秒数
+        """
+        self.name = name
+        self.config = config
+        self._clock = clock
+        self.state = CircuitState.Closed
+        # 窗口内的请求结果 (时间, 是否失败, 是否慢请求)
+        self._calls: Deque[Tuple[float, bool, bool]] = deque()
+        self._failures = 0
+        self._slow_calls = 0
+        self._open_until = 0.0
+        self._open_seconds = config.open_seconds
+        self._probes = 0
+        self._probe_successes = 0
+        # 累计拒绝的请求数
+        self.rejected = 0
+
+    def before_call(self):
+        """
+        请求前调用, 熔断中时抛出 CircuitOpenError
+        调用后必须调用 record 或 release
+        """
+        if self.state is CircuitState.Open:
+            if self._clock() < self._open_until:
+                self.rejected += 1
+                raise CircuitOpenError(f"circuit [{self.name}] is open")
+            self.state = CircuitState.HalfOpen
+            self._probes = 0
+            self._probe_successes = 0
+
+        if self.state is CircuitState.HalfOpen:
+            if self._probes >= self.config.half_open_probes:
+                self.rejected += 1
+                raise CircuitOpenError(f"circuit [{self.name}] is half open")
+            self._probes += 1
+
+    def record(self, success: bool, elapsed: float):
+        """
+        记录请求结果
+        :param success: 是否成功
+        :param elapsed: 耗时(秒)
+        """
+        slow = elapsed >= self.config.slow_call_seconds
+        if self.state is CircuitState.HalfOpen:
+            self._probes = max(self._probes - 1, 0)
+            if not success or slow:
+                self._trip(backoff=True)
+                return
+            self._probe_successes += 1
+            if self._probe_successes >= self.config.half_open_probes:
+                self._reset()
+            return
+        if self.state is CircuitState.Open:
+            # 熔断前发出的请求, 结果不再计入
+            return
+
+        now = self._clock()
+        self._calls.append((now, not success, slow))
+        self._failures += not success
+        self._slow_calls += slow
+        self._expire(now)
+
+        total = len(self._calls)
+        if total < self.config.min_calls:
+            return
+        if (
+            self._failures / total >= self.config.failure_rate
+            or self._slow_calls / total >= self.config.slow_call_rate
+        ):
+            self._trip(backoff=False)
+
+    def release(self):
+        """
+        请求被取消等无法判断结果时调用, 释放半开状态下占用的探测名额
+        """
+        if self.state is CircuitState.HalfOpen:
+            self._probes = max(self._probes - 1, 0)
+
+    async def call(self, func: Callable[[], Awaitable[Any]]) -> Any:
+        """
+        在熔断器保护下执行 func, 只有上游故障 (见 is_upstream_failure) 记为失败,
+        其它异常不计入结果
+        :param func: 返回协程的函数
+        :return: func 的返回值
+        """
+        self.before_call()
+        began = self._clock()
+        try:
+            result = await func()
+        except (asyncio.CancelledError, CircuitOpenError):
+            # 取消或下游熔断器已拒绝, 不计入本熔断器的结果
+            self.release()
+            raise
+        except Exception as err:
+            if is_upstream_failure(err):
+                self.record(False, self._clock() - began)
+            else:
+                self.release()
+            raise
+        self.record(True, self._clock() - began)
+        return result
+
+    def snapshot(self) -> Dict[str, Any]:
+        """
+        当前状态, 用于管理接口展示
+        """
+        self._expire(self._clock())
+        total = len(self._calls)
+        return {
+            "state": self.state.value,
+            "calls": total,
+            "failure_rate": round(self._failures / total, 3) if total else 0.0,
+            "slow_call_rate": round(self._slow_calls / total, 3) if total else 0.0,
+            "open_remaining": (
+                max(round(self._open_until - self._clock(), 1), 0)
+                if self.state is CircuitState.Open
+                else 0
+            ),
+            "rejected": self.rejected,
+        }
+
+    def _expire(self, now: float):
+        while self._calls and self._calls[0][0] <= now - self.config.window:
+            _, failed, slow = self._calls.popleft()
+            self._failures -= failed
+            self._slow_calls -= slow
+
+    def _trip(self, backoff: bool):
+        if backoff:
+            self._open_seconds = min(
+                self._open_seconds * 2, self.config.max_open_seconds
+            )
+        self.state = CircuitState.Open
+        self._open_until = self._clock() + self._open_seconds
+        self._calls.clear()
+        self._failures = 0
+        self._slow_calls = 0
+
+    def _reset(self):
+        self.state = CircuitState.Closed
+        self._open_seconds = self.config.open_seconds
+        self._probes = 0
+        self._probe_successes = 0
+
+
+class CircuitBreakerRegistry:
+    """
+    按名称(来源 / 域名)管理熔断器
+    数量超出上限时淘汰最久未使用的正常状态熔断器
+    """
+
+    def __init__(
+        self, config: CircuitConfig = CircuitConfig(), max_entries: int = 1024
+    ):
+        """
+        :param config: 新建熔断器使用的配置
+        :param max_entries: 最大熔断器数
+        """
+        self.config = config
+        self.max_entries = max_entries
+        self._breakers: "OrderedDict[str, CircuitBreaker]" = OrderedDict()
+
+    def __len__(self) -> int:
+        return len(self._breakers)
+
+    def get(self, name: str) -> CircuitBreaker:
+        """
+        获取熔断器, 不存在时创建
+        :param name: 名称
+        :return:
+        """
+        breaker = self._breakers.get(name)
+        if breaker is None:
+            breaker = CircuitBreaker(name, self.config)
+            self._breakers[name] = breaker
+            self._evict()
+        else:
+            self._breakers.move_to_end(name)
+        return breaker
+
+    def snapshot(self) -> Dict[str, Dict[str, Any]]:
+        """
+        所有熔断器的状态
+        """
+        return {name: breaker.snapshot() for name, breaker in self._breakers.items()}
+
+    def _evict(self):
+        if len(self._breakers) <= self.max_entries:
+            return
+        for name, breaker in self._breakers.items():
+            if breaker.state is CircuitState.Closed:
+                del self._breakers[name]
+                return
+
+
+class CircuitBreakerTransport(httpx.AsyncBaseTransport):
+    """
+    按请求域名熔断的 transport, 包装连接池中的底层 transport
+    连接错误 / 超时 / 5xx / 429 记为失败, 耗时按收到响应头计算
+    """
+
+    def __init__(
+        self, transport: httpx.AsyncBaseTransport, registry: CircuitBreakerRegistry
+    ):
+        """
+        :param transport: 底层 transport
+        :param registry: 按域名的熔断器
+        """
+        self._transport = transport
+        self._registry = registry
+
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        breaker = self._registry.get(request.url.host)
+        try:
+            breaker.before_call()
+        except CircuitOpenError as err:
+            raise CircuitOpenError(str(err), request=request) from None
+
+        began = time.monotonic()
+        try:
+            response = await self._transport.handle_async_request(request)
+        except asyncio.CancelledError:
+            breaker.release()
+            raise
+        except Exception:
+            breaker.record(False, time.monotonic() - began)
+            raise
+
+        success = response.status_code < 500 and response.status_code != 429
+        breaker.record(success, time.monotonic() - began)
+        return response
+
+    async def aclose(self):
+        await self._transport.aclose()
+
+
+# 按视频来源的熔断器
+source_breakers = CircuitBreakerRegistry()
+
+# 按上游域名的熔断器, 由连接池的 transport 使用
+host_breakers = CircuitBreakerRegistry()
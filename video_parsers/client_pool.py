@@ -0,0 +1,215 @@
+import contextlib
+import dataclasses
+from contextvars import ContextVar
+from http.cookiejar import CookieJar
+from typing import Dict, Iterator, Optional
+
+import httpx
+
+from .circuit import CircuitBreakerTransport, host_breakers
+from .hedge import HedgeTransport, hedge_budget, hedge_latencies, hedge_stats
+from .retry import DEFAULT_RETRY_POLICY, RetryPolicy, RetryTransport, retry_budget
+from .timeouts import AdaptiveTimeoutTransport, adaptive_timeouts
+
+
+@dataclasses.dataclass(frozen=True)
+class ClientProfile:
+    """
+    连接池中单个 httpx.AsyncClient 的配置
+    相同配置的平台共享同一个 client (同一组 keep-alive 连接)
+    """
+
+    # 是否校验证书
+    verify: bool = True
+
+    # 是否读取环境变量中的代理配置
+    trust_env: bool = True
+
+    # 默认是否跟随重定向, 单次请求可通过 follow_redirects 参数覆盖
+    follow_redirects: bool = False
+
+    # 超时时间(秒), 自适应超时的上限
+    timeout: float = 5.0
+    connect_timeout: float = 5.0
+
+    # 自适应超时的下限(秒)
+    min_timeout: float = 1.0
+
+    # keep-alive 连接数限制
+    max_connections: int = 100
+    max_keepalive_connections: int = 20
+    keepalive_expiry: float = 30.0
+
+    # 未按视频来源指定重试策略时使用的策略
+    retry: RetryPolicy = DEFAULT_RETRY_POLICY
+
+
+# 默认配置
+DEFAULT_PROFILE = ClientProfile()
+
+# 部分平台在特定网络环境下 SSL/代理 有问题, 关闭证书校验并忽略环境代理
+INSECURE_PROFILE = ClientProfile(verify=False, trust_env=False)
+
+# 视频代理下载, 大文件需要更长的读超时
+MEDIA_PROFILE = ClientProfile(
+    verify=False,
+    trust_env=False,
+    follow_redirects=True,
+    timeout=60.0,
+    connect_timeout=10.0,
+    min_timeout=5.0,
+)
+
+
+# 当前解析使用的 cookie jar, 由 cookie_scope 设置
+current_cookie_jar: ContextVar[Optional[CookieJar]] = ContextVar(
+    "current_cookie_jar", default=None
+)
+
+
+@contextlib.contextmanager
+def cookie_scope() -> Iterator[CookieJar]:
+    """
+    在作用域内使用一个新的 cookie jar, 一次解析的所有请求共享其中的 cookie
+    :return: 作用域内的 cookie jar
+    """
+    jar = CookieJar()
+    token = current_cookie_jar.set(jar)
+    try:
+        yield jar
+    finally:
+        current_cookie_jar.reset(token)
+
+
+class _ScopedCookieJar(CookieJar):
+    """
+    把 cookie 保存在当前 cookie_scope 的 jar 中的 CookieJar
+    client 在所有请求间共享, cookie 只在同一次解析内有效 (如重定向链中设置的 cookie),
+    不会泄漏到其它解析中; 不在 cookie_scope 内时丢弃响应设置的 cookie
+    """
+
+    @staticmethod
+    def _get_jar() -> CookieJar:
+        jar = current_cookie_jar.get()
+        return jar if jar is not None else CookieJar()
+
+    def add_cookie_header(self, request):
+        self._get_jar().add_cookie_header(request)
+
+    def extract_cookies(self, response, request):
+        self._get_jar().extract_cookies(response, request)
+
+    def set_cookie(self, cookie):
+        self._get_jar().set_cookie(cookie)
+
+    def set_cookie_if_ok(self, cookie, request):
+        self._get_jar().set_cookie_if_ok(cookie, request)
+
+    def clear(self, domain=None, path=None, name=None):
+        self._get_jar().clear(domain, path, name)
+
+    def __iter__(self):
+        return iter(self._get_jar())
+
+    def __len__(self):
+        return len(self._get_jar())
+
+
+class ClientPool:
+    """
+    长连接 httpx.AsyncClient 池, 按 ClientProfile 复用 client
+    在 FastAPI lifespan 中创建, 退出时调用 aclose 关闭所有连接
+    """
+
+    def __init__(self):
+        self._clients: Dict[ClientProfile, httpx.AsyncClient] = {}
+        self._closed = False
+
+    def get(self, profile: ClientProfile = DEFAULT_PROFILE) -> httpx.AsyncClient:
+        """
+        获取指定配置的 client, 不存在时创建
+        :param profile: client 配置
+        :return: httpx.AsyncClient
+        """
+        if self._closed:
+            raise RuntimeError("client pool is closed")
+
+        client = self._clients.get(profile)
+        if client is None:
+            client = self._create_client(profile)
+            self._clients[profile] = client
+        return client
+
+    async def aclose(self):
+        """
+        关闭所有 client 及其连接
+        """
+        self._closed = True
+        clients = list(self._clients.values())
+        self._clients.clear()
+        for client in clients:
+            await client.aclose()
+
+    @staticmethod
+    def _create_client(profile: ClientProfile) -> httpx.AsyncClient:
+        transport = httpx.AsyncHTTPTransport(
+            verify=profile.verify,
+            trust_env=profile.trust_env,
+            limits=httpx.Limits(
+                max_connections=profile.max_connections,
+                max_keepalive_connections=profile.max_keepalive_connections,
+                keepalive_expiry=profile.keepalive_expiry,
+            ),
+        )
+        return httpx.AsyncClient(
+            verify=profile.verify,
+            trust_env=profile.trust_env,
+            follow_redirects=profile.follow_redirects,
+            timeout=httpx.Timeout(profile.timeout, connect=profile.connect_timeout),
+            # 重试 -> 对冲 -> 自适应超时 -> 熔断 -> 连接池
+            # 重试在熔断之外, 每次尝试都计入熔断统计, 熔断后不再重试
+            # 对冲只对 extensions 中带 hedge 策略的请求生效, 每次重试都可以对冲
+            # 超时按域名的耗时分布收紧, 且不超过解析的剩余时间预算;
+            # 预算用完时在熔断之前失败, 不计入上游的失败统计
+            # 按域名熔断, 上游故障时直接失败, 不再占用超时时间
+            # (环境变量配置的代理会使用 httpx 自动创建的 transport, 不经过以上处理)
+            transport=RetryTransport(
+                HedgeTransport(
+                    AdaptiveTimeoutTransport(
+                        CircuitBreakerTransport(transport, host_breakers),
+                        adaptive_timeouts,
+                        min_timeout=profile.min_timeout,
+                    ),
+                    hedge_latencies,
+                    hedge_budget,
+                    hedge_stats,
+                ),
+                profile.retry,
+                retry_budget,
+            ),
+            cookies=_ScopedCookieJar(),
+        )
+
+
+# 进程级默认连接池, 未通过 lifespan 设置时惰性创建
+_client_pool: Optional[ClientPool] = None
+
+
+def get_client_pool() -> ClientPool:
+    """
+    获取进程级连接池
+    :return: ClientPool
+    """
+    global _client_pool
+    if _client_pool is None:
+        _client_pool = ClientPool()
+    return _client_pool
+
+
+def set_client_pool(pool: Optional[ClientPool]):
+    """
+    设置进程级连接池, 一般在 FastAPI lifespan 中调用
+    :param pool: 连接池, None 表示清除
+    """
+    global _client_pool
+    _client_pool = pool
@@ -1,7 +1,6 @@
-import httpx
-
 from utils import get_val_from_url_by_query_key
 
+from . import jsoncodec
 from .base import BaseParser, VideoAuthor, VideoInfo
 
 
@@ -10,17 +9,19 @@ class DouPai(BaseParser):
     逗拍
     """
 
+    def get_video_id_from_share_url(self, share_url: str) -> str:
+        return get_val_from_url_by_query_key(share_url, "id")
+
     async def parse_share_url(self, share_url: str) -> VideoInfo:
-        video_id = get_val_from_url_by_query_key(share_url, "id")
+        video_id = self.get_video_id_from_share_url(share_url)
         return await self.parse_video_id(video_id)
 
     async def parse_video_id(self, video_id: str) -> VideoInfo:
         req_url = f"https://v2.doupai.cc/topic/{video_id}.json"
-        async with httpx.AsyncClient() as client:
-            response = await client.get(req_url, headers=self.get_default_headers())
-            response.raise_for_status()
+        response = await self.client.get(req_url, headers=self.get_default_headers())
+        response.raise_for_status()
 
-        json_data = response.json()
+        json_data = jsoncodec.loads(response.content)
         data = json_data["data"]
 
         video_info = VideoInfo(
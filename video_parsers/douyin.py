@@ -1,12 +1,17 @@
-import json
 import re
 import secrets
 import string
-from urllib.parse import parse_qs, urlparse
+from typing import Optional
+from urllib.parse import parse_qs, unquote, urlparse
 
 import httpx
 
+from . import jsoncodec
 from .base import BaseParser, ImgInfo, VideoAuthor, VideoInfo
+from .client_pool import INSECURE_PROFILE
+from .embedded import EmbeddedStates
+from .hedge import HedgePolicy
+from .strategy import race
 
 
 class DouYin(BaseParser):
@@ -14,112 +19,80 @@ class DouYin(BaseParser):
     抖音 / 抖音火山版
     """
 
+    client_profile = INSECURE_PROFILE
+
+    # 分享页中可能出现的状态变量, 按顺序尝试
+    # RENDER_DATA 包括 window.RENDER_DATA 及 <script id="RENDER_DATA">
+    STATE_NAMES = ["_ROUTER_DATA", "_SSR_HYDRATED_DATA", "RENDER_DATA"]
+
+    CANONICAL_PATTERN = re.compile(
+        rb'<link[^>]*rel=["\']canonical["\'][^>]*href=["\']([^' rb'"\']+)["\']',
+        re.IGNORECASE,
+    )
+
+    PC_HOSTS = frozenset(["www.iesdouyin.com", "www.douyin.com"])
+
+    # iesdouyin 分享页偶尔卡顿数秒, 超过 p95 耗时未返回时发出对冲请求
+    SHARE_PAGE_HEDGE = HedgePolicy(name="douyin.share_page")
+
+    # 链接显示是图集时, 同时请求图集API和分享页, 图集只需等待一次请求
+    SPECULATIVE_SLIDES = True
+
+    def get_video_id_from_share_url(self, share_url: str) -> str:
+        # 电脑网页端链接可直接解析ID, app分享短链接需要请求跳转
+        if urlparse(share_url).netloc in self.PC_HOSTS:
+            return self._parse_video_id_from_path(share_url)
+        return ""
+
     async def parse_share_url(self, share_url: str) -> VideoInfo:
         # 解析URL获取域名
         parsed_url = urlparse(share_url)
         host = parsed_url.netloc
 
-        if host in ["www.iesdouyin.com", "www.douyin.com"]:
+        if host in self.PC_HOSTS:
             # 支持电脑网页端链接
             video_id = self._parse_video_id_from_path(share_url)
             if not video_id:
                 raise ValueError("Failed to parse video ID from PC share URL")
+            note_hint = self._is_note_url(share_url)
             share_url = self._get_request_url_by_video_id(video_id)
         elif host == "v.douyin.com":
             # 支持app分享链接 https://v.douyin.com/xxxxxx
-            video_id = await self._parse_app_share_url(share_url)
+            location = await self._resolve_app_share_url(share_url)
+            video_id = self._parse_video_id_from_path(location)
             if not video_id:
                 raise ValueError("Failed to parse video ID from app share URL")
+            note_hint = self._is_note_url(location)
             share_url = self._get_request_url_by_video_id(video_id)
         else:
             raise ValueError(f"Douyin not support this host: {host}")
 
-        async with httpx.AsyncClient(follow_redirects=True, verify=False, trust_env=False) as client:
-            response = await client.get(share_url, headers=self.get_default_headers())
-            response.raise_for_status()
-
-        # 检查是否是图集内容
-        is_note = self._is_note_content(response.text, share_url)
-
         json_data = None
-        if is_note:
-            # 如果是图集，使用专门的API获取数据
-            json_data = await self._get_slides_info(video_id)
-
+        # 同时请求时已取到的分享页数据
+        page_json = None
+        if note_hint and self.SPECULATIVE_SLIDES:
+
+            async def fetch_page_json():
+                nonlocal page_json
+                page_json = await self._get_share_page_json(
+                    share_url, video_id, use_slides=False
+                )
+                return page_json
+
+            # 链接显示是图集时, 同时请求图集API和分享页, 使用先返回的带图片的数据
+            try:
+                json_data = await race(
+                    [lambda: self._get_slides_info(video_id), fetch_page_json],
+                    is_valid=self._has_images,
+                )
+            except Exception:
+                # 都没有图片数据时(预测错误或接口失败), 使用已取到的分享页数据
+                json_data = page_json
         if not json_data:
-            # 如果专用API失败或者不是图集，使用标准解析方式
-            # 尝试匹配多种可能的 JSON 变量名
-            patterns = [
-                re.compile(r"window\._ROUTER_DATA\s*=\s*(.*?)</script>", re.DOTALL),
-                re.compile(r"window\._SSR_HYDRATED_DATA\s*=\s*(.*?)</script>", re.DOTALL),
-                re.compile(r"window\.RENDER_DATA\s*=\s*(.*?)</script>", re.DOTALL),
-                re.compile(r'<script id="RENDER_DATA" type="application/json">(.*?)</script>', re.DOTALL),
-            ]
-            
-            find_res = None
-            for pattern in patterns:
-                find_res = pattern.search(response.text)
-                if find_res and find_res.group(1):
-                     # 如果是 url encoded 的 json (RENDER_DATA 经常是这样)，需要解码
-                    try:
-                        raw_json = find_res.group(1).strip()
-                        # 尝试直接解析
-                        json_data = json.loads(raw_json)
-                        break
-                    except json.JSONDecodeError:
-                        try:
-                            # 尝试先 unquote 再解析
-                            from urllib.parse import unquote
-                            json_data = json.loads(unquote(raw_json))
-                            break
-                        except:
-                            continue
-
-            if not json_data:
-                # 记录一下失败时的 HTML 片段，方便调试（仅打印前500字符）
-                # print(f"Parse failed. HTML start: {response.text[:500]}")
-                raise ValueError("parse video json info from html fail")
+            # 分享页请求失败或没有同时请求时, 按普通流程解析
+            json_data = await self._get_share_page_json(share_url, video_id)
 
-        # 处理不同的数据结构
-        data = None
-        # ... (后续代码处理逻辑需要兼容不同的 json 结构)
-        
-        # 针对 RENDER_DATA / _SSR_HYDRATED_DATA 结构的适配
-        if isinstance(json_data, dict):
-            # 1. 尝试匹配 aweme_details (API 返回)
-            if "aweme_details" in json_data:
-                if len(json_data["aweme_details"]) > 0:
-                    data = json_data["aweme_details"][0]
-            
-            # 2. 尝试匹配 loaderData (旧版 Router Data)
-            elif "loaderData" in json_data:
-                 # ... (原有的 loaderData 处理逻辑)
-                 VIDEO_ID_PAGE_KEY = "video_(id)/page"
-                 NOTE_ID_PAGE_KEY = "note_(id)/page"
-
-                 original_video_info = None
-                 if VIDEO_ID_PAGE_KEY in json_data["loaderData"]:
-                     original_video_info = json_data["loaderData"][VIDEO_ID_PAGE_KEY]["videoInfoRes"]
-                 elif NOTE_ID_PAGE_KEY in json_data["loaderData"]:
-                     original_video_info = json_data["loaderData"][NOTE_ID_PAGE_KEY]["videoInfoRes"]
-                 
-                 if original_video_info and "item_list" in original_video_info and len(original_video_info["item_list"]) > 0:
-                     data = original_video_info["item_list"][0]
-
-            # 3. 尝试匹配 app.videoDetail (新版 RENDER_DATA 常见结构)
-            elif "app" in json_data and "videoDetail" in json_data["app"]:
-                 data = json_data["app"]["videoDetail"]
-            
-            # 4. 尝试直接在根节点找 aweme_detail (部分 SSR 数据)
-            elif "aweme_detail" in json_data:
-                data = json_data["aweme_detail"]
-
-        if not data:
-             # 如果上述都没匹配到，尝试在 loaderData 里做最后的挣扎（防止 key 变了）
-             if isinstance(json_data, dict) and "loaderData" in json_data:
-                  pass # 已经在上面 loaderData 分支处理过了，这里只是占位
-             
-             raise Exception("Unknown data structure or failed to extract data")
+        data = self._get_aweme_data(json_data)
 
         # 获取图集图片地址
         images = []
@@ -201,9 +174,55 @@ class DouYin(BaseParser):
         )
         return video_info
 
+    def _get_aweme_data(self, json_data: dict) -> dict:
+        """从图集API或分享页的 JSON 数据中取出作品数据"""
+        # 处理不同的数据结构
+        data = None
+        # ... (后续代码处理逻辑需要兼容不同的 json 结构)
+        
+        # 针对 RENDER_DATA / _SSR_HYDRATED_DATA 结构的适配
+        if isinstance(json_data, dict):
+            # 1. 尝试匹配 aweme_details (API 返回)
+            if "aweme_details" in json_data:
+                if len(json_data["aweme_details"]) > 0:
+                    data = json_data["aweme_details"][0]
+            
+            # 2. 尝试匹配 loaderData (旧版 Router Data)
+            elif "loaderData" in json_data:
+                 # ... (原有的 loaderData 处理逻辑)
+                 VIDEO_ID_PAGE_KEY = "video_(id)/page"
+                 NOTE_ID_PAGE_KEY = "note_(id)/page"
+
+                 original_video_info = None
+                 if VIDEO_ID_PAGE_KEY in json_data["loaderData"]:
+                     original_video_info = json_data["loaderData"][VIDEO_ID_PAGE_KEY]["videoInfoRes"]
+                 elif NOTE_ID_PAGE_KEY in json_data["loaderData"]:
+                     original_video_info = json_data["loaderData"][NOTE_ID_PAGE_KEY]["videoInfoRes"]
+                 
+                 if original_video_info and "item_list" in original_video_info and len(original_video_info["item_list"]) > 0:
+                     data = original_video_info["item_list"][0]
+
+            # 3. 尝试匹配 app.videoDetail (新版 RENDER_DATA 常见结构)
+            elif "app" in json_data and "videoDetail" in json_data["app"]:
+                 data = json_data["app"]["videoDetail"]
+            
+            # 4. 尝试直接在根节点找 aweme_detail (部分 SSR 数据)
+            elif "aweme_detail" in json_data:
+                data = json_data["aweme_detail"]
+
+        if not data:
+             # 如果上述都没匹配到，尝试在 loaderData 里做最后的挣扎（防止 key 变了）
+             if isinstance(json_data, dict) and "loaderData" in json_data:
+                  pass # 已经在上面 loaderData 分支处理过了，这里只是占位
+             
+             raise Exception("Unknown data structure or failed to extract data")
+
+        return data
+
     async def get_video_redirect_url(self, video_url: str) -> str:
-        async with httpx.AsyncClient(follow_redirects=False, verify=False, trust_env=False) as client:
-            response = await client.get(video_url, headers=self.get_default_headers())
+        response = await self.client.get(
+            video_url, headers=self.get_default_headers(), follow_redirects=False
+        )
         # 返回重定向后的地址，如果没有重定向则返回原地址(抖音中的西瓜视频,重定向地址为空)
         return response.headers.get("location") or video_url
 
@@ -214,12 +233,67 @@ class DouYin(BaseParser):
     def _get_request_url_by_video_id(self, video_id) -> str:
         return f"https://www.iesdouyin.com/share/video/{video_id}/"
 
-    async def _parse_app_share_url(self, share_url: str) -> str:
-        """解析app分享链接 https://v.douyin.com/xxxxxx"""
-        async with httpx.AsyncClient(follow_redirects=False, verify=False, trust_env=False) as client:
-            response = await client.get(share_url, headers=self.get_default_headers())
+    async def _get_share_page_json(
+        self, share_url: str, video_id: str, use_slides: bool = True
+    ) -> dict:
+        """
+        请求分享页并提取其中的 JSON 数据
+        :param share_url: 分享页地址
+        :param video_id: 视频ID
+        :param use_slides: 是图集时是否改用图集API获取数据
+        :return:
+        """
+        states = await self.fetch_page_states(
+            share_url,
+            self.STATE_NAMES,
+            headers=self.get_default_headers(),
+            follow_redirects=True,
+            extensions={"hedge": self.SHARE_PAGE_HEDGE},
+        )
 
-        location = response.headers.get("location")
+        # 检查是否是图集内容
+        is_note = self._is_note_content(states.content, share_url)
+
+        if is_note and use_slides:
+            # 如果是图集，使用专门的API获取数据
+            json_data = await self._get_slides_info(video_id)
+            if json_data:
+                return json_data
+
+        # 如果专用API失败或者不是图集，使用标准解析方式
+        return self._extract_json_data(states)
+
+    def _extract_json_data(self, states: EmbeddedStates) -> dict:
+        """从分享页中提取 JSON 数据, 尝试匹配多种可能的 JSON 变量名"""
+        for name in self.STATE_NAMES:
+            raw_json = states.get(name)
+            if raw_json:
+                # 如果是 url encoded 的 json (RENDER_DATA 经常是这样)，需要解码
+                try:
+                    # 尝试直接解析
+                    return states.loads(name)
+                except jsoncodec.JSONDecodeError:
+                    try:
+                        # 尝试先 unquote 再解析
+                        return jsoncodec.loads(unquote(raw_json))
+                    except jsoncodec.JSONDecodeError:
+                        continue
+
+        raise ValueError("parse video json info from html fail")
+
+    def _has_images(self, json_data: Optional[dict]) -> bool:
+        """图集API或分享页的数据中是否包含图集图片"""
+        try:
+            data = self._get_aweme_data(json_data)
+        except Exception:
+            return False
+        return bool(data.get("images"))
+
+    async def _resolve_app_share_url(self, share_url: str) -> str:
+        """解析app分享链接 https://v.douyin.com/xxxxxx 的跳转地址"""
+        location = await self.resolve_short_url(
+            share_url, headers=self.get_default_headers()
+        )
         if not location:
             return ""
 
@@ -229,7 +303,11 @@ class DouYin(BaseParser):
             # 在实际应用中可能需要调用西瓜视频解析器
             return ""
 
-        return self._parse_video_id_from_path(location)
+        return location
+
+    def _is_note_url(self, url: str) -> bool:
+        """根据链接路径预测是否是图集, 如 https://www.douyin.com/note/xxxxxx"""
+        return "/note/" in urlparse(url).path
 
     def _parse_video_id_from_path(self, url_path: str) -> str:
         """从URL路径中解析视频ID"""
@@ -271,18 +349,14 @@ class DouYin(BaseParser):
         # 如果没找到，使用第一项
         return url_list[0] if url_list and url_list[0] else ""
 
-    def _is_note_content(self, html_content: str, share_url: str) -> bool:
+    def _is_note_content(self, html_content: bytes, share_url: str) -> bool:
         """检查是否是图集内容"""
         try:
             # 方法1: 检查canonical URL是否包含/note/
-            pattern = re.compile(
-                r'<link[^>]*rel=["\']canonical["\'][^>]*href=["\']([^' r'"\']+)["\']',
-                re.IGNORECASE,
-            )
-            match = pattern.search(html_content)
+            match = self.CANONICAL_PATTERN.search(html_content)
             if match:
                 canonical_url = match.group(1)
-                if "/note/" in canonical_url:
+                if b"/note/" in canonical_url:
                     return True
 
             # 方法2: 检查URL路径是否包含note相关路径
@@ -291,7 +365,8 @@ class DouYin(BaseParser):
                 return True
 
             # 方法3: 检查HTML中是否有图集相关的标识
-            if "note_" in html_content or "图文" in html_content:
+            note_mark = "图文".encode(self.page_encoding)
+            if b"note_" in html_content or note_mark in html_content:
                 return True
 
         except Exception:
@@ -299,7 +374,7 @@ class DouYin(BaseParser):
 
         return False
 
-    async def _get_slides_info(self, video_id: str) -> dict:
+    async def _get_slides_info(self, video_id: str) -> Optional[dict]:
         """获取图集的详细信息，包括Live Photo"""
         try:
             # 生成web_id和a_bogus参数
@@ -316,14 +391,18 @@ class DouYin(BaseParser):
                 f"&a_bogus={a_bogus}"
             )
 
-            async with httpx.AsyncClient(verify=False, trust_env=False) as client:
-                response = await client.get(api_url, headers=self.get_default_headers())
-                response.raise_for_status()
+            response = await self.client.get(
+                api_url, headers=self.get_default_headers()
+            )
+            response.raise_for_status()
 
-            data = response.json()
-            return data if data.get("aweme_details") else None
+            data = jsoncodec.loads(response.content)
+            if isinstance(data, dict) and data.get("aweme_details"):
+                return data
+            return None
 
-        except Exception:
+        except (httpx.HTTPError, ValueError):
+            # 瞬时错误已由连接池按重试策略重试, 仍失败时回退到解析网页
             return None
 
     def _generate_fixed_length_numeric_id(self, length: int) -> str:
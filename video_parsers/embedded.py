@@ -0,0 +1,255 @@
+"""
+页面内嵌状态数据提取
+各平台的分享页把数据放在 <script> 中 (如 window._ROUTER_DATA = {...}),
+这里只扫描一遍页面: 定位每个 <script> 的边界, 在脚本内同时匹配需要的所有状态变量,
+记录每个变量值的起止位置, 用到时才切片 / 解析
+扫描直接在原始字节上进行, 不解码整个页面, 只解码用到的变量值;
+标签和变量名都是 ASCII, 要求页面编码兼容 ASCII (各平台目前都是 UTF-8)
+"""
+
+import functools
+import json
+import re
+from typing import Any, Dict, Iterable, List, Optional, Tuple, Union
+
+from . import jsoncodec
+
+# 已知的状态变量: 名称 -> (赋值语句的前缀, 变量名)
+STATE_VARIABLES: Dict[str, Tuple[str, str]] = {
+    "_ROUTER_DATA": ("window.", "_ROUTER_DATA"),
+    "_SSR_HYDRATED_DATA": ("window.", "_SSR_HYDRATED_DATA"),
+    "RENDER_DATA": ("window.", "RENDER_DATA"),
+    "INIT_STATE": ("window.", "INIT_STATE"),
+    "__INITIAL_STATE__": ("window.", "__INITIAL_STATE__"),
+    "__DATA__": ("window.", "__DATA__"),
+    "$render_data": ("", "$render_data"),
+    "videoInfo": ("var ", "videoInfo"),
+    "playInfo": ("var ", "playInfo"),
+}
+
+# 整个脚本内容就是数据的 <script id="..."> (通常 type="application/json")
+STATE_SCRIPT_IDS = frozenset(["RENDER_DATA", "__NEXT_DATA__"])
+
+# 各平台页面的默认编码
+DEFAULT_ENCODING = "utf-8"
+
+_SCRIPT_OPEN_PATTERN = re.compile(rb"<script\b([^>]*)>", re.IGNORECASE)
+_SCRIPT_ID_PATTERN = re.compile(rb"""\bid\s*=\s*["']([^"']+)["']""")
+_SCRIPT_CLOSE = b"</script>"
+
+# 赋值语句 (去掉等号) -> 状态变量名
+_ASSIGNMENT_NAMES = {
+    (prefix + var).encode(): name for name, (prefix, var) in STATE_VARIABLES.items()
+}
+
+_json_decoder = json.JSONDecoder()
+
+
+@functools.lru_cache(maxsize=64)
+def _compile_state_pattern(names: Tuple[str, ...]) -> Optional["re.Pattern[bytes]"]:
+    """
+    把多个状态变量合并成一个正则, 相同前缀的变量合并为一个分支:
+    只有一种前缀时 (如都是 window.xxx) 正则以固定字符串开头, 可以快速跳过无关内容
+    没有需要的变量时 (如只需要 <script id="...">) 返回 None
+    """
+    if not names:
+        return None
+    branches: Dict[str, List[str]] = {}
+    for name in names:
+        prefix, var = STATE_VARIABLES[name]
+        branches.setdefault(prefix, []).append(re.escape(var))
+    pattern = (
+        "(?:"
+        + "|".join(
+            re.escape(prefix) + "(?:" + "|".join(variables) + ")"
+            for prefix, variables in branches.items()
+        )
+        + r")\s*=(?!=)\s*"
+    )
+    return re.compile(pattern.encode())
+
+
+class EmbeddedStates:
+    """
+    页面中的状态变量, 只保存每个变量值在页面中的位置
+    同名变量出现多次时使用第一个
+    支持增量扫描: 边下载边 feed, 需要的变量都已出现后即可停止下载页面剩余部分
+    """
+
+    def __init__(
+        self, names: Optional[Iterable[str]] = None, encoding: str = DEFAULT_ENCODING
+    ):
+        """
+        :param names: 需要的状态变量名, 默认为所有已知的状态变量
+        :param encoding: 页面编码, 须兼容 ASCII
+        """
+        names = tuple(STATE_VARIABLES if names is None else names)
+        self._names = frozenset(names)
+        self._encoding = encoding
+        self._content = bytearray()
+        self._spans: Dict[str, Tuple[int, int]] = {}
+        self._script_ids = STATE_SCRIPT_IDS.intersection(names)
+        self._pattern = _compile_state_pattern(
+            tuple(name for name in names if name in STATE_VARIABLES)
+        )
+        # 下一个 <script> 的查找位置
+        self._pos = 0
+        # 未结束的 <script> 标签, 以及其 </script> 的查找位置
+        self._open_script: Optional["re.Match[bytes]"] = None
+        self._close_pos = 0
+
+    def __contains__(self, name: str) -> bool:
+        return name in self._spans
+
+    @property
+    def content(self) -> bytes:
+        """
+        已扫描的页面原始内容, 提前结束下载时只是页面的前一部分
+        """
+        return bytes(self._content)
+
+    def names(self):
+        """
+        页面中出现的状态变量名
+        """
+        return list(self._spans)
+
+    def is_complete(self, require_all: bool = False) -> bool:
+        """
+        需要的状态变量是否都已出现 (所在脚本已结束)
+        :param require_all: 为 False 时出现任意一个即可, 用于多个变量名互为备选的页面
+        :return:
+        """
+        if require_all:
+            return len(self._spans) == len(self._names)
+        return bool(self._spans)
+
+    def get_bytes(self, name: str) -> Optional[bytes]:
+        """
+        状态变量的原始字节, 从赋值号之后到所在脚本结束 (或同一脚本中的下一个状态变量)
+        :param name: 状态变量名
+        :return: 页面中没有该变量时返回 None
+        """
+        span = self._spans.get(name)
+        if span is None:
+            return None
+        return bytes(self._content[span[0] : span[1]]).strip()
+
+    def get(self, name: str) -> Optional[str]:
+        """
+        状态变量的原始文本, 只解码该变量的值
+        :param name: 状态变量名
+        :return: 页面中没有该变量时返回 None
+        """
+        raw = self.get_bytes(name)
+        if raw is None:
+            return None
+        return raw.decode(self._encoding, errors="replace")
+
+    def loads(self, name: str) -> Any:
+        """
+        解析状态变量的 JSON 值, 忽略值之后的内容 (如 ";" 或 "[0] || {}")
+        :param name: 状态变量名
+        :return:
+        """
+        raw = self.get_bytes(name)
+        if not raw:
+            raise ValueError(f"embedded state [{name}] not found")
+
+        # UTF-8 字节直接交给 JSON 解析, 不需要先解码成 str
+        doc: Union[str, bytes] = raw.rstrip(b";").rstrip()
+        if self._encoding != DEFAULT_ENCODING:
+            doc = doc.decode(self._encoding)
+        try:
+            return jsoncodec.loads(doc)
+        except jsoncodec.JSONDecodeError as e:
+            if e.msg != "Extra data":
+                raise
+            # 值之后还有其他表达式, 只解析到值结束
+            return _json_decoder.raw_decode(e.doc)[0]
+
+    def feed(self, data: bytes):
+        """
+        追加一段页面内容并扫描其中已结束的 <script>
+        :param data: 页面原始内容片段
+        """
+        self._content += data
+        self._scan(final=False)
+
+    def close(self):
+        """
+        页面内容结束, 未结束的脚本按到页面末尾处理
+        """
+        self._scan(final=True)
+
+    def _scan(self, final: bool):
+        html = self._content
+        while True:
+            script = self._open_script
+            if script is None:
+                script = _SCRIPT_OPEN_PATTERN.search(html, self._pos)
+                if script is None:
+                    # 末尾可能是不完整的 <script 标签, 下次从最后一个 "<" 开始查找
+                    tag_start = html.rfind(b"<", self._pos)
+                    self._pos = tag_start if tag_start >= 0 else len(html)
+                    return
+                self._close_pos = script.end()
+
+            start = script.end()
+            end = html.find(_SCRIPT_CLOSE, self._close_pos)
+            if end < 0:
+                if not final:
+                    # 等待脚本结束, 已查找过的内容不再重复查找
+                    self._open_script = script
+                    self._close_pos = max(start, len(html) - len(_SCRIPT_CLOSE) + 1)
+                    return
+                end = len(html)
+            self._open_script = None
+            # 下一个 <script> 从本脚本结束之后查找, 脚本内容只扫描一次
+            self._pos = end
+            self._scan_script(script, start, end)
+            if end == len(html):
+                return
+
+    def _scan_script(self, script: "re.Match[bytes]", start: int, end: int):
+        html = self._content
+        id_match = _SCRIPT_ID_PATTERN.search(script.group(1))
+        if id_match:
+            script_id = id_match.group(1).decode("ascii", errors="replace")
+            if script_id in self._script_ids:
+                self._spans.setdefault(script_id, (start, end))
+                return
+
+        if self._pattern is None:
+            return
+
+        # 同一个脚本中可能有多个状态变量, 每个变量的值到下一个变量为止
+        name, value_start = None, start
+        for match in self._pattern.finditer(html, start, end):
+            if name is not None:
+                self._spans.setdefault(name, (value_start, match.start()))
+            name = _ASSIGNMENT_NAMES[match.group(0).rstrip().rstrip(b"=").rstrip()]
+            value_start = match.end()
+        if name is not None:
+            self._spans.setdefault(name, (value_start, end))
+
+
+def extract_states(
+    html: Union[str, bytes],
+    names: Optional[Iterable[str]] = None,
+    encoding: str = DEFAULT_ENCODING,
+) -> EmbeddedStates:
+    """
+    扫描页面中的状态变量
+    :param html: 页面原始内容 (response.content), 传入 str 时先按 encoding 编码
+    :param names: 需要的状态变量名, 默认为所有已知的状态变量;
+        只传入解析器用到的变量名, 扫描更快
+    :param encoding: 页面编码, 须兼容 ASCII
+    :return:
+    """
+    if isinstance(html, str):
+        html = html.encode(encoding)
+    states = EmbeddedStates(names, encoding)
+    states.feed(html)
+    states.close()
+    return states
@@ -1,7 +1,6 @@
-import httpx
-
 from utils import get_val_from_url_by_query_key
 
+from . import jsoncodec
 from .base import BaseParser, VideoAuthor, VideoInfo
 
 
@@ -10,17 +9,19 @@ class HaoKan(BaseParser):
     好看视频
     """
 
+    def get_video_id_from_share_url(self, share_url: str) -> str:
+        return get_val_from_url_by_query_key(share_url, "vid")
+
     async def parse_share_url(self, share_url: str) -> VideoInfo:
-        video_id = get_val_from_url_by_query_key(share_url, "vid")
+        video_id = self.get_video_id_from_share_url(share_url)
         return await self.parse_video_id(video_id)
 
     async def parse_video_id(self, video_id: str) -> VideoInfo:
         req_url = f"https://haokan.baidu.com/v?_format=json&vid={video_id}"
-        async with httpx.AsyncClient() as client:
-            response = await client.get(req_url, headers=self.get_default_headers())
-            response.raise_for_status()
+        response = await self.client.get(req_url, headers=self.get_default_headers())
+        response.raise_for_status()
 
-        json_data = response.json()
+        json_data = jsoncodec.loads(response.content)
         # 接口返回错误
         if json_data["errno"] != 0:
             raise Exception(json_data["error"])
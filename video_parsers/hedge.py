@@ -0,0 +1,160 @@
+import asyncio
+import dataclasses
+import time
+from typing import Optional
+
+import httpx
+
+from .latency import LatencyRegistry
+from .retry import RetryBudget
+
+
+@dataclasses.dataclass(frozen=True)
+class HedgePolicy:
+    """
+    对冲请求策略, 通过请求的 extensions={"hedge": policy} 开启
+    首次请求超过该接口 quantile 分位耗时仍未返回时, 再发出一个相同的请求, 先返回的胜出
+    """
+
+    # 接口名称, 按名称统计耗时分布
+    name: str
+
+    # 触发对冲的耗时分位数
+    quantile: float = 0.95
+
+    # 样本数少于该值时不对冲
+    min_samples: int = 20
+
+    # 对冲等待时间的上下限(秒)
+    min_delay: float = 0.05
+    max_delay: float = 3.0
+
+
+@dataclasses.dataclass
+class HedgeStats:
+    """
+    对冲请求统计
+    """
+
+    # 开启了对冲的请求数
+    requests: int = 0
+
+    # 发出的对冲请求数
+    hedged: int = 0
+
+    # 对冲请求先返回的次数
+    wins: int = 0
+
+    # 预算不足未对冲的次数
+    exhausted: int = 0
+
+
+class HedgeTransport(httpx.AsyncBaseTransport):
+    """
+    对冲请求 transport, 只对开启了对冲的 GET / HEAD 请求生效
+    对冲请求数通过令牌桶限制在开启对冲的请求数的一定比例内, 落败的请求会被取消
+    """
+
+    def __init__(
+        self,
+        transport: httpx.AsyncBaseTransport,
+        latencies: LatencyRegistry,
+        budget: RetryBudget,
+        stats: HedgeStats,
+    ):
+        """
+        :param transport: 底层 transport
+        :param latencies: 按接口名称的耗时直方图
+        :param budget: 对冲预算 (令牌桶)
+        :param stats: 对冲统计
+        """
+        self._transport = transport
+        self._latencies = latencies
+        self._budget = budget
+        self._stats = stats
+
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        policy: Optional[HedgePolicy] = request.extensions.get("hedge")
+        if policy is None or request.method not in ("GET", "HEAD"):
+            return await self._transport.handle_async_request(request)
+
+        self._stats.requests += 1
+        self._budget.record_request()
+        histogram = self._latencies.get(policy.name)
+        delay = None
+        if histogram.count >= policy.min_samples:
+            delay = histogram.quantile(policy.quantile)
+
+        began = time.monotonic()
+        primary = asyncio.ensure_future(self._transport.handle_async_request(request))
+        if delay is None:
+            response = await primary
+            histogram.record(time.monotonic() - began)
+            return response
+
+        delay = min(max(delay, policy.min_delay), policy.max_delay)
+        try:
+            done, _ = await asyncio.wait({primary}, timeout=delay)
+            if done or not self._budget.try_spend():
+                if not done:
+                    self._stats.exhausted += 1
+                response = await primary
+                histogram.record(time.monotonic() - began)
+                return response
+
+            self._stats.hedged += 1
+            hedge = asyncio.ensure_future(self._transport.handle_async_request(request))
+            response = await self._first_response(primary, hedge)
+        except BaseException:
+            primary.cancel()
+            raise
+        histogram.record(time.monotonic() - began)
+        return response
+
+    async def _first_response(
+        self, primary: asyncio.Future, hedge: asyncio.Future
+    ) -> httpx.Response:
+        pending = {primary, hedge}
+        winner = None
+        try:
+            while pending and winner is None:
+                done, pending = await asyncio.wait(
+                    pending, return_when=asyncio.FIRST_COMPLETED
+                )
+                # 同时返回时优先使用首次请求, 另一个响应直接关闭
+                for task in (primary, hedge):
+                    if task not in done or task.exception() is not None:
+                        continue
+                    if winner is None:
+                        winner = task
+                    else:
+                        _close_response(task)
+            if winner is None:
+                # 两个请求都失败时抛出首次请求的异常
+                return primary.result()
+            if winner is hedge:
+                self._stats.wins += 1
+            return winner.result()
+        finally:
+            for task in pending:
+                task.cancel()
+                task.add_done_callback(_close_response)
+
+
+def _close_response(task: asyncio.Future):
+    """
+    落败的请求在取消前已经返回响应时, 关闭响应释放连接
+    """
+    if task.cancelled() or task.exception() is not None:
+        return
+    asyncio.ensure_future(task.result().aclose())
+
+
+# 开启对冲的接口的耗时分布
+hedge_latencies = LatencyRegistry()
+
+# 对冲请求统计
+hedge_stats = HedgeStats()
+
+# 对冲预算: 对冲请求数不超过开启对冲的请求数的 5%
+hedge_budget = RetryBudget(ratio=0.05, min_per_second=0.5, max_tokens=20)
@@ -1,8 +1,6 @@
 import re
 
-import fake_useragent
-import httpx
-
+from . import jsoncodec
 from .base import BaseParser, VideoAuthor, VideoInfo
 
 
@@ -11,27 +9,30 @@ class HuYa(BaseParser):
     虎牙
     """
 
-    async def parse_share_url(self, share_url: str) -> VideoInfo:
-        re_pattern = r"\/(\d+).html"
-        re_result = re.search(re_pattern, share_url)
+    VIDEO_ID_PATTERN = re.compile(r"\/(\d+).html")
+
+    def get_video_id_from_share_url(self, share_url: str) -> str:
+        re_result = self.VIDEO_ID_PATTERN.search(share_url)
 
         if not re_result:
             raise Exception("parse video_id from share url fail")
 
-        video_id = re_result.group(1)
+        return re_result.group(1)
+
+    async def parse_share_url(self, share_url: str) -> VideoInfo:
+        video_id = self.get_video_id_from_share_url(share_url)
         return await self.parse_video_id(video_id)
 
     async def parse_video_id(self, video_id: str) -> VideoInfo:
         req_url = f"https://liveapi.huya.com/moment/getMomentContent?videoId={video_id}"
-        async with httpx.AsyncClient() as client:
-            headers = {
-                "User-Agent": fake_useragent.UserAgent(os=["windows"]).random,
-                "Referer": "https://v.huya.com/",
-            }
-            response = await client.get(req_url, headers=headers)
-            response.raise_for_status()
-
-        json_data = response.json()
+        headers = {
+            "User-Agent": self.get_user_agent("windows"),
+            "Referer": "https://v.huya.com/",
+        }
+        response = await self.client.get(req_url, headers=headers)
+        response.raise_for_status()
+
+        json_data = jsoncodec.loads(response.content)
         data = json_data["data"]["moment"]["videoInfo"]
         if data["uid"] == 0:
             raise Exception("video not found")
@@ -0,0 +1,124 @@
+"""
+JS 对象字面量解析
+页面中内嵌的状态数据 (如小红书的 window.__INITIAL_STATE__) 是 JS 字面量而不是 JSON,
+可能包含 undefined、未加引号的键、单引号字符串及 JSON 不支持的转义
+这里只把这些片段改写成 JSON, 其余部分原样保留, 再交给 jsoncodec 解析,
+整体耗时与输入长度成线性关系
+"""
+
+import json
+import re
+from typing import Any
+
+from . import jsoncodec
+
+# plain: 可原样保留的连续片段 (标点 / 空白 / 合法的 JSON 字符串 / 数字 / 字面量)
+# string: 需要改写的字符串 (单引号或含 JSON 不支持的转义)
+# radix: 十六进制 / 八进制 / 二进制整数, 改写为十进制
+# ident: 标识符, undefined 或未加引号的键 (含名为 true / false / null 的键)
+_TOKEN_PATTERN = re.compile(
+    r"""
+    (?P<plain>(?:
+        [^"'A-Za-z_$0-9]+
+        | "[^"\\\x00-\x1f]*(?:\\(?:["\\/bfnrt]|u[0-9a-fA-F]{4})[^"\\\x00-\x1f]*)*"
+        | (?:true|false|null)(?![\w$]|\s*:)
+        | [0-9]+(?:\.[0-9]*)?(?:[eE][+-]?[0-9]+)?(?![\w$])
+    )+)
+    | (?P<string>"[^"\\]*(?:\\.[^"\\]*)*"|'[^'\\]*(?:\\.[^'\\]*)*')
+    | (?P<radix>0(?:[xX][0-9a-fA-F]+|[oO][0-7]+|[bB][01]+))(?![\w$])
+    | (?P<ident>[A-Za-z_$][\w$]*)(?P<colon>\s*:)?
+    """,
+    re.VERBOSE | re.DOTALL,
+)
+
+_ESCAPE_PATTERN = re.compile(
+    r"""\\(?:x([0-9a-fA-F]{2})|u\{([0-9a-fA-F]+)\}|(u[0-9a-fA-F]{4})|(\r\n|.))|(")""",
+    re.DOTALL,
+)
+
+# 转义后与 JSON 相同的字符
+_JSON_ESCAPES = frozenset('"\\/bfnrt')
+
+# JS 特有的单字符转义
+_JS_ESCAPES = {"v": "\\u000b", "0": "\\u0000", "'": "'"}
+
+# 行尾的反斜杠表示字符串续行
+_LINE_CONTINUATIONS = frozenset(["\n", "\r", "\r\n", "\u2028", "\u2029"])
+
+
+def _code_point_escape(code_point: int) -> str:
+    if code_point > 0xFFFF:
+        code_point -= 0x10000
+        return "\\u%04x\\u%04x" % (
+            0xD800 + (code_point >> 10),
+            0xDC00 + (code_point & 0x3FF),
+        )
+    return "\\u%04x" % code_point
+
+
+def _replace_escape(match: re.Match) -> str:
+    hex_code, code_point, unicode_escape, char, quote = match.groups()
+    if quote:
+        # 单引号字符串中未转义的双引号
+        return '\\"'
+    if hex_code:
+        return "\\u00" + hex_code
+    if code_point:
+        return _code_point_escape(int(code_point, 16))
+    if unicode_escape:
+        return "\\" + unicode_escape
+    if char in _JSON_ESCAPES:
+        return "\\" + char
+    if char in _LINE_CONTINUATIONS:
+        return ""
+    return _JS_ESCAPES.get(char, char)
+
+
+def _convert_string(literal: str) -> str:
+    return '"' + _ESCAPE_PATTERN.sub(_replace_escape, literal[1:-1]) + '"'
+
+
+def _replace_token(match: re.Match) -> str:
+    if match.group("plain") is not None:
+        return match.group(0)
+    if match.group("string") is not None:
+        return _convert_string(match.group(0))
+    if match.group("radix") is not None:
+        return str(int(match.group("radix"), 0))
+
+    ident = match.group("ident")
+    colon = match.group("colon")
+    if colon:
+        return f'"{ident}"{colon}'
+    if ident == "undefined":
+        return "null"
+    return ident
+
+
+def to_json(text: str) -> str:
+    """
+    把 JS 对象字面量改写成 JSON 文本
+    :param text: JS 对象字面量
+    :return:
+    """
+    return _TOKEN_PATTERN.sub(_replace_token, text)
+
+
+def loads(text: str) -> Any:
+    """
+    解析 JS 对象字面量, 返回与 json.loads 相同的结构, undefined 解析为 None
+    :param text: JS 对象字面量, 末尾的分号会被忽略
+    :return:
+    """
+    text = text.strip().rstrip(";")
+    try:
+        # 不含 JS 特有语法时直接解析
+        return jsoncodec.loads(text)
+    except ValueError:
+        pass
+    json_text = to_json(text)
+    try:
+        return jsoncodec.loads(json_text)
+    except ValueError:
+        # 字符串中含未转义的控制字符, 只有标准库的非严格模式能解析
+        return json.loads(json_text, strict=False)
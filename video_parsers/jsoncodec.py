@@ -0,0 +1,71 @@
+"""
+JSON 编解码
+安装了 orjson 时使用 orjson, 否则使用标准库 json; 解析器及接口响应统一使用这里的函数
+orjson 不支持的输入 (NaN、超出 64 位的整数、孤立的代理项等) 交给标准库处理,
+两种实现的解析结果及抛出的异常 (json.JSONDecodeError) 一致
+"""
+
+import dataclasses
+import json
+from enum import Enum
+from typing import Any, Callable, Optional, Union
+
+try:
+    import orjson
+except ImportError:
+    # 未安装 orjson 时使用标准库
+    orjson = None
+
+# 解析失败时抛出的异常, orjson.JSONDecodeError 也是它的子类
+JSONDecodeError = json.JSONDecodeError
+
+# 当前使用的实现, 用于管理接口及基准测试展示
+BACKEND = "orjson" if orjson is not None else "json"
+
+
+def loads(data: Union[str, bytes, bytearray, memoryview]) -> Any:
+    """
+    解析 JSON
+    :param data: JSON 文本, bytes 须为 UTF-8 编码, 可直接传入 response.content
+    :return:
+    """
+    if orjson is not None:
+        try:
+            return orjson.loads(data)
+        except orjson.JSONDecodeError:
+            pass
+    if isinstance(data, memoryview):
+        data = data.tobytes()
+    return json.loads(data)
+
+
+def _default(obj: Any) -> Any:
+    # 与 orjson 一致: dataclass 转为 dict 后继续序列化 (嵌套的同样处理), 枚举使用其值
+    if dataclasses.is_dataclass(obj) and not isinstance(obj, type):
+        return obj.__dict__
+    if isinstance(obj, Enum):
+        return obj.value
+    raise TypeError(f"Object of type {type(obj).__name__} is not JSON serializable")
+
+
+def dumps(obj: Any, default: Optional[Callable[[Any], Any]] = None) -> bytes:
+    """
+    序列化为紧凑的 UTF-8 JSON, 非 ASCII 字符不转义, 支持 dataclass
+    :param obj: 要序列化的对象
+    :param default: 不支持的类型的转换函数
+    :return:
+    """
+    if orjson is not None:
+        return orjson.dumps(obj, default=default)
+
+    def fallback(value: Any) -> Any:
+        if default is not None:
+            try:
+                return default(value)
+            except TypeError:
+                pass
+        return _default(value)
+
+    return json.dumps(
+        obj, ensure_ascii=False, separators=(",", ":"), default=fallback
+    ).encode("utf-8")
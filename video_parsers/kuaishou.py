@@ -1,9 +1,3 @@
-import json
-import re
-
-import fake_useragent
-import httpx
-
 from .base import BaseParser, ImgInfo, VideoAuthor, VideoInfo
 
 
@@ -13,17 +7,17 @@ class KuaiShou(BaseParser):
     """
 
     async def parse_share_url(self, share_url: str) -> VideoInfo:
-        user_agent = fake_useragent.UserAgent(os=["ios"]).random
+        user_agent = self.get_user_agent("ios")
 
         # 获取跳转前的信息, 从中获取跳转url, cookie
-        async with httpx.AsyncClient(follow_redirects=False) as client:
-            share_response = await client.get(
-                share_url,
-                headers={
-                    "User-Agent": user_agent,
-                    "Referer": "https://v.kuaishou.com/",
-                },
-            )
+        share_response = await self.client.get(
+            share_url,
+            headers={
+                "User-Agent": user_agent,
+                "Referer": "https://v.kuaishou.com/",
+            },
+            follow_redirects=False,
+        )
 
         location_url = share_response.headers.get("location", "")
         if len(location_url) <= 0:
@@ -32,21 +26,18 @@ class KuaiShou(BaseParser):
         # /fw/long-video/ 返回结果不一样, 统一替换为 /fw/photo/ 请求
         location_url = location_url.replace("/fw/long-video/", "/fw/photo/")
 
-        async with httpx.AsyncClient(follow_redirects=True) as client:
-            response = await client.get(
-                location_url,
-                headers=share_response.headers,
-                cookies=share_response.cookies,
-            )
-
-        re_pattern = r"window.INIT_STATE\s*=\s*(.*?)</script>"
-        re_result = re.search(re_pattern, response.text)
+        states = await self.fetch_page_states(
+            location_url,
+            ["INIT_STATE"],
+            headers=share_response.headers,
+            cookies=share_response.cookies,
+            follow_redirects=True,
+        )
 
-        if not re_result or len(re_result.groups()) < 1:
+        if "INIT_STATE" not in states:
             raise Exception("failed to parse video JSON info from HTML")
 
-        json_text = re_result.group(1).strip()
-        json_data = json.loads(json_text)
+        json_data = states.loads("INIT_STATE")
 
         photo_data = {}
         for json_item in json_data.values():
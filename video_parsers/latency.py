@@ -0,0 +1,104 @@
+import bisect
+import math
+from collections import OrderedDict
+from typing import Dict, List, Optional
+
+# 分桶上界(秒): 1ms ~ 120s, 相邻分桶相差 20%, 分位数的相对误差不超过 20%
+BUCKET_BOUNDS: List[float] = [
+    0.001 * 1.2**i for i in range(math.ceil(math.log(120 / 0.001, 1.2)) + 1)
+]
+
+
+class LatencyHistogram:
+    """
+    流式耗时直方图, 按对数分桶计数, 内存占用固定
+    总数超过 max_count 时所有分桶减半, 旧样本的权重指数衰减, 分位数跟随最近的耗时分布
+    """
+
+    def __init__(self, max_count: int = 2000):
+        """
+        :param max_count: 计数上限, 超出时衰减
+        """
+        self.max_count = max_count
+        self._counts = [0] * (len(BUCKET_BOUNDS) + 1)
+        self._total = 0
+
+    @property
+    def count(self) -> int:
+        return self._total
+
+    def record(self, seconds: float):
+        """
+        记录一次耗时
+        :param seconds: 耗时(秒)
+        """
+        self._counts[bisect.bisect_left(BUCKET_BOUNDS, seconds)] += 1
+        self._total += 1
+        if self._total > self.max_count:
+            self._counts = [count // 2 for count in self._counts]
+            self._total = sum(self._counts)
+
+    def quantile(self, q: float) -> Optional[float]:
+        """
+        分位数
+        :param q: 0 ~ 1, 如 0.95
+        :return: 分位数所在分桶的上界(秒), 没有样本时返回 None
+        """
+        if not self._total:
+            return None
+        rank = q * self._total
+        cumulative = 0
+        for index, count in enumerate(self._counts):
+            cumulative += count
+            if cumulative >= rank and count:
+                return BUCKET_BOUNDS[min(index, len(BUCKET_BOUNDS) - 1)]
+        return BUCKET_BOUNDS[-1]
+
+    def snapshot(self) -> Dict[str, Optional[float]]:
+        """
+        常用分位数, 用于管理接口展示
+        """
+        return {
+            "count": self._total,
+            "p50": self.quantile(0.5),
+            "p90": self.quantile(0.9),
+            "p99": self.quantile(0.99),
+        }
+
+
+class LatencyRegistry:
+    """
+    按名称(域名 / 接口)管理耗时直方图, 数量超出上限时淘汰最久未使用的
+    """
+
+    def __init__(self, max_entries: int = 1024):
+        """
+        :param max_entries: 最大直方图数
+        """
+        self.max_entries = max_entries
+        self._histograms: "OrderedDict[str, LatencyHistogram]" = OrderedDict()
+
+    def __len__(self) -> int:
+        return len(self._histograms)
+
+    def get(self, name: str) -> LatencyHistogram:
+        """
+        获取直方图, 不存在时创建
+        :param name: 名称
+        :return:
+        """
+        histogram = self._histograms.get(name)
+        if histogram is None:
+            histogram = LatencyHistogram()
+            self._histograms[name] = histogram
+            if len(self._histograms) > self.max_entries:
+                self._histograms.popitem(last=False)
+        else:
+            self._histograms.move_to_end(name)
+        return histogram
+
+    def snapshot(self) -> Dict[str, Dict[str, Optional[float]]]:
+        """
+        所有直方图的常用分位数
+        """
+        return {name: item.snapshot() for name, item in self._histograms.items()}
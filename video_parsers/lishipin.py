@@ -1,9 +1,7 @@
 import time
 from urllib.parse import urlparse
 
-import fake_useragent
-import httpx
-
+from . import jsoncodec
 from .base import BaseParser, VideoInfo
 
 
@@ -12,13 +10,17 @@ class LiShiPin(BaseParser):
     梨视频
     """
 
-    async def parse_share_url(self, share_url: str) -> VideoInfo:
+    def get_video_id_from_share_url(self, share_url: str) -> str:
         url_res = urlparse(share_url)
 
         video_id = url_res.path.replace("/detail_", "")
         if len(video_id) == 0:
             raise ValueError("parse video_id from share url fail")
 
+        return video_id
+
+    async def parse_share_url(self, share_url: str) -> VideoInfo:
+        video_id = self.get_video_id_from_share_url(share_url)
         return await self.parse_video_id(video_id)
 
     async def parse_video_id(self, video_id: str) -> VideoInfo:
@@ -27,17 +29,16 @@ class LiShiPin(BaseParser):
             f"https://www.pearvideo.com/videoStatus.jsp?contId={video_id}&mrd={now}"
         )
 
-        async with httpx.AsyncClient() as client:
-            headers = {
-                "Referer": f"https://www.pearvideo.com/detail_{video_id}",
-                "User-Agent": fake_useragent.UserAgent(os=["windows"]).random,
-            }
-            response = await client.get(req_url, headers=headers)
+        headers = {
+            "Referer": f"https://www.pearvideo.com/detail_{video_id}",
+            "User-Agent": self.get_user_agent("windows"),
+        }
+        response = await self.client.get(req_url, headers=headers)
 
         if response.status_code != 200:
             raise Exception("failed to fetch data")
 
-        json_data = response.json()
+        json_data = jsoncodec.loads(response.content)
 
         # 获取 videoInfo 字段的值
         video_src_url = json_data["videoInfo"]["videos"]["srcUrl"]
@@ -1,6 +1,5 @@
 import re
 
-import httpx
 from parsel import Selector
 
 from .base import BaseParser, VideoAuthor, VideoInfo
@@ -11,10 +10,11 @@ class LvZhou(BaseParser):
     绿洲
     """
 
+    COVER_STYLE_PATTERN = re.compile(r"background-image:url\((.*)\)")
+
     async def parse_share_url(self, share_url: str) -> VideoInfo:
-        async with httpx.AsyncClient() as client:
-            response = await client.get(share_url, headers=self.get_default_headers())
-            response.raise_for_status()
+        response = await self.client.get(share_url, headers=self.get_default_headers())
+        response.raise_for_status()
 
         sel = Selector(response.text)
 
@@ -24,7 +24,7 @@ class LvZhou(BaseParser):
 
         cover_url = ""
         if video_cover_style:
-            match = re.search(r"background-image:url\((.*)\)", video_cover_style)
+            match = self.COVER_STYLE_PATTERN.search(video_cover_style)
             if match:
                 cover_url = match.group(1)
 
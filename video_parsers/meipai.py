@@ -1,8 +1,6 @@
 import base64
 from typing import Dict, List
 
-import fake_useragent
-import httpx
 from parsel import Selector
 
 from .base import BaseParser, VideoAuthor, VideoInfo
@@ -14,12 +12,11 @@ class MeiPai(BaseParser):
     """
 
     async def parse_share_url(self, share_url: str) -> VideoInfo:
-        async with httpx.AsyncClient() as client:
-            headers = {
-                "User-Agent": fake_useragent.UserAgent(os=["windows"]).random,
-            }
-            response = await client.get(share_url, headers=headers)
-            response.raise_for_status()
+        headers = {
+            "User-Agent": self.get_user_agent("windows"),
+        }
+        response = await self.client.get(share_url, headers=headers)
+        response.raise_for_status()
 
         sel = Selector(response.text)
         video_bs64 = sel.css("#shareMediaBtn::attr(data-video)").get(default="")
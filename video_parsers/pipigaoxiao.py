@@ -1,8 +1,6 @@
 from urllib.parse import urlparse
 
-import fake_useragent
-import httpx
-
+from . import jsoncodec
 from .base import BaseParser, VideoInfo
 
 
@@ -11,29 +9,34 @@ class PiPiGaoXiao(BaseParser):
     皮皮搞笑
     """
 
-    async def parse_share_url(self, share_url: str) -> VideoInfo:
+    def get_video_id_from_share_url(self, share_url: str) -> str:
         url_res = urlparse(share_url)
 
         video_id = url_res.path.replace("/pp/post/", "")
         if len(video_id) == 0:
             raise ValueError("parse video_id from share url fail")
 
+        return video_id
+
+    async def parse_share_url(self, share_url: str) -> VideoInfo:
+        video_id = self.get_video_id_from_share_url(share_url)
         return await self.parse_video_id(video_id)
 
     async def parse_video_id(self, video_id: str) -> VideoInfo:
         req_url = "https://share.ippzone.com/ppapi/share/fetch_content"
-        async with httpx.AsyncClient() as client:
-            headers = {
-                "Referer": req_url,
-                "Content-Type": "text/plain;charset=UTF-8",
-                "User-Agent": fake_useragent.UserAgent(os=["windows"]).random,
-            }
-            # pid需要是数字，这里直接拼接json字符串，不用json.dumps
-            post_content = '{"pid":' + video_id + ',"type":"post","mid":null}'
-            response = await client.post(req_url, headers=headers, content=post_content)
-            response.raise_for_status()
-
-        json_data = response.json()
+        headers = {
+            "Referer": req_url,
+            "Content-Type": "text/plain;charset=UTF-8",
+            "User-Agent": self.get_user_agent("windows"),
+        }
+        # pid需要是数字，这里直接拼接json字符串，不用json.dumps
+        post_content = '{"pid":' + video_id + ',"type":"post","mid":null}'
+        response = await self.client.post(
+            req_url, headers=headers, content=post_content
+        )
+        response.raise_for_status()
+
+        json_data = jsoncodec.loads(response.content)
         # 接口返回错误
         if "msg" in json_data:
             raise Exception(json_data["msg"])
@@ -1,5 +1,4 @@
-import httpx
-
+from . import jsoncodec
 from .base import BaseParser, ImgInfo, VideoAuthor, VideoInfo
 
 
@@ -9,9 +8,9 @@ class PiPiXia(BaseParser):
     """
 
     async def parse_share_url(self, share_url: str) -> VideoInfo:
-        async with httpx.AsyncClient(follow_redirects=False) as client:
-            response = await client.get(share_url, headers=self.get_default_headers())
-        location_url = response.headers.get("location", "")
+        location_url = await self.resolve_short_url(
+            share_url, headers=self.get_default_headers()
+        )
         if len(location_url) <= 0:
             raise Exception("failed to get location url from share url")
 
@@ -25,11 +24,12 @@ class PiPiXia(BaseParser):
             + f"?offset=0&cell_type=1&api_version=1&cell_id={video_id}"
             + "&ac=wifi&channel=huawei_1319_64&aid=1319&app_name=super"
         )
-        async with httpx.AsyncClient(follow_redirects=False) as client:
-            response = await client.get(req_url, headers=self.get_default_headers())
-            response.raise_for_status()
+        response = await self.client.get(
+            req_url, headers=self.get_default_headers(), follow_redirects=False
+        )
+        response.raise_for_status()
 
-        json_data = response.json()
+        json_data = jsoncodec.loads(response.content)
         if json_data["status_code"] != 0:
             raise Exception(f"获取作品信息失败:prompt={json_data['prompt']}")
         data = json_data["data"]["cell_comments"][0]["comment_info"]["item"]
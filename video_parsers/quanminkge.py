@@ -1,12 +1,7 @@
-import json
-import re
-
-import fake_useragent
-import httpx
-
 from utils import get_val_from_url_by_query_key
 
 from .base import BaseParser, VideoAuthor, VideoInfo
+from .embedded import extract_states
 
 
 class QuanMinKGe(BaseParser):
@@ -14,27 +9,27 @@ class QuanMinKGe(BaseParser):
     全民K歌
     """
 
+    def get_video_id_from_share_url(self, share_url: str) -> str:
+        return get_val_from_url_by_query_key(share_url, "s")
+
     async def parse_share_url(self, share_url: str) -> VideoInfo:
-        video_id = get_val_from_url_by_query_key(share_url, "s")
+        video_id = self.get_video_id_from_share_url(share_url)
         return await self.parse_video_id(video_id)
 
     async def parse_video_id(self, video_id: str) -> VideoInfo:
         req_url = f"https://kg.qq.com/node/play?s={video_id}"
-        async with httpx.AsyncClient() as client:
-            headers = {
-                "User-Agent": fake_useragent.UserAgent(os="windows").random,
-            }
-            response = await client.get(req_url, headers=headers)
-            response.raise_for_status()
+        headers = {
+            "User-Agent": self.get_user_agent("windows"),
+        }
+        response = await self.client.get(req_url, headers=headers)
+        response.raise_for_status()
 
-        re_pattern = r"window.__DATA__ = (.*?); </script>"
-        re_result = re.search(re_pattern, response.text)
+        states = extract_states(response.content, ["__DATA__"], self.page_encoding)
 
-        if not re_result or len(re_result.groups()) < 1:
+        if "__DATA__" not in states:
             raise Exception("failed to parse video JSON info from HTML")
 
-        json_text = re_result.group(1).strip()
-        json_data = json.loads(json_text)
+        json_data = states.loads("__DATA__")
         data = json_data["detail"]
 
         video_info = VideoInfo(
@@ -1,9 +1,4 @@
-import re
-
-import fake_useragent
-import httpx
-import yaml
-
+from . import jsliteral
 from .base import BaseParser, ImgInfo, VideoAuthor, VideoInfo
 
 
@@ -14,34 +9,30 @@ class RedBook(BaseParser):
 
     async def parse_share_url(self, share_url: str) -> VideoInfo:
         headers = {
-            "User-Agent": fake_useragent.UserAgent(os=["windows"]).random,
+            "User-Agent": self.get_user_agent("windows"),
         }
-        async with httpx.AsyncClient(follow_redirects=True) as client:
-            response = await client.get(share_url, headers=headers)
-            response.raise_for_status()
-
-        pattern = re.compile(
-            pattern=r"window\.__INITIAL_STATE__\s*=\s*(.*?)</script>",
-            flags=re.DOTALL,
+        states = await self.fetch_page_states(
+            share_url, ["__INITIAL_STATE__"], headers=headers, follow_redirects=True
         )
-        find_res = pattern.search(response.text)
+        initial_state = states.get("__INITIAL_STATE__")
 
-        if not find_res or not find_res.group(1):
+        if not initial_state:
             raise ValueError("parse video json info from html fail")
 
-        json_data = yaml.safe_load(find_res.group(1))
+        # 内容是 JS 字面量 (包含 undefined), 不能直接用 json.loads 解析
+        json_data = jsliteral.loads(initial_state)
 
         note_id = json_data["note"]["currentNoteId"]
         # 验证返回：小红书的分享链接有有效期，过期后会返回 undefined
-        if note_id == "undefined":
+        if not note_id or note_id == "undefined":
             raise Exception("parse fail: note id in response is undefined")
         data = json_data["note"]["noteDetailMap"][note_id]["note"]
 
         # 视频地址
         video_url = ""
-        h264_data = (
-            data.get("video", {}).get("media", {}).get("stream", {}).get("h264", [])
-        )
+        # 图集笔记的 video 为 undefined (None)
+        video_data = data.get("video") or {}
+        h264_data = video_data.get("media", {}).get("stream", {}).get("h264", [])
         if len(h264_data) > 0:
             video_url = h264_data[0].get("masterUrl", "")
 
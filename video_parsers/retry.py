@@ -0,0 +1,229 @@
+import asyncio
+import dataclasses
+import random
+import time
+from contextvars import ContextVar
+from typing import Callable, Optional, Tuple, Type
+
+import httpx
+
+from .circuit import CircuitOpenError
+from .timeouts import get_remaining_time
+
+
+@dataclasses.dataclass(frozen=True)
+class RetryPolicy:
+    """
+    重试策略
+    只重试幂等的请求, 重试间隔为指数退避 + 全抖动 (0 ~ backoff_base * 2^n)
+    """
+
+    # 最大尝试次数 (含首次请求), 1 表示不重试
+    max_attempts: int = 2
+
+    # 可重试的请求方法
+    methods: Tuple[str, ...] = ("GET", "HEAD")
+
+    # 可重试的响应状态码
+    retry_statuses: Tuple[int, ...] = (429, 500, 502, 503, 504)
+
+    # 可重试的异常, 读超时默认不重试, 避免上游变慢时成倍放大等待时间
+    retry_exceptions: Tuple[Type[Exception], ...] = (
+        httpx.ConnectError,
+        httpx.ConnectTimeout,
+        httpx.RemoteProtocolError,
+    )
+
+    # 退避基数(秒)
+    backoff_base: float = 0.2
+
+    # 单次退避上限(秒), Retry-After 超过该值时不再重试
+    backoff_max: float = 2.0
+
+    def get_backoff(self, attempt: int) -> float:
+        """
+        第 attempt 次重试前的等待时间
+        :param attempt: 重试序号, 从 1 开始
+        :return: 等待时间(秒)
+        """
+        return random.uniform(
+            0, min(self.backoff_max, self.backoff_base * 2 ** (attempt - 1))
+        )
+
+
+# 默认重试策略
+DEFAULT_RETRY_POLICY = RetryPolicy()
+
+# 不重试
+NO_RETRY_POLICY = RetryPolicy(max_attempts=1)
+
+# 当前请求使用的重试策略, 由解析入口按视频来源设置, 未设置时使用连接池配置中的策略
+current_retry_policy: ContextVar[Optional[RetryPolicy]] = ContextVar(
+    "current_retry_policy", default=None
+)
+
+
+@dataclasses.dataclass
+class RetryBudgetStats:
+    """
+    重试预算统计
+    """
+
+    # 首次请求数
+    requests: int = 0
+
+    # 重试次数
+    retries: int = 0
+
+    # 预算不足放弃重试的次数
+    exhausted: int = 0
+
+
+class RetryBudget:
+    """
+    全局重试预算
+    每个首次请求存入 ratio 个令牌, 每次重试消耗 1 个, 重试量不超过流量的 ratio 比例;
+    另外每秒补充 min_per_second 个令牌, 保证低流量时也能重试
+    上游整体故障时预算很快耗尽, 重试不会把故障放大成数倍的请求量
+    """
+
+    def __init__(
+        self,
+        ratio: float = 0.1,
+        min_per_second: float = 2.0,
+        max_tokens: float = 100.0,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        """
+        :param ratio: 重试量占首次请求量的最大比例
+        :param min_per_second: 每秒补充的令牌数
+        :param max_tokens: 令牌上限
+        :param clock: 时钟函数, 返回单调递增的秒数
+        """
+        self.ratio = ratio
+        self.min_per_second = min_per_second
+        self.max_tokens = max_tokens
+        self._clock = clock
+        self._tokens = max_tokens
+        self._updated_at = clock()
+        self.stats = RetryBudgetStats()
+
+    def record_request(self):
+        """
+        记录一次首次请求
+        """
+        self.stats.requests += 1
+        self._refill(self.ratio)
+
+    def try_spend(self) -> bool:
+        """
+        尝试消耗一次重试的令牌
+        :return: 是否允许重试
+        """
+        self._refill(0)
+        if self._tokens < 1:
+            self.stats.exhausted += 1
+            return False
+        self._tokens -= 1
+        self.stats.retries += 1
+        return True
+
+    def _refill(self, tokens: float):
+        now = self._clock()
+        tokens += (now - self._updated_at) * self.min_per_second
+        self._updated_at = now
+        self._tokens = min(self._tokens + tokens, self.max_tokens)
+
+
+def _get_retry_after(response: httpx.Response) -> Optional[float]:
+    value = response.headers.get("retry-after", "")
+    try:
+        return max(float(value), 0)
+    except ValueError:
+        return None
+
+
+class RetryTransport(httpx.AsyncBaseTransport):
+    """
+    按重试策略重试的 transport, 包装连接池中的底层 transport
+    策略优先级: 请求 extensions 中的 retry_policy > current_retry_policy > 连接池配置
+    熔断器拒绝 (CircuitOpenError) 不重试
+    """
+
+    def __init__(
+        self,
+        transport: httpx.AsyncBaseTransport,
+        policy: RetryPolicy,
+        budget: RetryBudget,
+    ):
+        """
+        :param transport: 底层 transport
+        :param policy: 默认重试策略
+        :param budget: 重试预算
+        """
+        self._transport = transport
+        self._policy = policy
+        self._budget = budget
+
+    def _get_policy(self, request: httpx.Request) -> RetryPolicy:
+        return (
+            request.extensions.get("retry_policy")
+            or current_retry_policy.get()
+            or self._policy
+        )
+
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        policy = self._get_policy(request)
+        self._budget.record_request()
+        if policy.max_attempts <= 1 or request.method not in policy.methods:
+            return await self._transport.handle_async_request(request)
+
+        attempt = 1
+        while True:
+            try:
+                response = await self._transport.handle_async_request(request)
+            except CircuitOpenError:
+                raise
+            except policy.retry_exceptions:
+                backoff = policy.get_backoff(attempt)
+                if (
+                    attempt >= policy.max_attempts
+                    or not self._has_time(backoff)
+                    or not self._budget.try_spend()
+                ):
+                    raise
+                await asyncio.sleep(backoff)
+                attempt += 1
+                continue
+
+            if (
+                response.status_code not in policy.retry_statuses
+                or attempt >= policy.max_attempts
+            ):
+                return response
+
+            backoff = policy.get_backoff(attempt)
+            retry_after = _get_retry_after(response)
+            if retry_after is not None:
+                if retry_after > policy.backoff_max:
+                    return response
+                backoff = max(backoff, retry_after)
+            if not self._has_time(backoff) or not self._budget.try_spend():
+                return response
+
+            await response.aclose()
+            await asyncio.sleep(backoff)
+            attempt += 1
+
+    @staticmethod
+    def _has_time(backoff: float) -> bool:
+        # 等待后已超出解析的时间预算时不再重试
+        remaining = get_remaining_time()
+        return remaining is None or remaining > backoff
+
+    async def aclose(self):
+        await self._transport.aclose()
+
+
+# 所有连接池共享的重试预算
+retry_budget = RetryBudget()
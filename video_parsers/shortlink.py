@@ -0,0 +1,146 @@
+import asyncio
+import json
+import logging
+import os
+import time
+from typing import Callable, Optional
+
+import aiofiles
+
+from utils import normalize_share_url
+
+from .cache import TTLCache
+
+logger = logging.getLogger(__name__)
+
+# 短链接缓存文件, 设置为空字符串时只缓存在内存中
+DEFAULT_SHORTLINK_CACHE_PATH = os.getenv(
+    "PARSE_VIDEO_SHORTLINK_CACHE", ".cache/shortlinks.jsonl"
+)
+
+# 短链接跳转地址的缓存时间(秒), 平台偶尔会调整跳转目标, 不永久缓存
+DEFAULT_SHORTLINK_TTL = 7 * 24 * 3600
+
+
+class ShortLinkCache:
+    """
+    短链接 -> 跳转地址 缓存
+    短链接 (v.douyin.com / b23.tv ...) 对应的跳转地址基本不会变化, 缓存后可省去一次跳转请求
+    以 jsonl 追加写入文件, 重启后可恢复; 文件中的记录超过容量的两倍时重写文件进行压缩
+    """
+
+    def __init__(
+        self,
+        path: Optional[str] = DEFAULT_SHORTLINK_CACHE_PATH,
+        max_entries: int = 100000,
+        ttl: float = DEFAULT_SHORTLINK_TTL,
+        clock: Callable[[], float] = time.time,
+    ):
+        """
+        :param path: 持久化文件路径, 为空时不持久化
+        :param max_entries: 内存中最大条目数
+        :param ttl: 缓存时间(秒)
+        :param clock: 时钟函数, 返回 unix 时间戳, 过期时间以 unix 时间戳写入文件
+        """
+        self.path = path
+        self.ttl = ttl
+        self._clock = clock
+        self._cache = TTLCache(max_entries=max_entries, clock=clock)
+        # 持久化文件中的记录数, 以及追加写入 / 压缩文件的锁
+        self._line_count = 0
+        self._file_lock = asyncio.Lock()
+
+    @property
+    def stats(self):
+        return self._cache.stats
+
+    def __len__(self) -> int:
+        return len(self._cache)
+
+    @staticmethod
+    def _key(short_url: str) -> str:
+        return normalize_share_url(short_url).rstrip("/")
+
+    def get(self, short_url: str) -> Optional[str]:
+        """
+        获取短链接的跳转地址
+        :param short_url: 短链接
+        :return: 跳转地址, 未缓存或已过期时返回 None
+        """
+        item = self._cache.get(self._key(short_url))
+        return item[0] if item is not None else None
+
+    async def set(self, short_url: str, location: str):
+        """
+        缓存短链接的跳转地址, 并追加写入持久化文件
+        :param short_url: 短链接
+        :param location: 跳转地址
+        """
+        key = self._key(short_url)
+        expire_at = self._clock() + self.ttl
+        self._cache.set(key, (location, expire_at), ttl=self.ttl)
+        if not self.path:
+            return
+
+        line = json.dumps(
+            {"url": key, "location": location, "expire_at": expire_at},
+            ensure_ascii=False,
+        )
+        async with self._file_lock:
+            try:
+                async with aiofiles.open(self.path, "a", encoding="utf-8") as f:
+                    await f.write(line + "\n")
+                self._line_count += 1
+                if self._line_count > 2 * self._cache.max_entries:
+                    await asyncio.to_thread(self._rewrite)
+            except OSError as err:
+                logger.warning(f"Failed to persist short link {key}: {err}")
+
+    def load(self):
+        """
+        从持久化文件加载缓存, 在服务启动时调用
+        文件中重复或超出容量的记录较多时, 重写文件进行压缩
+        """
+        if not self.path:
+            return
+
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        if not os.path.exists(self.path):
+            return
+
+        now = self._clock()
+        line_count = 0
+        with open(self.path, encoding="utf-8") as f:
+            for line in f:
+                line_count += 1
+                try:
+                    item = json.loads(line)
+                    # 没有过期时间的旧记录按刚写入处理
+                    expire_at = float(item.get("expire_at", now + self.ttl))
+                    self._cache.set(
+                        item["url"],
+                        (item["location"], expire_at),
+                        ttl=min(expire_at - now, self.ttl),
+                    )
+                except (ValueError, KeyError, TypeError, AttributeError):
+                    continue
+
+        self._line_count = line_count
+        if line_count > 2 * max(len(self._cache), 1):
+            self._rewrite()
+        logger.info(f"Loaded {len(self._cache)} short links from {self.path}")
+
+    def _rewrite(self):
+        tmp_path = self.path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            for key, (location, expire_at) in self._cache.items():
+                item = {"url": key, "location": location, "expire_at": expire_at}
+                f.write(json.dumps(item, ensure_ascii=False) + "\n")
+        os.replace(tmp_path, self.path)
+        self._line_count = len(self._cache)
+
+
+# 所有解析器共享的短链接缓存
+shortlink_cache = ShortLinkCache()
@@ -0,0 +1,85 @@
+import asyncio
+import contextvars
+import dataclasses
+from typing import Any, Awaitable, Callable, Dict, Hashable
+
+
+@dataclasses.dataclass
+class SingleFlightStats:
+    """
+    合并请求统计
+    """
+
+    # 调用总次数
+    calls: int = 0
+
+    # 实际执行上游解析的次数
+    executions: int = 0
+
+    # 被合并(复用其它调用结果)的次数
+    merged: int = 0
+
+    # 所有调用方都已放弃等待而取消的次数
+    abandoned: int = 0
+
+
+class SingleFlight:
+    """
+    相同 key 的并发调用只执行一次, 所有调用方共享同一个结果或异常
+    共享的调用在空的 context 中执行, 不继承首个调用方的 context 变量 (如截止时间),
+    各调用方自己的限制需要在等待结果时处理; 所有调用方都放弃等待 (超时或被取消) 时取消共享的调用
+    """
+
+    def __init__(self):
+        self._inflight: Dict[Hashable, asyncio.Task] = {}
+        # 共享调用 -> 仍在等待结果的调用方数
+        self._waiters: Dict[asyncio.Task, int] = {}
+        self.stats = SingleFlightStats()
+
+    async def do(self, key: Hashable, func: Callable[[], Awaitable[Any]]) -> Any:
+        """
+        执行 func, 若相同 key 的调用正在进行中, 则等待其结果
+        :param key: 合并请求的 key
+        :param func: 返回协程的函数, 只有首个调用方会执行
+        :return: func 的返回值
+        """
+        self.stats.calls += 1
+        task = self._inflight.get(key)
+        if task is None:
+            self.stats.executions += 1
+            task = contextvars.Context().run(asyncio.ensure_future, func())
+            self._inflight[key] = task
+            task.add_done_callback(lambda t: self._on_done(key, t))
+        else:
+            self.stats.merged += 1
+
+        # shield: 某个调用方被取消(客户端断开)时, 不影响其它等待中的调用方
+        self._waiters[task] = self._waiters.get(task, 0) + 1
+        try:
+            return await asyncio.shield(task)
+        finally:
+            self._release(task)
+
+    def _release(self, task: asyncio.Task):
+        waiters = self._waiters[task] - 1
+        if waiters:
+            self._waiters[task] = waiters
+            return
+        del self._waiters[task]
+        if not task.done():
+            # 没有调用方需要结果了, 不再继续请求上游
+            self.stats.abandoned += 1
+            task.cancel()
+
+    def _on_done(self, key: Hashable, task: asyncio.Task):
+        if self._inflight.get(key) is task:
+            del self._inflight[key]
+        # 所有调用方都已取消时, 避免 "exception was never retrieved" 警告
+        if not task.cancelled():
+            task.exception()
+
+    def inflight_count(self) -> int:
+        """
+        当前正在执行的调用数
+        """
+        return len(self._inflight)
@@ -1,8 +1,6 @@
-import fake_useragent
-import httpx
-
 from utils import get_val_from_url_by_query_key
 
+from . import jsoncodec
 from .base import BaseParser, VideoAuthor, VideoInfo
 
 
@@ -11,7 +9,7 @@ class SixRoom(BaseParser):
     六间房
     """
 
-    async def parse_share_url(self, share_url: str) -> VideoInfo:
+    def get_video_id_from_share_url(self, share_url: str) -> str:
         if "watchMini.php?vid=" in share_url:
             video_id = get_val_from_url_by_query_key(share_url, "vid")
         else:
@@ -20,6 +18,10 @@ class SixRoom(BaseParser):
         if len(video_id) == 0:
             raise Exception("parse video id from share url failed")
 
+        return video_id
+
+    async def parse_share_url(self, share_url: str) -> VideoInfo:
+        video_id = self.get_video_id_from_share_url(share_url)
         return await self.parse_video_id(video_id)
 
     async def parse_video_id(self, video_id: str) -> VideoInfo:
@@ -30,13 +32,14 @@ class SixRoom(BaseParser):
         )
         headers = {
             "Referer": f"https://m.6.cn/v/{video_id}",
-            "User-Agent": fake_useragent.UserAgent(os=["ios"]).random,
+            "User-Agent": self.get_user_agent("ios"),
         }
-        async with httpx.AsyncClient(follow_redirects=True) as client:
-            response = await client.get(req_url, headers=headers)
-            response.raise_for_status()
+        response = await self.client.get(
+            req_url, headers=headers, follow_redirects=True
+        )
+        response.raise_for_status()
 
-        json_data = response.json()
+        json_data = jsoncodec.loads(response.content)
         data = json_data["content"]
 
         video_info = VideoInfo(
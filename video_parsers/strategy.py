@@ -0,0 +1,230 @@
+import asyncio
+import dataclasses
+import time
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Sequence, Tuple
+
+# 获取方式: (名称, 返回协程的函数)
+Strategy = Tuple[str, Callable[[], Awaitable[Any]]]
+
+
+async def race(
+    funcs: Sequence[Callable[[], Awaitable[Any]]],
+    is_valid: Optional[Callable[[Any], bool]] = None,
+    stagger: Optional[float] = None,
+) -> Any:
+    """
+    执行多个获取方式, 返回最先得到的有效结果, 并取消其余仍在执行的
+    抛出异常或结果无效的方式会被忽略, 继续等待其余的方式
+    :param funcs: 返回协程的函数列表
+    :param is_valid: 判断结果是否有效, 默认非空即有效
+    :param stagger: 为 None 时同时执行所有方式; 否则按顺序执行,
+        前一个方式 stagger 秒内未返回或失败时启动下一个
+    :return: 首个有效结果
+    """
+    if is_valid is None:
+        is_valid = bool
+
+    waiting = list(funcs)
+    pending = set()
+    error: Optional[BaseException] = None
+
+    def start_next():
+        pending.add(asyncio.ensure_future(waiting.pop(0)()))
+
+    while waiting and (stagger is None or not pending):
+        start_next()
+
+    try:
+        while pending:
+            done, _ = await asyncio.wait(
+                pending,
+                timeout=stagger if waiting else None,
+                return_when=asyncio.FIRST_COMPLETED,
+            )
+            pending.difference_update(done)
+            for task in done:
+                if task.exception() is not None:
+                    error = task.exception()
+                    continue
+                if is_valid(task.result()):
+                    return task.result()
+            # 超时未返回或已失败, 不再等待, 启动下一个方式
+            if waiting:
+                start_next()
+    finally:
+        for task in pending:
+            task.cancel()
+
+    if error is not None:
+        raise error
+    raise ValueError("no strategy returned a valid result")
+
+
+@dataclasses.dataclass
+class StrategyStats:
+    """
+    获取方式的统计
+    """
+
+    # 成功率的指数加权平均
+    success_rate: float = 1.0
+
+    # 最后一次更新的时间
+    updated_at: float = 0.0
+
+    # 成功次数
+    successes: int = 0
+
+    # 失败次数 (异常或结果无效, 被取消的不计入)
+    failures: int = 0
+
+    # 其它方式先得到有效结果, 本方式仍未返回而被取消的次数
+    cancellations: int = 0
+
+
+class StrategyRunner:
+    """
+    按最近成功率排序执行多个获取方式, 成功率高的先执行
+    stagger 模式下常见情况只需一个请求, 首选方式变慢或失败时才启动下一个;
+    成功率较低的方式排在后面很少执行, 其成功率随时间逐渐回到初始值, 之后会重新尝试
+    已启动但比其它方式慢而被取消的方式按 cancel_score 计入成功率, 总是较慢的方式也会排到后面
+    """
+
+    def __init__(
+        self,
+        stagger: Optional[float] = 1.0,
+        alpha: float = 0.2,
+        margin: float = 0.2,
+        half_life: float = 300.0,
+        cancel_score: float = 0.5,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        """
+        :param stagger: 启动下一个方式前的等待时间(秒), 为 None 时同时执行所有方式
+        :param alpha: 成功率的平滑系数, 越大越偏重最近的结果
+        :param margin: 成功率高出超过该值时才排到前面, 避免偶发失败就调整顺序
+        :param half_life: 成功率回到初始值的半衰期(秒)
+        :param cancel_score: 被更快的方式取消时计入成功率的值, 介于失败(0)和成功(1)之间
+        :param clock: 时钟函数, 返回单调递增的秒数
+        """
+        self.stagger = stagger
+        self.alpha = alpha
+        self.margin = margin
+        self.half_life = half_life
+        self.cancel_score = cancel_score
+        self._clock = clock
+        self._stats: Dict[str, StrategyStats] = {}
+
+    def get_success_rate(self, name: str) -> float:
+        """
+        获取方式的当前成功率, 长时间未更新时向初始值 1.0 回归
+        :param name: 方式名称
+        :return:
+        """
+        stats = self._stats.get(name)
+        if stats is None:
+            return 1.0
+        elapsed = self._clock() - stats.updated_at
+        decay = 0.5 ** (elapsed / self.half_life)
+        return 1.0 - (1.0 - stats.success_rate) * decay
+
+    def record(self, name: str, success: bool):
+        """
+        记录一次执行结果
+        :param name: 方式名称
+        :param success: 是否得到有效结果
+        """
+        stats = self._update(name, 1.0 if success else 0.0)
+        if success:
+            stats.successes += 1
+        else:
+            stats.failures += 1
+
+    def record_cancelled(self, name: str):
+        """
+        记录一次因其它方式先得到有效结果而被取消的执行
+        :param name: 方式名称
+        """
+        self._update(name, self.cancel_score).cancellations += 1
+
+    def _update(self, name: str, score: float) -> StrategyStats:
+        rate = self.get_success_rate(name)
+        stats = self._stats.setdefault(name, StrategyStats())
+        stats.success_rate = rate + self.alpha * (score - rate)
+        stats.updated_at = self._clock()
+        return stats
+
+    def get_order(self, strategies: Sequence[Strategy]) -> List[Strategy]:
+        """
+        按成功率从高到低排序, 成功率相差不超过 margin 时保持原有顺序
+        :param strategies: 获取方式列表
+        :return:
+        """
+        rates = {name: self.get_success_rate(name) for name, _ in strategies}
+        ordered: List[Strategy] = []
+        for item in strategies:
+            index = len(ordered)
+            while (
+                index > 0
+                and rates[item[0]] > rates[ordered[index - 1][0]] + self.margin
+            ):
+                index -= 1
+            ordered.insert(index, item)
+        return ordered
+
+    async def run(
+        self,
+        strategies: Sequence[Strategy],
+        is_valid: Optional[Callable[[Any], bool]] = None,
+    ) -> Any:
+        """
+        执行获取方式, 返回首个有效结果
+        :param strategies: 获取方式列表, 列表顺序为成功率相同时的优先顺序
+        :param is_valid: 判断结果是否有效, 默认非空即有效
+        :return: 首个有效结果, 全部失败时抛出最后一个异常
+        """
+        if is_valid is None:
+            is_valid = bool
+        # 已启动但尚未返回的方式
+        running = set()
+
+        def attempt(name: str, func: Callable[[], Awaitable[Any]]):
+            async def run_attempt():
+                running.add(name)
+                try:
+                    result = await func()
+                except asyncio.CancelledError:
+                    raise
+                except Exception:
+                    running.discard(name)
+                    self.record(name, False)
+                    raise
+                running.discard(name)
+                self.record(name, is_valid(result))
+                return result
+
+            return run_attempt
+
+        result = await race(
+            [attempt(name, func) for name, func in self.get_order(strategies)],
+            is_valid=is_valid,
+            stagger=self.stagger,
+        )
+        # 得到有效结果时仍在执行的方式已被取消, 比获胜的方式慢
+        for name in running:
+            self.record_cancelled(name)
+        return result
+
+    def snapshot(self) -> Dict[str, Dict[str, Any]]:
+        """
+        各获取方式的统计, 用于管理接口展示
+        """
+        return {
+            name: {
+                "success_rate": round(self.get_success_rate(name), 3),
+                "successes": stats.successes,
+                "failures": stats.failures,
+                "cancellations": stats.cancellations,
+            }
+            for name, stats in self._stats.items()
+        }
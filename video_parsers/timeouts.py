@@ -0,0 +1,222 @@
+import contextlib
+import inspect
+import time
+from contextvars import ContextVar
+from typing import Any, Callable, Iterator, Optional
+
+import httpx
+
+from .latency import LatencyRegistry
+
+# 单次解析的默认时间预算(秒), 包含解析过程中的所有请求
+DEFAULT_PARSE_DEADLINE = 15.0
+
+# 当前请求的截止时间 (time.monotonic), 由解析入口设置, 所有阶段的请求共享
+current_deadline: ContextVar[Optional[float]] = ContextVar(
+    "current_deadline", default=None
+)
+
+# 请求阶段, 对应 httpcore trace 事件
+PHASE_CONNECT = "connect"
+PHASE_FIRST_BYTE = "first_byte"
+PHASE_TOTAL = "total"
+
+
+class DeadlineExceeded(httpx.TimeoutException):
+    """
+    请求的时间预算已用完
+    """
+
+
+def get_remaining_time() -> Optional[float]:
+    """
+    当前截止时间的剩余秒数
+    :return: 未设置截止时间时返回 None
+    """
+    deadline = current_deadline.get()
+    if deadline is None:
+        return None
+    return deadline - time.monotonic()
+
+
+@contextlib.contextmanager
+def deadline_scope(seconds: float) -> Iterator[float]:
+    """
+    在作用域内设置截止时间, 已有更早的截止时间时保持不变
+    :param seconds: 时间预算(秒)
+    :return: 生效的截止时间
+    """
+    deadline = time.monotonic() + seconds
+    parent = current_deadline.get()
+    if parent is not None:
+        deadline = min(deadline, parent)
+    token = current_deadline.set(deadline)
+    try:
+        yield deadline
+    finally:
+        current_deadline.reset(token)
+
+
+class AdaptiveTimeouts:
+    """
+    按域名及请求阶段 (建立连接 / 首字节 / 总耗时) 统计耗时分布, 由分布推导超时时间
+    超时时间 = 分位耗时 * multiplier, 不低于 floor, 不超过连接池配置的超时时间
+    """
+
+    def __init__(
+        self,
+        quantile: float = 0.99,
+        multiplier: float = 3.0,
+        min_samples: int = 20,
+    ):
+        """
+        :param quantile: 参考的耗时分位数
+        :param multiplier: 超时时间相对分位耗时的倍数
+        :param min_samples: 样本数少于该值时使用连接池配置的超时时间
+        """
+        self.quantile = quantile
+        self.multiplier = multiplier
+        self.min_samples = min_samples
+        self.latencies = LatencyRegistry(max_entries=3072)
+
+    def record(self, host: str, phase: str, seconds: float):
+        """
+        记录一次耗时
+        :param host: 域名
+        :param phase: 请求阶段
+        :param seconds: 耗时(秒)
+        """
+        self.latencies.get(f"{host} {phase}").record(seconds)
+
+    def get_timeout(self, host: str, phase: str, floor: float, ceiling: float) -> float:
+        """
+        获取超时时间
+        :param host: 域名
+        :param phase: 请求阶段
+        :param floor: 超时时间下限(秒)
+        :param ceiling: 超时时间上限(秒)
+        :return:
+        """
+        histogram = self.latencies.get(f"{host} {phase}")
+        if histogram.count < self.min_samples:
+            return ceiling
+        adaptive = histogram.quantile(self.quantile) * self.multiplier
+        return min(max(adaptive, floor), ceiling)
+
+
+class _MeasuredStream(httpx.AsyncByteStream):
+    """
+    响应体读取完成(关闭)时记录请求总耗时
+    """
+
+    def __init__(self, stream: httpx.AsyncByteStream, on_close: Callable[[], Any]):
+        self._stream = stream
+        self._on_close = on_close
+
+    async def __aiter__(self):
+        async for chunk in self._stream:
+            yield chunk
+
+    async def aclose(self):
+        try:
+            await self._stream.aclose()
+        finally:
+            self._on_close()
+
+
+class AdaptiveTimeoutTransport(httpx.AsyncBaseTransport):
+    """
+    自适应超时 transport
+    通过 httpcore 的 trace 扩展统计每个域名的建立连接及首字节耗时, 据此设置 connect 超时
+    及等待响应头的 read 超时; 收到响应头后恢复连接池配置的 read 超时, 读取响应体时
+    每次读取仍使用该超时, 不会因为传输中途短暂卡顿而中断下载
+    所有超时都限制在当前截止时间的剩余时间内, 预算已用完时直接抛出 DeadlineExceeded
+    """
+
+    def __init__(
+        self,
+        transport: httpx.AsyncBaseTransport,
+        timeouts: AdaptiveTimeouts,
+        min_timeout: float = 1.0,
+    ):
+        """
+        :param transport: 底层 transport
+        :param timeouts: 耗时统计
+        :param min_timeout: 自适应超时时间的下限(秒)
+        """
+        self._transport = transport
+        self._timeouts = timeouts
+        self._min_timeout = min_timeout
+
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        remaining = get_remaining_time()
+        if remaining is not None and remaining <= 0:
+            raise DeadlineExceeded("request deadline exceeded", request=request)
+
+        host = request.url.host
+        timeout = dict(request.extensions.get("timeout", {}))
+        if remaining is not None:
+            for key in ("connect", "read", "write", "pool"):
+                timeout[key] = min(timeout.get(key) or remaining, remaining)
+        # 读取响应体时每次读取的超时
+        body_read_timeout = timeout.get("read")
+        for key, phase in (("connect", PHASE_CONNECT), ("read", PHASE_FIRST_BYTE)):
+            if timeout.get(key) is not None:
+                timeout[key] = self._timeouts.get_timeout(
+                    host, phase, self._min_timeout, timeout[key]
+                )
+
+        started = {}
+        parent_trace = request.extensions.get("trace")
+
+        async def trace(event_name: str, info: dict):
+            now = time.monotonic()
+            if event_name == "connection.connect_tcp.started":
+                started[PHASE_CONNECT] = now
+            elif event_name in (
+                "connection.connect_tcp.complete",
+                "connection.start_tls.complete",
+            ):
+                # 有 TLS 时以握手完成为准, 覆盖 TCP 连接完成的记录
+                started["connected"] = now
+            elif event_name.endswith(".send_request_headers.started"):
+                started[PHASE_FIRST_BYTE] = now
+            elif event_name.endswith(".receive_response_headers.complete"):
+                if PHASE_FIRST_BYTE in started:
+                    self._timeouts.record(
+                        host, PHASE_FIRST_BYTE, now - started[PHASE_FIRST_BYTE]
+                    )
+            if parent_trace is not None:
+                result = parent_trace(event_name, info)
+                if inspect.isawaitable(result):
+                    await result
+
+        # 对冲请求会并发发送同一个 request, 新建 request 而不是修改 extensions
+        request = httpx.Request(
+            request.method,
+            request.url,
+            headers=request.headers,
+            stream=request.stream,
+            extensions={**request.extensions, "timeout": timeout, "trace": trace},
+        )
+        began = time.monotonic()
+        response = await self._transport.handle_async_request(request)
+        # httpcore 读取响应体时才从 extensions 中取 read 超时, timeout 是本次请求独有的
+        # dict, 直接修改即可恢复每次读取的超时
+        timeout["read"] = body_read_timeout
+        if PHASE_CONNECT in started and "connected" in started:
+            self._timeouts.record(
+                host, PHASE_CONNECT, started["connected"] - started[PHASE_CONNECT]
+            )
+        response.stream = _MeasuredStream(
+            response.stream,
+            lambda: self._timeouts.record(host, PHASE_TOTAL, time.monotonic() - began),
+        )
+        return response
+
+    async def aclose(self):
+        await self._transport.aclose()
+
+
+# 所有连接池共享的自适应超时统计
+adaptive_timeouts = AdaptiveTimeouts()
@@ -0,0 +1,75 @@
+import random
+import threading
+from typing import Dict, List, Optional
+
+import fake_useragent
+
+# 支持轮换的系统
+USER_AGENT_OS_LIST = ["windows", "macos", "linux", "android", "ios"]
+
+
+class UserAgentProvider:
+    """
+    User-Agent 提供者
+    fake_useragent.UserAgent 每次创建都会重新读取 UA 数据文件, 且 random 每次都要过滤全部数据,
+    这里在启动时为每个系统预先生成一个 UA 池, 请求时只需从池中随机取一个
+    """
+
+    def __init__(self, pool_size: int = 32):
+        """
+        :param pool_size: 每个系统的 UA 池采样次数
+        """
+        self.pool_size = pool_size
+        self._pools: Dict[str, List[str]] = {}
+        self._pinned: Dict[str, str] = {}
+        self._lock = threading.Lock()
+
+    def load(self):
+        """
+        生成各系统的 UA 池, 在服务启动时调用 (会读取文件, 不要在事件循环中直接调用)
+        """
+        with self._lock:
+            if self._pools:
+                return
+            pools = {}
+            for os_name in USER_AGENT_OS_LIST:
+                ua = fake_useragent.UserAgent(os=[os_name])
+                pools[os_name] = sorted({ua.random for _ in range(self.pool_size)})
+            self._pools = pools
+
+    def get(self, os: str = "ios", platform: Optional[str] = None) -> str:
+        """
+        获取 User-Agent
+        :param os: 系统, 见 USER_AGENT_OS_LIST
+        :param platform: 平台标识, 该平台固定了 UA 时返回固定的 UA
+        :return:
+        """
+        if platform is not None:
+            pinned = self._pinned.get(platform)
+            if pinned:
+                return pinned
+
+        if not self._pools:
+            # 未在启动时加载 (如脚本中直接使用解析器), 首次使用时加载
+            self.load()
+        return random.choice(self._pools[os])
+
+    def pin(self, platform: str, user_agent: Optional[str] = None, os: str = "ios"):
+        """
+        固定某个平台使用的 User-Agent
+        :param platform: 平台标识
+        :param user_agent: 固定的 UA, 为空时从对应系统的 UA 池中随机选一个并固定下来
+        :param os: user_agent 为空时使用的系统
+        """
+        self._pinned[platform] = user_agent or self.get(os)
+
+    def unpin(self, platform: str):
+        """
+        取消固定, 恢复轮换
+        :param platform: 平台标识
+        """
+        self._pinned.pop(platform, None)
+
+
+# 所有解析器共享的 UA 提供者
+ua_provider = UserAgentProvider()
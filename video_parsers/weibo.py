@@ -1,12 +1,12 @@
 import re
 from urllib.parse import urlparse
 
-import fake_useragent
-import httpx
-
 from utils import get_val_from_url_by_query_key
 
+from . import jsoncodec
 from .base import BaseParser, ImgInfo, VideoAuthor, VideoInfo
+from .embedded import extract_states
+from .strategy import StrategyRunner
 
 
 class WeiBo(BaseParser):
@@ -14,14 +14,24 @@ class WeiBo(BaseParser):
     微博
     """
 
-    async def parse_share_url(self, share_url: str) -> VideoInfo:
-        # Handle video URLs
+    HTML_TAG_PATTERN = re.compile(r"<[^>]*>")
+
+    # Post parsing strategies: the mobile API is usually a single fast request,
+    # the desktop page is started if it has not answered within 1 second
+    POST_STRATEGY = StrategyRunner(stagger=1.0)
+
+    def get_video_id_from_share_url(self, share_url: str) -> str:
+        # Only video URLs map to parse_video_id, posts are parsed by post id
         if "show?fid=" in share_url:
-            video_id = get_val_from_url_by_query_key(share_url, "fid")
-            return await self.parse_video_id(video_id)
+            return get_val_from_url_by_query_key(share_url, "fid")
         elif "/tv/show/" in share_url:
             url_info = urlparse(share_url)
-            video_id = url_info.path.replace("/tv/show/", "")
+            return url_info.path.replace("/tv/show/", "")
+        return ""
+
+    async def parse_share_url(self, share_url: str) -> VideoInfo:
+        # Handle video URLs
+        if video_id := self.get_video_id_from_share_url(share_url):
             return await self.parse_video_id(video_id)
         else:
             # Handle regular post URLs (potential image albums)
@@ -39,14 +49,15 @@ class WeiBo(BaseParser):
         headers = {
             "Referer": f"https://h5.video.weibo.com/show/{video_id}",
             "Content-Type": "application/x-www-form-urlencoded",
-            "User-Agent": fake_useragent.UserAgent(os=["ios"]).random,
+            "User-Agent": self.get_user_agent("ios"),
         }
         post_content = 'data={"Component_Play_Playinfo":{"oid":"' + video_id + '"}}'
-        async with httpx.AsyncClient(follow_redirects=True) as client:
-            response = await client.post(req_url, headers=headers, content=post_content)
-            response.raise_for_status()
+        response = await self.client.post(
+            req_url, headers=headers, content=post_content, follow_redirects=True
+        )
+        response.raise_for_status()
 
-        json_data = response.json()
+        json_data = jsoncodec.loads(response.content)
         data = json_data["data"]["Component_Play_Playinfo"]
 
         video_url = data["stream_url"]
@@ -71,36 +82,51 @@ class WeiBo(BaseParser):
         """
         Parse Weibo post (potential image album)
         """
-        # Try mobile API first
+        # Try the mobile API and the desktop page in order of recent success
+        # rate, starting the other one if the first is slow or fails
+        return await self.POST_STRATEGY.run(
+            [
+                ("mobile_api", lambda: self._parse_post_by_mobile_api(post_id)),
+                ("html", lambda: self._parse_post_by_html(original_url)),
+            ]
+        )
+
+    async def _parse_post_by_mobile_api(self, post_id: str) -> VideoInfo:
+        """
+        Parse post via the mobile API
+        """
         req_url = f"https://m.weibo.cn/statuses/show?id={post_id}"
         headers = {
-            "User-Agent": fake_useragent.UserAgent(os=["ios"]).random,
+            "User-Agent": self.get_user_agent("ios"),
             "Referer": "https://m.weibo.cn/",
             "Content-Type": "application/json;charset=UTF-8",
             "X-Requested-With": "XMLHttpRequest",
         }
 
-        try:
-            async with httpx.AsyncClient(follow_redirects=True) as client:
-                response = await client.get(req_url, headers=headers)
-                response.raise_for_status()
+        response = await self.client.get(
+            req_url, headers=headers, follow_redirects=True
+        )
+        response.raise_for_status()
 
-            json_data = response.json()
-            if "data" in json_data:
-                return await self._parse_mobile_api_data(json_data["data"])
-        except Exception:
-            pass
+        json_data = jsoncodec.loads(response.content)
+        if "data" not in json_data:
+            raise Exception("weibo mobile api returned no data")
+        return await self._parse_mobile_api_data(json_data["data"])
 
-        # Fallback to desktop page parsing using the original URL
+    async def _parse_post_by_html(self, original_url: str) -> VideoInfo:
+        """
+        Parse post via the desktop page using the original URL
+        """
         headers = {
-            "User-Agent": fake_useragent.UserAgent(os=["ios"]).random,
+            "User-Agent": self.get_user_agent("ios"),
         }
 
-        async with httpx.AsyncClient(follow_redirects=True) as client:
-            response = await client.get(original_url, headers=headers)
-            response.raise_for_status()
+        response = await self.client.get(
+            original_url, headers=headers, follow_redirects=True
+        )
+        response.raise_for_status()
 
-        return await self._parse_html_page(response.text)
+        return await self._parse_html_page(response.content)
 
     async def _parse_mobile_api_data(self, data: dict) -> VideoInfo:
         """
@@ -138,20 +164,18 @@ class WeiBo(BaseParser):
         )
         return video_info
 
-    async def _parse_html_page(self, html_content: str) -> VideoInfo:
+    async def _parse_html_page(self, html_content: bytes) -> VideoInfo:
         """
         Parse data from HTML page
         """
-        # Try to extract data from $render_data script
-        pattern = r"\$render_data\s*=\s*(.*?)\[0\]"
-        match = re.search(pattern, html_content)
-        if not match:
+        # Extract data from the $render_data script, which is assigned as
+        # `$render_data = [{...}][0] || {};`
+        states = extract_states(html_content, ["$render_data"], self.page_encoding)
+        if "$render_data" not in states:
             raise Exception("parse weibo html page fail")
 
-        json_str = match.group(1) + "[0]"
-        import json
-
-        data = json.loads(json_str)
+        render_data = states.loads("$render_data")
+        data = render_data[0] if isinstance(render_data, list) else render_data
 
         # Extract basic info
         status_data = data.get("status", {})
@@ -191,5 +215,5 @@ class WeiBo(BaseParser):
         Remove HTML tags from text
         """
         # Remove HTML tags
-        cleaned = re.sub(r"<[^>]*>", "", text)
+        cleaned = self.HTML_TAG_PATTERN.sub("", text)
         return cleaned.strip()
@@ -1,7 +1,6 @@
-import httpx
-
 from utils import get_val_from_url_by_query_key
 
+from . import jsoncodec
 from .base import BaseParser, VideoAuthor, VideoInfo
 
 
@@ -10,8 +9,11 @@ class WeiShi(BaseParser):
     微视
     """
 
+    def get_video_id_from_share_url(self, share_url: str) -> str:
+        return get_val_from_url_by_query_key(share_url, "id")
+
     async def parse_share_url(self, share_url: str) -> VideoInfo:
-        video_id = get_val_from_url_by_query_key(share_url, "id")
+        video_id = self.get_video_id_from_share_url(share_url)
         return await self.parse_video_id(video_id)
 
     async def parse_video_id(self, video_id: str) -> VideoInfo:
@@ -19,11 +21,10 @@ class WeiShi(BaseParser):
             "https://h5.weishi.qq.com/webapp/json/weishi/WSH5GetPlayPage"
             f"?feedid={video_id}"
         )
-        async with httpx.AsyncClient() as client:
-            response = await client.get(req_url, headers=self.get_default_headers())
-            response.raise_for_status()
+        response = await self.client.get(req_url, headers=self.get_default_headers())
+        response.raise_for_status()
 
-        json_data = response.json()
+        json_data = jsoncodec.loads(response.content)
         # 接口返回错误
         if json_data["ret"] != 0:
             raise Exception(json_data["msg"])
@@ -1,9 +1,3 @@
-import json
-import re
-
-import fake_useragent
-import httpx
-
 from .base import BaseParser, VideoAuthor, VideoInfo
 
 
@@ -12,19 +6,20 @@ class XiGua(BaseParser):
     西瓜视频
     """
 
+    def get_video_id_from_share_url(self, share_url: str) -> str:
+        if share_url.startswith("https://www.ixigua.com/"):
+            # 支持电脑网页版链接 https://www.ixigua.com/xxxxxx
+            return share_url.strip("/").split("/")[-1]
+        return ""
+
     async def parse_share_url(self, share_url: str) -> VideoInfo:
         headers = {
-            "User-Agent": fake_useragent.UserAgent(os=["android"]).random,
+            "User-Agent": self.get_user_agent("android"),
         }
-        if share_url.startswith("https://www.ixigua.com/"):
-            # 支持电脑网页版链接 https://www.ixigua.com/xxxxxx
-            video_id = share_url.strip("/").split("/")[-1]
+        if video_id := self.get_video_id_from_share_url(share_url):
             return await self.parse_video_id(video_id)
 
-        async with httpx.AsyncClient(follow_redirects=False) as client:
-            response = await client.get(share_url, headers=headers)
-
-        location_url = response.headers.get("location", "")
+        location_url = await self.resolve_short_url(share_url, headers=headers)
         video_id = location_url.split("?")[0].strip("/").split("/")[-1]
         if len(video_id) <= 0:
             raise Exception("failed to get video_id from share URL")
@@ -39,20 +34,17 @@ class XiGua(BaseParser):
             f"&utm_campaign=client_share&utm_medium=android&app=aweme"
         )
 
-        async with httpx.AsyncClient(follow_redirects=True) as client:
-            response = await client.get(req_url, headers=self.get_default_headers())
-            response.raise_for_status()
-
-        pattern = re.compile(
-            pattern=r"window\._ROUTER_DATA\s*=\s*(.*?)</script>",
-            flags=re.DOTALL,
+        states = await self.fetch_page_states(
+            req_url,
+            ["_ROUTER_DATA"],
+            headers=self.get_default_headers(),
+            follow_redirects=True,
         )
-        find_res = pattern.search(response.text)
 
-        if not find_res or not find_res.group(1):
+        if not states.get("_ROUTER_DATA"):
             raise ValueError("parse video json info from html fail")
 
-        json_data = json.loads(find_res.group(1).strip())
+        json_data = states.loads("_ROUTER_DATA")
         original_video_info = json_data["loaderData"]["video_(id)/page"]["videoInfoRes"]
 
         # 如果没有视频信息，获取并抛出异常
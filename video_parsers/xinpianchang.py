@@ -1,10 +1,6 @@
-import json
-
-import fake_useragent
-import httpx
-from parsel import Selector
-
+from . import jsoncodec
 from .base import BaseParser, VideoAuthor, VideoInfo
+from .embedded import extract_states
 
 
 class XinPianChang(BaseParser):
@@ -14,17 +10,17 @@ class XinPianChang(BaseParser):
 
     async def parse_share_url(self, share_url: str) -> VideoInfo:
         headers = {
-            "User-Agent": fake_useragent.UserAgent(os=["windows"]).random,
+            "User-Agent": self.get_user_agent("windows"),
             "Upgrade-Insecure-Requests": "1",
             "Referer": "https://www.xinpianchang.com/",
         }
-        async with httpx.AsyncClient(follow_redirects=True) as client:
-            response = await client.get(share_url, headers=headers)
-            response.raise_for_status()
+        response = await self.client.get(
+            share_url, headers=headers, follow_redirects=True
+        )
+        response.raise_for_status()
 
-        sel = Selector(response.text)
-        json_text = sel.css("script#__NEXT_DATA__::text").get()
-        json_data = json.loads(json_text)
+        states = extract_states(response.content, ["__NEXT_DATA__"], self.page_encoding)
+        json_data = states.loads("__NEXT_DATA__")
         data = json_data["props"]["pageProps"]["detail"]
 
         # 获取 appKey 和 media_id， 另外调用接口获取mp4视频地址
@@ -34,10 +30,11 @@ class XinPianChang(BaseParser):
             f"https://mod-api.xinpianchang.com/mod/api/v2/media/{media_id}"
             f"?appKey={app_key}&extend=userInfo%2CuserStatus"
         )
-        async with httpx.AsyncClient(follow_redirects=True) as client:
-            mp4_response = await client.get(req_mp4_url, headers=headers)
-            mp4_response.raise_for_status()
-        mp4_data = mp4_response.json()
+        mp4_response = await self.client.get(
+            req_mp4_url, headers=headers, follow_redirects=True
+        )
+        mp4_response.raise_for_status()
+        mp4_data = jsoncodec.loads(mp4_response.content)
         video_url = mp4_data["data"]["resource"]["progressive"][0]["url"]
 
         video_info = VideoInfo(
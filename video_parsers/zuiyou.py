@@ -1,7 +1,6 @@
-import httpx
-
 from utils import get_val_from_url_by_query_key
 
+from . import jsoncodec
 from .base import BaseParser, VideoAuthor, VideoInfo
 
 
@@ -10,8 +9,11 @@ class ZuiYou(BaseParser):
     最右
     """
 
+    def get_video_id_from_share_url(self, share_url: str) -> str:
+        return get_val_from_url_by_query_key(share_url, "pid")
+
     async def parse_share_url(self, share_url: str) -> VideoInfo:
-        video_id = get_val_from_url_by_query_key(share_url, "pid")
+        video_id = self.get_video_id_from_share_url(share_url)
         return await self.parse_video_id(video_id)
 
     async def parse_video_id(self, video_id: str) -> VideoInfo:
@@ -21,13 +23,15 @@ class ZuiYou(BaseParser):
             "h_av": "5.2.13.011",
             "pid": int_video_id,
         }
-        async with httpx.AsyncClient(follow_redirects=True) as client:
-            response = await client.post(
-                req_url, headers=self.get_default_headers(), json=post_data
-            )
-            response.raise_for_status()
+        response = await self.client.post(
+            req_url,
+            headers=self.get_default_headers(),
+            json=post_data,
+            follow_redirects=True,
+        )
+        response.raise_for_status()
 
-        json_data = response.json()
+        json_data = jsoncodec.loads(response.content)
         data = json_data["data"]["post"]
         video_key = str(data["imgs"][0]["id"])
 